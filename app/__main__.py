@@ -1,4 +1,9 @@
-from app import executor
+import sys
+
+from app import executor, replay
 
 if __name__ == '__main__':
-    executor.run()
+    if sys.argv[1:2] == ['replay']:
+        replay.main(sys.argv[2:])
+    else:
+        executor.run()
@@ -1,11 +1,19 @@
 import asyncio
 import contextlib
-from typing import Iterable, List, Mapping, Optional
+import dataclasses
+import json
+import logging
+from typing import Dict, Iterable, List, Mapping, Optional
 
 import aiogram
 import aiosqlite
 
-from . import datatypes, entities
+from . import datatypes, delivery, entities, protocols, subscriptions
+
+logger = logging.getLogger(__name__)
+
+# SQLite before 3.32 allows at most 999 parameters in a statement
+MAX_VARIABLES = 999
 
 
 class SqliteDBAdapter:
@@ -43,6 +51,15 @@ class SqliteDBAdapter:
             id=row['id'],
             min_price=datatypes.Price.from_optional(row['min_price']),
             max_price=datatypes.Price.from_optional(row['max_price']),
+            digest=bool(row['digest']),
+        )
+
+    @classmethod
+    def row_to_cursor_state(cls, row: Mapping) -> entities.CursorState:
+        return entities.CursorState(
+            url=row['url'],
+            latest_created_at=row['latest_created_at'],
+            seen=list(json.loads(row['seen']).items()),
         )
 
     async def create_tables(self) -> None:
@@ -50,15 +67,35 @@ class SqliteDBAdapter:
             CREATE TABLE IF NOT EXISTS chat (
                 id INTEGER PRIMARY KEY,
                 min_price NUMERIC NULL CHECK(min_price > 0),
-                max_price NUMERIC NULL CHECK(max_price > 0)
+                max_price NUMERIC NULL CHECK(max_price > 0),
+                digest INTEGER NOT NULL DEFAULT 0
+            )
+        '''
+        async with self.execute(statement, commit=True):
+            pass
+        await self.add_missing_columns()
+        statement = '''
+            CREATE TABLE IF NOT EXISTS cursor (
+                url TEXT PRIMARY KEY,
+                latest_created_at REAL NOT NULL,
+                seen TEXT NOT NULL
             )
         '''
         async with self.execute(statement, commit=True):
             return None
 
+    async def add_missing_columns(self) -> None:
+        # tables created by previous versions are not changed by `CREATE TABLE IF NOT EXISTS`
+        async with self.execute('PRAGMA table_info(chat)') as cursor:
+            columns = {row['name'] for row in await cursor.fetchall()}
+        if 'digest' not in columns:
+            statement = 'ALTER TABLE chat ADD COLUMN digest INTEGER NOT NULL DEFAULT 0'
+            async with self.execute(statement, commit=True):
+                return None
+
     async def select_chats(self, interested_in_price: datatypes.Price) -> List[entities.Chat]:
         statement = '''
-            SELECT id, min_price, max_price FROM chat
+            SELECT id, min_price, max_price, digest FROM chat
             WHERE
               (min_price <= ? OR min_price is NULL) AND
               (? <= max_price OR max_price is NULL)
@@ -68,6 +105,37 @@ class SqliteDBAdapter:
             rows = await cursor.fetchall()
             return [self.row_to_chat(row) for row in rows]
 
+    async def select_all_chats(self) -> List[entities.Chat]:
+        async with self.execute('SELECT id, min_price, max_price, digest FROM chat') as cursor:
+            rows = await cursor.fetchall()
+            return [self.row_to_chat(row) for row in rows]
+
+    async def select_chats_by_price(
+            self, prices: Iterable[datatypes.Price]
+    ) -> Dict[datatypes.Price, List[entities.Chat]]:
+        # chats interested in each price, listings of a poll cycle are matched in one query
+        chats: Dict[datatypes.Price, List[entities.Chat]] = {price: [] for price in prices}
+        by_value = {float(price): price for price in chats}
+        values = list(by_value)
+        for start in range(0, len(values), MAX_VARIABLES):
+            for row in await self.match_prices(values[start:start + MAX_VARIABLES]):
+                chats[by_value[row['price']]].append(self.row_to_chat(row))
+        return chats
+
+    async def match_prices(self, values: List[float]) -> List[Mapping]:
+        placeholders = ', '.join(['(?)'] * len(values))
+        statement = f'''
+            WITH price (value) AS (VALUES {placeholders})
+            SELECT price.value AS price, id, min_price, max_price, digest FROM price
+            JOIN chat ON
+              (min_price <= price.value OR min_price is NULL) AND
+              (price.value <= max_price OR max_price is NULL)
+            ORDER BY id
+        '''
+        async with self.execute(statement, values) as cursor:
+            rows: List[Mapping] = await cursor.fetchall()
+            return rows
+
     async def create_chat(self, chat_id: int) -> entities.Chat:
         statement = 'INSERT INTO chat (id) VALUES (?)'
         values = (chat_id, )
@@ -75,7 +143,7 @@ class SqliteDBAdapter:
             return entities.Chat(id=chat_id)
 
     async def get_chat(self, chat_id: int) -> Optional[entities.Chat]:
-        statement = 'SELECT id, min_price, max_price FROM chat WHERE id = ?'
+        statement = 'SELECT id, min_price, max_price, digest FROM chat WHERE id = ?'
         values = (chat_id, )
         async with self.execute(statement, values) as cursor:
             row = await cursor.fetchone()
@@ -84,27 +152,163 @@ class SqliteDBAdapter:
         return None
 
     async def update_chat(self, chat: entities.Chat) -> None:
-        statement = 'UPDATE chat SET min_price = ?, max_price = ? WHERE id = ?'
+        statement = 'UPDATE chat SET min_price = ?, max_price = ?, digest = ? WHERE id = ?'
         _min_price = float(chat.min_price) if chat.min_price else None
         _max_price = float(chat.max_price) if chat.max_price else None
-        values = (_min_price, _max_price, chat.id)
+        values = (_min_price, _max_price, chat.digest, chat.id)
         async with self.execute(statement, values, commit=True):
             return None
 
+    async def select_cursor_states(self) -> List[entities.CursorState]:
+        statement = 'SELECT url, latest_created_at, seen FROM cursor'
+        async with self.execute(statement) as cursor:
+            rows = await cursor.fetchall()
+            return [self.row_to_cursor_state(row) for row in rows]
+
+    async def save_cursor_states(self, states: List[entities.CursorState]) -> None:
+        # all states are written in one transaction
+        statement = 'INSERT OR REPLACE INTO cursor (url, latest_created_at, seen) VALUES (?, ?, ?)'
+        values = [
+            (state.url, state.latest_created_at, json.dumps(dict(state.seen))) for state in states
+        ]
+        connect = await self.get_connection()
+        await connect.executemany(statement, values)
+        await connect.commit()
+
 
 class BotAdapter:
 
-    def __init__(self, token: str):
+    def __init__(
+            self, token: str, settings: delivery.DeliverySettings = delivery.DeliverySettings()
+    ):
         self.bot = aiogram.Bot(token)
         self.dp = aiogram.Dispatcher(self.bot)
+        self.scheduler = delivery.DeliveryScheduler(self.send_message, settings=settings)
 
     async def close(self) -> None:
         await self.bot.close()
 
     async def broadcast(self, chats: List[entities.Chat], text: str) -> None:
-        for chat in chats:
-            try:
-                await self.bot.send_message(chat.id, text=text, parse_mode='Markdown')
-            except aiogram.exceptions.BotBlocked:
-                pass
-            await asyncio.sleep(.05)  # 20 messages per second
+        await self.scheduler.broadcast([chat.id for chat in chats], text=text)
+
+    async def send_message(self, chat_id: int, text: str) -> None:
+        await self.bot.send_message(chat_id, text=text, parse_mode='Markdown')
+
+
+class MemoryDBAdapter:
+    # keeps chats in memory, used where the real database is not needed, e.g. for replays
+
+    def __init__(self, chats: Iterable[entities.Chat] = ()):
+        self.chats: Dict[int, entities.Chat] = {chat.id: chat for chat in chats}
+        self.cursor_states: Dict[str, entities.CursorState] = {}
+
+    async def close(self) -> None:
+        pass
+
+    async def create_tables(self) -> None:
+        pass
+
+    async def select_chats(self, interested_in_price: datatypes.Price) -> List[entities.Chat]:
+        return [
+            chat for chat in self.chats.values()
+            if (chat.min_price is None or chat.min_price <= interested_in_price)
+            and (chat.max_price is None or interested_in_price <= chat.max_price)
+        ]
+
+    async def select_chats_by_price(
+            self, prices: Iterable[datatypes.Price]
+    ) -> Dict[datatypes.Price, List[entities.Chat]]:
+        return {price: await self.select_chats(interested_in_price=price) for price in prices}
+
+    async def select_all_chats(self) -> List[entities.Chat]:
+        return list(self.chats.values())
+
+    async def create_chat(self, chat_id: int) -> entities.Chat:
+        chat = self.chats[chat_id] = entities.Chat(id=chat_id)
+        return chat
+
+    async def get_chat(self, chat_id: int) -> Optional[entities.Chat]:
+        return self.chats.get(chat_id)
+
+    async def update_chat(self, chat: entities.Chat) -> None:
+        self.chats[chat.id] = chat
+
+    async def select_cursor_states(self) -> List[entities.CursorState]:
+        return list(self.cursor_states.values())
+
+    async def save_cursor_states(self, states: List[entities.CursorState]) -> None:
+        self.cursor_states.update((state.url, state) for state in states)
+
+
+class IndexedDBAdapter:
+    # matches chats with prices in memory, everything else is done by the wrapped adapter;
+    # chats are written through, so the index follows changes of price filters,
+    # and copied, so changes of a chat object before it is saved do not leak into the index
+
+    def __init__(self, db_adapter: protocols.DBAdapter):
+        self.db_adapter = db_adapter
+        self.index = subscriptions.SubscriptionIndex()
+
+    async def close(self) -> None:
+        await self.db_adapter.close()
+
+    async def create_tables(self) -> None:
+        await self.db_adapter.create_tables()
+
+    async def load_index(self) -> None:
+        self.index.load(await self.db_adapter.select_all_chats())
+
+    async def check_index(self) -> List[int]:
+        # ids of chats, that differ between the index and the database
+        return self.index.check(await self.db_adapter.select_all_chats())
+
+    async def start_checking(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            mismatched = await self.check_index()
+            if mismatched:
+                logger.warning('Index is out of sync for chats %s, reloading', mismatched[:10])
+                await self.load_index()
+
+    async def select_chats(self, interested_in_price: datatypes.Price) -> List[entities.Chat]:
+        return self.index.match(interested_in_price)
+
+    async def select_all_chats(self) -> List[entities.Chat]:
+        return await self.db_adapter.select_all_chats()
+
+    async def select_chats_by_price(
+            self, prices: Iterable[datatypes.Price]
+    ) -> Dict[datatypes.Price, List[entities.Chat]]:
+        return self.index.match_many(prices)
+
+    async def create_chat(self, chat_id: int) -> entities.Chat:
+        chat = await self.db_adapter.create_chat(chat_id)
+        self.index.update(dataclasses.replace(chat))
+        return chat
+
+    async def get_chat(self, chat_id: int) -> Optional[entities.Chat]:
+        return await self.db_adapter.get_chat(chat_id)
+
+    async def update_chat(self, chat: entities.Chat) -> None:
+        await self.db_adapter.update_chat(chat)
+        self.index.update(dataclasses.replace(chat))
+
+    async def select_cursor_states(self) -> List[entities.CursorState]:
+        return await self.db_adapter.select_cursor_states()
+
+    async def save_cursor_states(self, states: List[entities.CursorState]) -> None:
+        await self.db_adapter.save_cursor_states(states)
+
+
+class MemoryBotAdapter:
+    # counts messages instead of sending them
+
+    def __init__(self):
+        self.messages = 0
+
+    async def close(self) -> None:
+        pass
+
+    async def broadcast(self, chats: List[entities.Chat], text: str) -> None:
+        del text
+        self.messages += len(chats)
@@ -0,0 +1,93 @@
+import collections
+import dataclasses
+import gzip
+import json
+import time
+from typing import Any, Deque, Dict, Iterator
+
+from . import client
+
+# archive is a gzip compressed file with one JSON encoded record per line
+
+
+@dataclasses.dataclass(frozen=True)
+class Record:
+    timestamp: float
+    url: str
+    result: client.FetchResult
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'timestamp': self.timestamp,
+            'url': self.url,
+            'status': self.result.status.value,
+            'text': self.result.text,
+            'error': self.result.error,
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line: str) -> 'Record':
+        data: Dict[str, Any] = json.loads(line)
+        result = client.FetchResult(
+            client.FetchStatus(data['status']), text=data['text'], error=data['error']
+        )
+        return cls(timestamp=data['timestamp'], url=data['url'], result=result)
+
+
+class ArchiveWriter:
+
+    def __init__(self, path: str):
+        # records are appended, so one archive can be written by several runs
+        self.file = gzip.open(path, 'at', encoding='utf-8')
+
+    def write(self, record: Record) -> None:
+        self.file.write(record.to_json() + '\n')
+        # records written before a crash stay readable
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def read_archive(path: str) -> Iterator[Record]:
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            yield Record.from_json(line)
+
+
+class RecordingClient(client.Client):
+
+    def __init__(self, path: str, settings: client.ClientSettings = client.ClientSettings()):
+        super().__init__(settings=settings)
+        self.archive = ArchiveWriter(path)
+
+    async def get(self, url: str) -> client.FetchResult:
+        result = await super().get(url)
+        self.archive.write(Record(timestamp=time.time(), url=url, result=result))
+        return result
+
+    async def close(self) -> None:
+        await super().close()
+        self.archive.close()
+
+
+class ReplayClient(client.Client):
+    # serves recorded responses instead of sending requests,
+    # records are pushed one by one, so the archive is never loaded as a whole
+
+    def __init__(self):
+        super().__init__()
+        self.pending: Dict[str, Deque[client.FetchResult]] = collections.defaultdict(
+            collections.deque
+        )
+
+    def push(self, record: Record) -> None:
+        self.pending[record.url].append(record.result)
+
+    async def get(self, url: str) -> client.FetchResult:
+        results = self.pending[url]
+        if not results:
+            self.stats['not_recorded'] += 1
+            return client.FetchResult(client.FetchStatus.FAILED, error='Not recorded')
+        self.stats['replayed'] += 1
+        return results.popleft()
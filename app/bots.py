@@ -24,6 +24,7 @@ class TelegramBot:
         self.dp.register_message_handler(self.set_min_price, state=PriceState.wait_for_min_price)
         self.dp.register_message_handler(self.start_set_max_price, commands=['set_max_price'])
         self.dp.register_message_handler(self.set_max_price, state=PriceState.wait_for_max_price)
+        self.dp.register_message_handler(self.toggle_digest, commands=['digest'])
 
     def start_polling(self) -> None:
         aiogram.executor.start_polling(self.dp, skip_updates=True)
@@ -38,7 +39,10 @@ class TelegramBot:
                 'You can set price range using these commands:\n\n'
 
                 '/set_min_price - sets minimum shown price\n'
-                '/set_max_price - sets maximum shown price'
+                '/set_max_price - sets maximum shown price\n\n'
+
+                '/digest - turns digest mode on or off: '
+                'new advertisements are sent together every few minutes'
             ),
             reply=False
         )
@@ -88,3 +92,10 @@ class TelegramBot:
         async with state.proxy() as data:
             await message.reply(f'Maximum shown price is set to €{price}', reply=False)
             data.state = None
+
+    async def toggle_digest(self, message: Message) -> None:
+        if await self.chat_service.toggle_digest(message.chat.id):
+            text = 'Digest mode is on, new advertisements will be sent together'
+        else:
+            text = 'Digest mode is off, every new advertisement will be sent at once'
+        await message.reply(text, reply=False)
@@ -1,21 +1,226 @@
+import asyncio
+import codecs
+import collections
+import dataclasses
+import enum
+import logging
+import random
 import ssl
+import time
+import types
+from typing import AsyncGenerator, Counter, Dict, Optional
+from urllib import parse
 
 import aiohttp
 import certifi
+from aiohttp import hdrs, http_parser
+
+ACCEPT_ENCODING = 'gzip, deflate, br' if http_parser.HAS_BROTLI else 'gzip, deflate'
+CHUNK_SIZE = 16 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class ServerError(Exception):
+    pass
+
+
+# errors that are likely to go away if the request is repeated a bit later
+RETRYABLE_ERRORS = (asyncio.TimeoutError, ServerError)
+FETCH_ERRORS = RETRYABLE_ERRORS + (aiohttp.ClientError, )
+
+
+class FetchStatus(enum.Enum):
+    OK = 'ok'
+    NOT_MODIFIED = 'not_modified'
+    FAILED = 'failed'
+
+
+@dataclasses.dataclass(frozen=True)
+class FetchResult:
+    status: FetchStatus
+    text: str = ''
+    # description of the last error, if the page could not be fetched
+    error: Optional[str] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class RequestPolicy:
+    # requests per second to one host and how many of them can be sent at once
+    rate_limit: float = 1
+    rate_burst: int = 4
+    retries: int = 2
+    # delay before the first retry in seconds, doubled for each next one
+    retry_backoff: float = 0.5
+
+
+@dataclasses.dataclass(frozen=True)
+class ClientSettings:
+    limit_per_host: int = 4
+    # should be longer than polling interval, so connections are reused between polls
+    keepalive_timeout: float = 30
+    dns_cache_ttl: int = 300
+    connect_timeout: float = 5
+    read_timeout: float = 10
+    total_timeout: float = 20
+    policy: RequestPolicy = RequestPolicy()
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        # token is taken in advance, so concurrent callers wait in turn
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
 
 
 class Client:
 
-    def __init__(self):
-        self.session: aiohttp.ClientSession = aiohttp.ClientSession()
-        self.ssl_context = ssl.create_default_context(cafile=certifi.where())
+    def __init__(self, settings: ClientSettings = ClientSettings()):
+        # limit_per_host also caps the number of concurrent requests to one host
+        connector = aiohttp.TCPConnector(
+            ssl=ssl.create_default_context(cafile=certifi.where()),
+            limit_per_host=settings.limit_per_host,
+            keepalive_timeout=settings.keepalive_timeout,
+            ttl_dns_cache=settings.dns_cache_ttl,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=settings.total_timeout,
+            connect=settings.connect_timeout,
+            sock_read=settings.read_timeout,
+        )
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self.on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self.on_connection_reuseconn)
+        self.session: aiohttp.ClientSession = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={hdrs.ACCEPT_ENCODING: ACCEPT_ENCODING},
+            trace_configs=[trace_config],
+        )
+        self.policy = settings.policy
+        self.buckets: Dict[str, TokenBucket] = {}
+        # headers for conditional requests and transferred size of the last page by url
+        self.validators: Dict[str, Dict[str, str]] = {}
+        self.sizes: Dict[str, int] = {}
+        self.stats: Counter[str] = collections.Counter()
+        self.started_at: float = time.monotonic()
 
     async def close(self) -> None:
         await self.session.close()
 
-    async def get(self, url: str) -> str:
+    async def on_connection_create_end(
+            self,
+            session: aiohttp.ClientSession,
+            context: types.SimpleNamespace,
+            params: object,
+    ) -> None:
+        del session, context, params
+        self.stats['connections_created'] += 1
+
+    async def on_connection_reuseconn(
+            self,
+            session: aiohttp.ClientSession,
+            context: types.SimpleNamespace,
+            params: object,
+    ) -> None:
+        del session, context, params
+        self.stats['connections_reused'] += 1
+
+    @property
+    def bytes_saved_per_hour(self) -> float:
+        hours = (time.monotonic() - self.started_at) / 3600
+        return self.stats['bytes_saved'] / hours if hours else 0.0
+
+    async def throttle(self, url: str) -> None:
+        host = parse.urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.policy.rate_limit, self.policy.rate_burst)
+        await self.buckets[host].acquire()
+
+    async def backoff(self, attempt: int) -> None:
+        delay = self.policy.retry_backoff * 2 ** (attempt - 1)
+        self.stats['retries'] += 1
+        await asyncio.sleep(random.uniform(delay / 2, delay))
+
+    async def get(self, url: str) -> FetchResult:
+        attempt = 0
+        while True:
+            await self.throttle(url)
+            try:
+                return await self.fetch(url)
+            except FETCH_ERRORS as error:
+                if attempt == self.policy.retries or not isinstance(error, RETRYABLE_ERRORS):
+                    return self.on_error(url, error)
+            attempt += 1
+            await self.backoff(attempt)
+
+    async def fetch(self, url: str) -> FetchResult:
+        headers = self.validators.get(url)
+        async with self.session.get(url, headers=headers) as response:
+            if response.status == 304:
+                self.stats['not_modified'] += 1
+                self.stats['bytes_saved'] += self.sizes.get(url, 0)
+                return FetchResult(FetchStatus.NOT_MODIFIED)
+            if response.status >= 500:
+                raise ServerError(f'{response.status} {response.reason}')
+            response.raise_for_status()
+            body = await response.read()
+            self.remember(url, response, size=len(body))
+            return FetchResult(FetchStatus.OK, text=await response.text())
+
+    def on_error(self, url: str, error: Exception) -> FetchResult:
+        self.stats['timeouts' if isinstance(error, asyncio.TimeoutError) else 'errors'] += 1
+        logger.warning('Failed to fetch %s: %r', url, error)
+        return FetchResult(FetchStatus.FAILED, error=repr(error))
+
+    async def stream(self, url: str) -> AsyncGenerator[str, None]:
+        # yields nothing if the page has not been modified since the last request
+        # or could not be fetched, closing the iterator before the end closes the connection;
+        # requests are not retried, because part of the page can be consumed already
+        await self.throttle(url)
+        headers = self.validators.get(url)
         try:
-            async with self.session.get(url, ssl=self.ssl_context) as response:
-                return await response.text()
-        except aiohttp.ClientError:
-            return ""
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    self.stats['not_modified'] += 1
+                    return
+                response.raise_for_status()
+                self.remember_validators(url, response)
+                decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')('replace')
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    self.stats['bytes_streamed'] += len(chunk)
+                    yield decoder.decode(chunk)
+                yield decoder.decode(b'', final=True)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as error:
+            # the page has not been read to the end, so it must not be treated as seen
+            self.validators.pop(url, None)
+            self.on_error(url, error)
+
+    def remember(self, url: str, response: aiohttp.ClientResponse, size: int) -> None:
+        transferred = response.content_length or size
+        self.stats['bytes_received'] += transferred
+        self.stats['bytes_saved'] += size - transferred
+        if response.status == 200:
+            self.sizes[url] = transferred
+        self.remember_validators(url, response)
+
+    def remember_validators(self, url: str, response: aiohttp.ClientResponse) -> None:
+        if response.status != 200:
+            return
+        validators: Dict[str, str] = {}
+        if hdrs.ETAG in response.headers:
+            validators[hdrs.IF_NONE_MATCH] = response.headers[hdrs.ETAG]
+        if hdrs.LAST_MODIFIED in response.headers:
+            validators[hdrs.IF_MODIFIED_SINCE] = response.headers[hdrs.LAST_MODIFIED]
+        self.validators[url] = validators
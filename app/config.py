@@ -6,11 +6,43 @@ class ImproperlyConfigured(Exception):
     pass
 
 
-class Config:
+class Config:  # pylint: disable=too-many-public-methods
     _TELEGRAM_BOT_TOKEN = 'TELEGRAM_BOT_TOKEN'
     _DATABASE_PATH = 'DATABASE_PATH'
     _SENTRY_DSN = 'SENTRY_DSN'
     _SENTRY_RELEASE_VERSION = 'SENTRY_RELEASE_VERSION'
+    _PARSER_BACKEND = 'PARSER_BACKEND'
+    _PARSER_EXECUTOR = 'PARSER_EXECUTOR'
+    _PARSER_WORKERS = 'PARSER_WORKERS'
+    _HTTP_LIMIT_PER_HOST = 'HTTP_LIMIT_PER_HOST'
+    _HTTP_KEEPALIVE_TIMEOUT = 'HTTP_KEEPALIVE_TIMEOUT'
+    _HTTP_DNS_CACHE_TTL = 'HTTP_DNS_CACHE_TTL'
+    _HTTP_CONNECT_TIMEOUT = 'HTTP_CONNECT_TIMEOUT'
+    _HTTP_READ_TIMEOUT = 'HTTP_READ_TIMEOUT'
+    _HTTP_TOTAL_TIMEOUT = 'HTTP_TOTAL_TIMEOUT'
+    _HTTP_RATE_LIMIT = 'HTTP_RATE_LIMIT'
+    _HTTP_RATE_BURST = 'HTTP_RATE_BURST'
+    _HTTP_RETRIES = 'HTTP_RETRIES'
+    _HTTP_RETRY_BACKOFF = 'HTTP_RETRY_BACKOFF'
+    _FETCH_MODE = 'FETCH_MODE'
+    _RECORD_ARCHIVE = 'RECORD_ARCHIVE'
+    _SEEN_WINDOW_HOURS = 'SEEN_WINDOW_HOURS'
+    _SEEN_CAPACITY = 'SEEN_CAPACITY'
+    _CURSOR_CATCH_UP_HOURS = 'CURSOR_CATCH_UP_HOURS'
+    _CURSOR_SAVE_INTERVAL = 'CURSOR_SAVE_INTERVAL'
+    _POLL_CONCURRENCY = 'POLL_CONCURRENCY'
+    _DEDUP_WINDOW_HOURS = 'DEDUP_WINDOW_HOURS'
+    _MATCH_WORKERS = 'MATCH_WORKERS'
+    _DELIVER_WORKERS = 'DELIVER_WORKERS'
+    _PIPELINE_QUEUE_SIZE = 'PIPELINE_QUEUE_SIZE'
+    _INDEX_CHECK_INTERVAL = 'INDEX_CHECK_INTERVAL'
+    _DIGEST_WINDOW_MINUTES = 'DIGEST_WINDOW_MINUTES'
+    _SEND_RATE_LIMIT = 'SEND_RATE_LIMIT'
+    _SEND_RATE_BURST = 'SEND_RATE_BURST'
+    _SEND_CONCURRENCY = 'SEND_CONCURRENCY'
+
+    PARSER_EXECUTORS = ['inline', 'thread', 'process']
+    FETCH_MODES = ['full', 'stream']
 
     REQUIRED_ENVS = [_TELEGRAM_BOT_TOKEN]
 
@@ -36,3 +68,125 @@ class Config:
     @property
     def sentry_release_version(self) -> Optional[str]:
         return os.getenv(self._SENTRY_RELEASE_VERSION)
+
+    @property
+    def parser_backend(self) -> str:
+        return os.getenv(self._PARSER_BACKEND, 'html.parser')
+
+    @property
+    def parser_executor(self) -> str:
+        executor = os.getenv(self._PARSER_EXECUTOR, 'inline')
+        if executor not in self.PARSER_EXECUTORS:
+            raise ImproperlyConfigured(f'Unknown parser executor: `{executor}`')
+        return executor
+
+    @property
+    def parser_workers(self) -> int:
+        return int(os.getenv(self._PARSER_WORKERS, '2'))
+
+    @property
+    def http_limit_per_host(self) -> int:
+        return int(os.getenv(self._HTTP_LIMIT_PER_HOST, '4'))
+
+    @property
+    def http_keepalive_timeout(self) -> float:
+        return float(os.getenv(self._HTTP_KEEPALIVE_TIMEOUT, '30'))
+
+    @property
+    def http_dns_cache_ttl(self) -> int:
+        return int(os.getenv(self._HTTP_DNS_CACHE_TTL, '300'))
+
+    @property
+    def http_connect_timeout(self) -> float:
+        return float(os.getenv(self._HTTP_CONNECT_TIMEOUT, '5'))
+
+    @property
+    def http_read_timeout(self) -> float:
+        return float(os.getenv(self._HTTP_READ_TIMEOUT, '10'))
+
+    @property
+    def http_total_timeout(self) -> float:
+        return float(os.getenv(self._HTTP_TOTAL_TIMEOUT, '20'))
+
+    @property
+    def http_rate_limit(self) -> float:
+        return float(os.getenv(self._HTTP_RATE_LIMIT, '1'))
+
+    @property
+    def http_rate_burst(self) -> int:
+        return int(os.getenv(self._HTTP_RATE_BURST, '4'))
+
+    @property
+    def http_retries(self) -> int:
+        return int(os.getenv(self._HTTP_RETRIES, '2'))
+
+    @property
+    def http_retry_backoff(self) -> float:
+        return float(os.getenv(self._HTTP_RETRY_BACKOFF, '0.5'))
+
+    @property
+    def fetch_mode(self) -> str:
+        mode = os.getenv(self._FETCH_MODE, 'full')
+        if mode not in self.FETCH_MODES:
+            raise ImproperlyConfigured(f'Unknown fetch mode: `{mode}`')
+        return mode
+
+    @property
+    def record_archive(self) -> Optional[str]:
+        return os.getenv(self._RECORD_ARCHIVE)
+
+    @property
+    def seen_window_hours(self) -> float:
+        return float(os.getenv(self._SEEN_WINDOW_HOURS, '24'))
+
+    @property
+    def seen_capacity(self) -> int:
+        return int(os.getenv(self._SEEN_CAPACITY, '10000'))
+
+    @property
+    def cursor_catch_up_hours(self) -> float:
+        return float(os.getenv(self._CURSOR_CATCH_UP_HOURS, '6'))
+
+    @property
+    def cursor_save_interval(self) -> float:
+        return float(os.getenv(self._CURSOR_SAVE_INTERVAL, '60'))
+
+    @property
+    def poll_concurrency(self) -> int:
+        return int(os.getenv(self._POLL_CONCURRENCY, '8'))
+
+    @property
+    def dedup_window_hours(self) -> float:
+        return float(os.getenv(self._DEDUP_WINDOW_HOURS, '24'))
+
+    @property
+    def match_workers(self) -> int:
+        return int(os.getenv(self._MATCH_WORKERS, '2'))
+
+    @property
+    def deliver_workers(self) -> int:
+        return int(os.getenv(self._DELIVER_WORKERS, '1'))
+
+    @property
+    def pipeline_queue_size(self) -> int:
+        return int(os.getenv(self._PIPELINE_QUEUE_SIZE, '100'))
+
+    @property
+    def index_check_interval(self) -> float:
+        return float(os.getenv(self._INDEX_CHECK_INTERVAL, '3600'))
+
+    @property
+    def digest_window_minutes(self) -> float:
+        return float(os.getenv(self._DIGEST_WINDOW_MINUTES, '10'))
+
+    @property
+    def send_rate_limit(self) -> float:
+        return float(os.getenv(self._SEND_RATE_LIMIT, '25'))
+
+    @property
+    def send_rate_burst(self) -> int:
+        return int(os.getenv(self._SEND_RATE_BURST, '5'))
+
+    @property
+    def send_concurrency(self) -> int:
+        return int(os.getenv(self._SEND_CONCURRENCY, '8'))
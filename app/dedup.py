@@ -0,0 +1,103 @@
+import collections
+import hashlib
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from . import entities
+
+TOKEN_RE = re.compile(r'\w+')
+FINGERPRINT_BITS = 64
+# listings posted within the same bucket can be duplicates of each other
+TIME_BUCKET = 6 * 60 * 60
+# fingerprints differing in that many bits at most belong to the same listing
+MAX_DISTANCE = 3
+DEDUP_WINDOW = 24 * 60 * 60
+# titles like `Apartment` are shared by too many different listings to tell them apart
+MIN_TITLE_TOKENS = 3
+
+
+def get_title_tokens(title: str) -> Set[str]:
+    # `Renovated House, Limassol` and `renovated house limassol` have the same tokens
+    return set(TOKEN_RE.findall(title.lower()))
+
+
+def get_features(real_property: entities.Property) -> Set[str]:
+    features = {f'title:{token}' for token in get_title_tokens(real_property.title)}
+    features.add(f'price:{real_property.price}')
+    features.add(f'time:{int(real_property.created_at // TIME_BUCKET)}')
+    return features
+
+
+def hash_feature(feature: str) -> int:
+    # unlike `hash`, stays the same between runs
+    digest = hashlib.blake2b(feature.encode(), digest_size=FINGERPRINT_BITS // 8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def simhash(features: Iterable[str]) -> int:
+    # similar feature sets get fingerprints differing in a few bits
+    weights = [0] * FINGERPRINT_BITS
+    for feature in features:
+        value = hash_feature(feature)
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def fingerprint(real_property: entities.Property) -> Optional[int]:
+    if len(get_title_tokens(real_property.title)) < MIN_TITLE_TOKENS:
+        return None
+    return simhash(get_features(real_property))
+
+
+def distance(first: int, second: int) -> int:
+    return bin(first ^ second).count('1')
+
+
+class FingerprintIndex:
+    # fingerprints added within the last `window` seconds; every fingerprint is split
+    # into `max_distance + 1` bands, so a similar one has at least one band in common with it
+    # and only fingerprints sharing a band are compared
+
+    def __init__(self, window: float = DEDUP_WINDOW, max_distance: int = MAX_DISTANCE):
+        self.window = window
+        self.max_distance = max_distance
+        self.band_bits = FINGERPRINT_BITS // (max_distance + 1)
+        self.bands: List[Dict[int, Set[int]]] = [{} for _ in range(max_distance + 1)]
+        # added time by fingerprint, the oldest first
+        self.added_at: 'collections.OrderedDict[int, float]' = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.added_at)
+
+    def split(self, value: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [value >> (index * self.band_bits) & mask for index in range(len(self.bands))]
+
+    def find(self, value: int) -> bool:
+        self.evict(time.time())
+        for band, key in zip(self.bands, self.split(value)):
+            if any(distance(value, other) <= self.max_distance for other in band.get(key, ())):
+                return True
+        return False
+
+    def add(self, value: int) -> None:
+        now = time.time()
+        self.added_at[value] = now
+        self.added_at.move_to_end(value)
+        for band, key in zip(self.bands, self.split(value)):
+            band.setdefault(key, set()).add(value)
+        self.evict(now)
+
+    def evict(self, now: float) -> None:
+        expired_at = now - self.window
+        while self.added_at:
+            value, added_at = next(iter(self.added_at.items()))
+            if added_at > expired_at:
+                return
+            self.added_at.popitem(last=False)
+            for band, key in zip(self.bands, self.split(value)):
+                band[key].discard(value)
+                if not band[key]:
+                    del band[key]
@@ -0,0 +1,124 @@
+import asyncio
+import collections
+import dataclasses
+import logging
+import time
+from typing import Awaitable, Callable, Counter, Iterator, List
+
+import aiogram
+
+from . import client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class DeliverySettings:
+    # messages per second to all chats and how many of them can be sent at once;
+    # Telegram allows about 30 per second, the rate and the burst together stay within it
+    rate_limit: float = 25
+    rate_burst: int = 5
+    # seconds between messages to one chat, groups are allowed 20 messages per minute
+    chat_interval: float = 1
+    group_interval: float = 3
+    # messages sent at once by one broadcast
+    senders: int = 8
+    # attempts after flood control responses, before the message is dropped
+    retries: int = 3
+
+
+class ChatPacer:
+    # keeps messages to the same chat apart; entries are evicted the oldest first,
+    # so a long pause of one chat can hold back eviction of the others until it is over
+
+    def __init__(self, chat_interval: float, group_interval: float):
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        # when the next message can be sent by chat id
+        self.ready_at: 'collections.OrderedDict[int, float]' = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.ready_at)
+
+    def get_delay(self, chat_id: int) -> float:
+        now = time.monotonic()
+        self.evict(now)
+        return max(self.ready_at.get(chat_id, now) - now, 0)
+
+    def delay(self, chat_id: int, seconds: float) -> None:
+        self.ready_at[chat_id] = time.monotonic() + seconds
+        self.ready_at.move_to_end(chat_id)
+
+    def on_sent(self, chat_id: int) -> None:
+        # ids of groups are negative
+        self.delay(chat_id, self.group_interval if chat_id < 0 else self.chat_interval)
+
+    def evict(self, now: float) -> None:
+        while self.ready_at and next(iter(self.ready_at.values())) <= now:
+            self.ready_at.popitem(last=False)
+
+
+class DeliveryScheduler:
+    # sends a message to many chats with a few senders at once, within the global rate limit
+    # and the limit of every chat; flood control responses pause the scope they are about
+
+    def __init__(
+            self,
+            send: Callable[[int, str], Awaitable[None]],
+            settings: DeliverySettings = DeliverySettings(),
+    ):
+        self.send = send
+        self.settings = settings
+        self.bucket = client.TokenBucket(settings.rate_limit, settings.rate_burst)
+        self.pacer = ChatPacer(settings.chat_interval, settings.group_interval)
+        self.paused_until = 0.0
+        self.stats: Counter[str] = collections.Counter()
+
+    async def broadcast(self, chat_ids: List[int], text: str) -> None:
+        # senders take chats from the same iterator
+        pending = iter(chat_ids)
+        senders = min(self.settings.senders, len(chat_ids))
+        await asyncio.gather(*(self.work(pending, text) for _ in range(senders)))
+
+    async def work(self, pending: Iterator[int], text: str) -> None:
+        for chat_id in pending:
+            await self.deliver(chat_id, text)
+
+    async def deliver(self, chat_id: int, text: str) -> None:
+        for _ in range(self.settings.retries + 1):
+            await self.wait(chat_id)
+            try:
+                await self.send(chat_id, text)
+            except aiogram.exceptions.RetryAfter as error:
+                self.stats['retried'] += 1
+                self.pause(chat_id, error.timeout)
+                continue
+            except aiogram.exceptions.BotBlocked:
+                self.stats['blocked'] += 1
+                return
+            except aiogram.exceptions.TelegramAPIError:
+                # one broken chat must not stop the broadcast
+                self.stats['failed'] += 1
+                logger.exception('Failed to send message to chat %s', chat_id)
+                return
+            self.stats['sent'] += 1
+            self.pacer.on_sent(chat_id)
+            return
+        self.stats['dropped'] += 1
+        logger.warning('Dropped message to chat %s after flood control', chat_id)
+
+    async def wait(self, chat_id: int) -> None:
+        # pauses are waited out before a token is taken, so they do not use up the rate
+        delay = max(self.paused_until - time.monotonic(), self.pacer.get_delay(chat_id))
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.bucket.acquire()
+
+    def pause(self, chat_id: int, seconds: float) -> None:
+        # groups have limits of their own, otherwise the bot sends too fast overall
+        # and every sender has to stop
+        if chat_id < 0:
+            self.pacer.delay(chat_id, seconds)
+            return
+        logger.warning('Flood control, pausing delivery for %s seconds', seconds)
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
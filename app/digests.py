@@ -0,0 +1,71 @@
+import collections
+import time
+from typing import Dict, Iterable, List
+
+from . import entities
+
+DIGEST_WINDOW = 10 * 60
+# Telegram rejects longer messages
+MESSAGE_LIMIT = 4096
+
+
+def split_message(lines: Iterable[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    # lines are never split, so Markdown links stay whole; a line longer than the limit
+    # can only be cut and is sent on its own
+    messages: List[str] = []
+    message = ''
+    for line in lines:
+        line = line[:limit]
+        if message and len(message) + 1 + len(line) > limit:
+            messages.append(message)
+            message = ''
+        message = f'{message}\n{line}' if message else line
+    if message:
+        messages.append(message)
+    return messages
+
+
+def format_digest(digest: entities.Digest) -> List[str]:
+    lines = [f'{len(digest.properties)} new listings:']
+    lines.extend(update.markdown_link for update in digest.properties)
+    return split_message(lines)
+
+
+class DigestBuffer:
+    # listings matched with chats in digest mode, a chat gets them all `window` seconds
+    # after the first one is added
+
+    def __init__(self, window: float = DIGEST_WINDOW):
+        self.window = window
+        self.digests: Dict[int, entities.Digest] = {}
+        # opening time by chat id, the oldest first
+        self.opened_at: 'collections.OrderedDict[int, float]' = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    def add(self, chat: entities.Chat, update: entities.Property) -> None:
+        if chat.id not in self.digests:
+            self.digests[chat.id] = entities.Digest(chat, properties=[])
+            self.opened_at[chat.id] = time.time()
+        self.digests[chat.id].properties.append(update)
+
+    def get_delay(self) -> float:
+        # seconds until the oldest digest is due
+        if not self.opened_at:
+            return self.window
+        opened_at = next(iter(self.opened_at.values()))
+        return max(opened_at + self.window - time.time(), 0)
+
+    def pop_due(self) -> List[entities.Digest]:
+        closed_at = time.time() - self.window
+        due = []
+        while self.opened_at and next(iter(self.opened_at.values())) <= closed_at:
+            chat_id, _ = self.opened_at.popitem(last=False)
+            due.append(self.digests.pop(chat_id))
+        return due
+
+    def pop_all(self) -> List[entities.Digest]:
+        due = [self.digests.pop(chat_id) for chat_id in self.opened_at]
+        self.opened_at.clear()
+        return due
@@ -1,5 +1,5 @@
 import dataclasses
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from . import datatypes
 
@@ -9,6 +9,8 @@ class Chat:
     id: int  # pylint: disable=invalid-name
     min_price: Optional[datatypes.Price] = None
     max_price: Optional[datatypes.Price] = None
+    # matches are buffered and sent together
+    digest: bool = False
 
 
 @dataclasses.dataclass
@@ -21,3 +23,29 @@ class Property:
     @property
     def telegram_link(self) -> str:
         return f'https://t.me/iv?url={self.url}/&rhash=7849b4bb7a02f2'
+
+    @property
+    def markdown_link(self) -> str:
+        return f'[{self.title} €{self.price}]({self.telegram_link})'
+
+
+@dataclasses.dataclass
+class Delivery:
+    property: Property
+    # chats interested in the property
+    chats: List[Chat]
+
+
+@dataclasses.dataclass
+class Digest:
+    chat: Chat
+    # properties matched with the chat, the oldest first
+    properties: List[Property]
+
+
+@dataclasses.dataclass
+class CursorState:
+    url: str
+    latest_created_at: float
+    # listing ids with the time they were seen, the oldest first
+    seen: List[Tuple[str, float]]
@@ -1,9 +1,13 @@
 import asyncio
-from typing import List
+from concurrent import futures
+from typing import Dict, List, Optional, Type
 
 import sentry_sdk
 
-from . import adapters, bots, client, config, providers, registry, services
+from . import (
+    adapters, archive, bots, client, config, dedup, delivery, digests, parsers, pipeline,
+    providers, registry, services,
+)
 
 
 def run():
@@ -17,39 +21,120 @@ def run():
         loop.run_until_complete(application.shutdown())
 
 
-class Application:
+def make_parse_executor(mode: str, workers: int) -> Optional[futures.Executor]:
+    if mode == 'thread':
+        return futures.ThreadPoolExecutor(max_workers=workers)
+    if mode == 'process':
+        return futures.ProcessPoolExecutor(max_workers=workers)
+    return None
+
+
+def make_client(conf: config.Config) -> client.Client:
+    settings = client.ClientSettings(
+        limit_per_host=conf.http_limit_per_host,
+        keepalive_timeout=conf.http_keepalive_timeout,
+        dns_cache_ttl=conf.http_dns_cache_ttl,
+        connect_timeout=conf.http_connect_timeout,
+        read_timeout=conf.http_read_timeout,
+        total_timeout=conf.http_total_timeout,
+        policy=client.RequestPolicy(
+            rate_limit=conf.http_rate_limit,
+            rate_burst=conf.http_rate_burst,
+            retries=conf.http_retries,
+            retry_backoff=conf.http_retry_backoff,
+        ),
+    )
+    if conf.record_archive:
+        return archive.RecordingClient(conf.record_archive, settings=settings)
+    return client.Client(settings=settings)
+
+
+PROVIDER_CLASSES = {
+    'full': providers.Provider,
+    'stream': providers.StreamingProvider,
+}
+
+
+class Application:  # pylint: disable=too-many-instance-attributes
 
     def __init__(self):
         self.conf = config.Config()
 
-        self.bot_adapter = adapters.BotAdapter(token=self.conf.bot_token)
-        self.db_adapter = adapters.SqliteDBAdapter(self.conf.database)
-        self.webclient = client.Client()
+        self.bot_adapter = adapters.BotAdapter(
+            token=self.conf.bot_token,
+            settings=delivery.DeliverySettings(
+                rate_limit=self.conf.send_rate_limit,
+                rate_burst=self.conf.send_rate_burst,
+                senders=self.conf.send_concurrency,
+            ),
+        )
+        self.db_adapter = adapters.IndexedDBAdapter(adapters.SqliteDBAdapter(self.conf.database))
+        self.webclient = make_client(self.conf)
+        self.parse_executor = make_parse_executor(
+            self.conf.parser_executor, workers=self.conf.parser_workers
+        )
 
         self.send_service = services.SendService(
-            bot_adapter=self.bot_adapter, db_adapter=self.db_adapter, providers=self.provider_list
+            bot_adapter=self.bot_adapter,
+            db_adapter=self.db_adapter,
+            providers=self.make_providers(),
+            pipeline_settings=pipeline.PipelineSettings(
+                poll_workers=self.conf.poll_concurrency,
+                match_workers=self.conf.match_workers,
+                deliver_workers=self.conf.deliver_workers,
+                queue_size=self.conf.pipeline_queue_size,
+            ),
+            fingerprints=dedup.FingerprintIndex(window=self.conf.dedup_window_hours * 60 * 60),
+            digest_buffer=digests.DigestBuffer(window=self.conf.digest_window_minutes * 60),
+        )
+        self.cursor_service = services.CursorService(
+            db_adapter=self.db_adapter, providers=self.send_service.providers
         )
 
         chat_service = services.ChatService(db_adapter=self.db_adapter)
         self.bot = bots.TelegramBot(self.conf.bot_token, chat_service=chat_service)
 
-    @property
-    def provider_list(self) -> List[providers.Provider]:
-        return [
-            providers.Provider(url, parser=parser_class(), webclient=self.webclient)
-            for url, parser_class in registry.list_parsers().items()
-        ]
+    def make_providers(self) -> List[providers.Provider]:
+        # called once at startup, urls registered with the same parser class share its instance
+        provider_class = PROVIDER_CLASSES[self.conf.fetch_mode]
+        parser_instances: Dict[Type[parsers.Parser], parsers.Parser] = {}
+        provider_list = []
+        for url, parser_class in registry.list_parsers().items():
+            if parser_class not in parser_instances:
+                parser_instances[parser_class] = parser_class(backend=self.conf.parser_backend)
+            provider = provider_class(
+                url,
+                parser=parser_instances[parser_class],
+                webclient=self.webclient,
+                executor=self.parse_executor,
+            )
+            provider.cursor = self.make_cursor()
+            provider_list.append(provider)
+        return provider_list
+
+    def make_cursor(self) -> providers.Cursor:
+        seen = providers.SeenSet(
+            window=self.conf.seen_window_hours * 60 * 60, capacity=self.conf.seen_capacity
+        )
+        return providers.Cursor(seen=seen)
 
     async def init(self) -> None:
         await self.db_adapter.create_tables()
+        await self.db_adapter.load_index()
+        await self.cursor_service.load(catch_up=self.conf.cursor_catch_up_hours * 60 * 60)
         if self.conf.sentry_dsn:
             sentry_sdk.init(self.conf.sentry_dsn, release=self.conf.sentry_release_version)
 
     def run(self, loop: asyncio.AbstractEventLoop) -> None:
         loop.create_task(self.send_service.start_sending())
+        loop.create_task(self.cursor_service.start_saving(self.conf.cursor_save_interval))
+        loop.create_task(self.db_adapter.start_checking(self.conf.index_check_interval))
         self.bot.start_polling()
 
     async def shutdown(self) -> None:
+        await self.cursor_service.save()
         await self.db_adapter.close()
         await self.bot_adapter.close()
         await self.webclient.close()
+        if self.parse_executor is not None:
+            self.parse_executor.shutdown()
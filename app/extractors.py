@@ -0,0 +1,153 @@
+import dataclasses
+import re
+from typing import Any, Callable, Dict, List, Mapping, Match, Optional, Tuple
+
+import bs4
+
+ATTR_RE = re.compile(r'''([\w-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')''')
+
+
+@dataclasses.dataclass(frozen=True)
+class Selector:
+    name: str
+    class_: Optional[str] = None
+    attrs: Tuple[Tuple[str, str], ...] = ()
+
+    @property
+    def kwargs(self) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {}
+        if self.class_ is not None:
+            kwargs['class_'] = self.class_
+        if self.attrs:
+            kwargs['attrs'] = dict(self.attrs)
+        return kwargs
+
+    def strainer(self) -> bs4.SoupStrainer:
+        return bs4.SoupStrainer(self.name, **self.kwargs)
+
+    def match(self, tag: bs4.element.Tag) -> bool:
+        if self.class_ is not None and self.class_ not in tag.get('class', ()):
+            return False
+        return all(tag.get(key) == value for key, value in self.attrs)
+
+    def match_start_tag(self, text: str) -> bool:
+        # same as `match`, but for a raw start tag, e.g. `<li class="item">`
+        attrs = {name.lower(): double or single for name, double, single in ATTR_RE.findall(text)}
+        if self.class_ is not None and self.class_ not in attrs.get('class', '').split():
+            return False
+        return all(attrs.get(key) == value for key, value in self.attrs)
+
+
+@dataclasses.dataclass(frozen=True)
+class Field:
+    selector: Selector
+    # name of the attribute to take value from, tag text is used if not set
+    attr: Optional[str] = None
+    convert: Callable[[str], Any] = str.strip
+
+    def get(self, tag: bs4.element.Tag) -> Any:
+        value = tag.get_text() if self.attr is None else tag[self.attr]
+        return self.convert(value)  # type: ignore
+
+
+@dataclasses.dataclass(frozen=True)
+class ItemSpec:
+    selector: Selector
+    title: Field
+    price: Field
+    url: Field
+    # text with the date, e.g. `Today 12:30` or `28.01.2019 12:30`
+    created_at: Field
+
+    @property
+    def fields(self) -> Dict[str, Field]:
+        return {
+            'title': self.title,
+            'price': self.price,
+            'url': self.url,
+            'created_at': self.created_at,
+        }
+
+
+@dataclasses.dataclass(frozen=True)
+class ParserSpec:
+    base_url: str
+    timezone: str
+    item: ItemSpec
+    # regex matching parts of the page that identify the listing
+    fingerprint: Optional[str] = None
+    # query parameter with the page number, e.g. `page` for `?page=2`
+    page_param: Optional[str] = None
+    # min and max seconds between polls
+    poll_interval: Tuple[float, float] = (2, 300)
+
+
+class ExtractionPlan:
+
+    def __init__(self, fields: Mapping[str, Field]):
+        # fields sharing the same selector are taken from the same tag
+        self.selectors: Dict[Selector, List[Tuple[str, Field]]] = {}
+        for name, field in fields.items():
+            self.selectors.setdefault(field.selector, []).append((name, field))
+        self.by_tag_name: Dict[str, List[Selector]] = {}
+        for selector in self.selectors:
+            self.by_tag_name.setdefault(selector.name, []).append(selector)
+
+    def extract(self, item: bs4.element.Tag) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        pending = set(self.selectors)
+        for tag in item.descendants:
+            for selector in self.by_tag_name.get(tag.name, ()):
+                if selector in pending and selector.match(tag):
+                    pending.remove(selector)
+                    fields = self.selectors[selector]
+                    values.update((name, field.get(tag)) for name, field in fields)
+            if not pending:
+                return values
+        raise ValueError(f'Tags not found: {", ".join(s.name for s in pending)}')
+
+
+class ItemSplitter:
+    # cuts markup of complete items out of a page, that is fed by chunks,
+    # only markup of an unfinished item is kept between chunks
+
+    def __init__(self, selector: Selector):
+        self.selector = selector
+        self.tag_re = re.compile(rf'<(/?){re.escape(selector.name)}\b[^>]*>', re.IGNORECASE)
+        self.buffer = ''
+        self.position = 0
+        # start of the current item in the buffer and depth of nested tags with the same name
+        self.start: Optional[int] = None
+        self.depth = 0
+
+    def feed(self, chunk: str) -> List[str]:
+        self.buffer += chunk
+        items = []
+        for match in self.tag_re.finditer(self.buffer, self.position):
+            item = self.on_tag(match)
+            if item is not None:
+                items.append(item)
+            self.position = match.end()
+        self.trim()
+        return items
+
+    def on_tag(self, match: Match[str]) -> Optional[str]:
+        if self.start is None:
+            if not match.group(1) and self.selector.match_start_tag(match.group(0)):
+                self.start, self.depth = match.start(), 1
+            return None
+        self.depth += -1 if match.group(1) else 1
+        if self.depth:
+            return None
+        item, self.start = self.buffer[self.start:match.end()], None
+        return item
+
+    def trim(self) -> None:
+        if self.start is None:
+            # keep only what can be a beginning of a tag, cut by the end of the chunk
+            offset = self.buffer.rfind('<', self.position)
+            offset = len(self.buffer) if offset == -1 else offset
+        else:
+            offset, self.start = self.start, 0
+        self.buffer = self.buffer[offset:]
+        self.position = max(self.position - offset, 0)
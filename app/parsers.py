@@ -1,18 +1,109 @@
 import calendar
 import datetime
+import hashlib
+import re
 import urllib.parse
-from typing import List
+from typing import Dict, Iterator, List, Optional, Pattern
 
 import bs4
 import pytz
 
-from . import datatypes, entities, registry
+from . import datatypes, entities, extractors, registry
 
 BAZARAKI_BASE_URL = 'https://www.bazaraki.com'
-BAZARAKI_URL = f'{BAZARAKI_BASE_URL}/real-estate/houses-and-villas-rent/lemesos-district-limassol/'
+BAZARAKI_URL_TEMPLATE = f'{BAZARAKI_BASE_URL}/real-estate/{{category}}/{{district}}/'
+BAZARAKI_CATEGORIES = ['houses-and-villas-rent', 'apartments-flats-rent']
+BAZARAKI_DISTRICTS = [
+    'lemesos-district-limassol',
+    'lefkosia-district-nicosia',
+    'larnaka-district-larnaca',
+    'pafos-district-paphos',
+    'ammochostos-district-famagusta',
+]
+BAZARAKI_URL = BAZARAKI_URL_TEMPLATE.format(
+    category=BAZARAKI_CATEGORIES[0], district=BAZARAKI_DISTRICTS[0]
+)
+
+DEFAULT_BACKEND = 'html.parser'
+
+
+def get_backend(name: str) -> str:
+    if bs4.builder.builder_registry.lookup(name) is None:
+        return DEFAULT_BACKEND
+    return name
+
+
+class DateContext:
+    DATETIME_RE = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4}) (\d{1,2}):(\d{2})')
+
+    def __init__(self, tzinfo: pytz.BaseTzInfo, now: datetime.datetime):
+        self.tzinfo = tzinfo
+        self.now = now.timestamp()
+        today = now.astimezone(tzinfo).date()
+        self.days = {'Today': today, 'Yesterday': today - datetime.timedelta(days=1)}
+        self.offsets: Dict[datetime.date, Optional[int]] = {}
+        self.timestamps: Dict[str, float] = {}
+
+    def resolve(self, text: str) -> float:
+        try:
+            return self.timestamps[text]
+        except KeyError:
+            timestamp = self.timestamps[text] = self.to_timestamp(self.to_local(text))
+            return timestamp
+
+    def to_local(self, text: str) -> datetime.datetime:
+        day, _, time = text.partition(' ')
+        if day in self.days:
+            date = self.days[day]
+            hour, _, minute = time.partition(':')
+            return datetime.datetime(date.year, date.month, date.day, int(hour), int(minute))
+        match = self.DATETIME_RE.fullmatch(text)
+        if match is None:
+            raise ValueError(f'Unknown date format: `{text}`')
+        day_, month, year, hour_, minute_ = (int(group) for group in match.groups())
+        return datetime.datetime(year, month, day_, hour_, minute_)
+
+    def get_offset(self, date: datetime.date) -> Optional[int]:
+        # offset in seconds or None if it changes during the day (DST transition)
+        try:
+            return self.offsets[date]
+        except KeyError:
+            start = self.tzinfo.localize(datetime.datetime.combine(date, datetime.time.min))
+            end = self.tzinfo.localize(datetime.datetime.combine(date, datetime.time.max))
+            start_offset, end_offset = start.utcoffset(), end.utcoffset()
+            offset = None
+            if start_offset is not None and start_offset == end_offset:
+                offset = int(start_offset.total_seconds())
+            self.offsets[date] = offset
+            return offset
+
+    def to_timestamp(self, local_dt: datetime.datetime) -> float:
+        offset = self.get_offset(local_dt.date())
+        if offset is None:
+            dt = self.tzinfo.normalize(self.tzinfo.localize(local_dt, is_dst=True))
+            timestamp = calendar.timegm(dt.utctimetuple())
+        else:
+            timestamp = calendar.timegm(local_dt.timetuple()) - offset
+        if timestamp > self.now:
+            # some strange bug occurs at midnight: record has `Today` but it is tomorrow already
+            timestamp -= 24 * 60 * 60
+        return timestamp
 
 
 class Parser:
+    TZ: pytz.BaseTzInfo = pytz.utc
+    # when set, only subtrees matching the strainer are built
+    ITEM_ROOT: Optional[bs4.SoupStrainer] = None
+    # when set, only matches of the pattern are used to tell whether the page has changed
+    FINGERPRINT_RE: Optional[Pattern[str]] = None
+    # query parameter with the page number, the listing is not paginated if not set
+    PAGE_PARAM: Optional[str] = None
+    # bounds of the polling interval in seconds, it adapts to how often listings are posted
+    MIN_POLL_INTERVAL: float = 2
+    MAX_POLL_INTERVAL: float = 300
+
+    def __init__(self, backend: str = DEFAULT_BACKEND):
+        self.backend = get_backend(backend)
 
     def get_base_url(self) -> str:
         raise NotImplementedError('`get_base_url` must be implemented')
@@ -29,65 +120,165 @@ class Parser:
     def get_item_url(self, item: bs4.element.Tag) -> str:
         raise NotImplementedError('`get_item_url()` must be implemented.')
 
-    def get_item_created_at(self, item: bs4.element.Tag) -> float:
+    def get_item_created_at(
+            self, item: bs4.element.Tag, dates: Optional[DateContext] = None
+    ) -> float:
         raise NotImplementedError('`get_item_created_at()` must be implemented.')
 
     def build_absolute_url(self, url: str) -> str:
         base_url = self.get_base_url()
         return urllib.parse.urljoin(base_url, url)
 
-    def build_property(self, item: bs4.element.Tag) -> entities.Property:
+    def build_property(
+            self, item: bs4.element.Tag, dates: Optional[DateContext] = None
+    ) -> entities.Property:
         return entities.Property(
             title=self.get_item_title(item),
             url=self.build_absolute_url(self.get_item_url(item)),
             price=self.get_item_price(item),
-            created_at=self.get_item_created_at(item),
+            created_at=self.get_item_created_at(item, dates=dates),
         )
 
+    def get_page_url(self, url: str, page: int) -> Optional[str]:
+        # url of the given page of the listing, None if the site is not paginated
+        if self.PAGE_PARAM is None:
+            return None
+        parts = urllib.parse.urlsplit(url)
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        query[self.PAGE_PARAM] = str(page)
+        return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+    def make_date_context(self) -> DateContext:
+        return DateContext(self.TZ, now=datetime.datetime.now(tz=self.TZ))
+
+    def get_fingerprint(self, content: str) -> str:
+        relevant = ''
+        if self.FINGERPRINT_RE is not None:
+            relevant = ''.join(self.FINGERPRINT_RE.findall(content))
+        return hashlib.sha1((relevant or content).encode()).hexdigest()
+
+    def make_soup(self, content: str) -> bs4.BeautifulSoup:
+        return bs4.BeautifulSoup(content, self.backend, parse_only=self.ITEM_ROOT)
+
+    def iter_properties(self, content: str) -> Iterator[entities.Property]:
+        soup = self.make_soup(content)
+        dates = self.make_date_context()
+        for item in self.get_items(soup):
+            yield self.build_property(item, dates=dates)
+
     def parse(self, content: str) -> List[entities.Property]:
-        soup = bs4.BeautifulSoup(content, 'html.parser')
-        items = self.get_items(soup)
-        return [self.build_property(item) for item in items]
+        return list(self.iter_properties(content))
 
+    def make_item_splitter(self) -> extractors.ItemSplitter:
+        raise NotImplementedError('`make_item_splitter()` must be implemented.')
 
-@registry.add_parser(BAZARAKI_URL)
-class BazarakiParser(Parser):
-    TZ = pytz.timezone('Asia/Nicosia')
+    def make_feed(self) -> 'PropertyFeed':
+        return PropertyFeed(self)
+
+
+class PropertyFeed:
+    # parses properties from a page, that is fed by chunks
+
+    def __init__(self, parser: Parser):
+        self.parser = parser
+        self.splitter = parser.make_item_splitter()
+        self.dates = parser.make_date_context()
+
+    def feed(self, chunk: str) -> Iterator[entities.Property]:
+        for content in self.splitter.feed(chunk):
+            soup = self.parser.make_soup(content)
+            for item in self.parser.get_items(soup):
+                yield self.parser.build_property(item, dates=self.dates)
+
+
+class SpecParser(Parser):
+    # `SPEC` is compiled once per class into a plan,
+    # that collects all fields in one pass over an item
+    SPEC: extractors.ParserSpec
+    PLAN: extractors.ExtractionPlan
+
+    def __init_subclass__(cls) -> None:
+        super().__init_subclass__()
+        cls.TZ = pytz.timezone(cls.SPEC.timezone)
+        cls.ITEM_ROOT = cls.SPEC.item.selector.strainer()
+        if cls.SPEC.fingerprint is not None:
+            cls.FINGERPRINT_RE = re.compile(cls.SPEC.fingerprint)
+        cls.PAGE_PARAM = cls.SPEC.page_param
+        cls.MIN_POLL_INTERVAL, cls.MAX_POLL_INTERVAL = cls.SPEC.poll_interval
+        cls.PLAN = extractors.ExtractionPlan(cls.SPEC.item.fields)
 
     def get_base_url(self) -> str:
-        return BAZARAKI_BASE_URL
+        return self.SPEC.base_url
+
+    def make_item_splitter(self) -> extractors.ItemSplitter:
+        return extractors.ItemSplitter(self.SPEC.item.selector)
 
     def get_items(self, soup: bs4.BeautifulSoup) -> List[bs4.element.Tag]:
-        items: List[bs4.element.Tag] = soup.find_all('li', class_='announcement-container')
+        item = self.SPEC.item.selector
+        items: List[bs4.element.Tag] = soup.find_all(item.name, **item.kwargs)
         return items
 
     def get_item_title(self, item: bs4.element.Tag) -> str:
-        title: str = item.find('a', class_='announcement-block__title').string.strip()
+        title: str = self.PLAN.extract(item)['title']
         return title
 
     def get_item_price(self, item: bs4.element.Tag) -> datatypes.Price:
-        price_block = item.find('div', class_='announcement-block__price')
-        price_tag = price_block.find('meta', attrs={'itemprop': 'price'})
-        price = price_tag.attrs['content']
-        return datatypes.Price(price)
+        price: datatypes.Price = self.PLAN.extract(item)['price']
+        return price
 
     def get_item_url(self, item: bs4.element.Tag) -> str:
-        url: str = item.find('a', class_='announcement-block__title').attrs['href']
+        url: str = self.PLAN.extract(item)['url']
         return url
 
-    def get_item_created_at(self, item: bs4.element.Tag) -> float:
-        dt_block = item.find('div', class_='announcement-block__date')
-        dt_text = dt_block.string.partition(',')[0].strip()
-        now = datetime.datetime.now(tz=self.TZ)
-        if 'Today' in dt_text:
-            today_str = now.strftime('%d.%m.%Y')
-            dt_text = dt_text.replace('Today', today_str)
-        if 'Yesterday' in dt_text:
-            yesterday_dt = now.date() - datetime.timedelta(days=1)
-            dt_text = dt_text.replace('Yesterday', yesterday_dt.strftime('%d.%m.%Y'))
-        local_dt = datetime.datetime.strptime(dt_text, '%d.%m.%Y %H:%M')
-        dt = self.TZ.normalize(self.TZ.localize(local_dt, is_dst=True))
-        if dt > now:
-            # some strange bug occurs at midnight: record has `Today` but it is tomorrow already
-            dt -= datetime.timedelta(days=1)
-        return calendar.timegm(dt.utctimetuple())
+    def get_item_created_at(
+            self, item: bs4.element.Tag, dates: Optional[DateContext] = None
+    ) -> float:
+        if dates is None:
+            dates = self.make_date_context()
+        return dates.resolve(self.PLAN.extract(item)['created_at'])
+
+    def build_property(
+            self, item: bs4.element.Tag, dates: Optional[DateContext] = None
+    ) -> entities.Property:
+        if dates is None:
+            dates = self.make_date_context()
+        values = self.PLAN.extract(item)
+        return entities.Property(
+            title=values['title'],
+            url=self.build_absolute_url(values['url']),
+            price=values['price'],
+            created_at=dates.resolve(values['created_at']),
+        )
+
+
+def strip_location(text: str) -> str:
+    # `Today 12:30, Limassol district, Panthea` -> `Today 12:30`
+    return text.partition(',')[0].strip()
+
+
+@registry.add_parser(
+    BAZARAKI_URL_TEMPLATE, category=BAZARAKI_CATEGORIES, district=BAZARAKI_DISTRICTS
+)
+class BazarakiParser(SpecParser):
+    SPEC = extractors.ParserSpec(
+        base_url=BAZARAKI_BASE_URL,
+        timezone='Asia/Nicosia',
+        item=extractors.ItemSpec(
+            selector=extractors.Selector('li', class_='announcement-container'),
+            title=extractors.Field(extractors.Selector('a', class_='announcement-block__title')),
+            url=extractors.Field(
+                extractors.Selector('a', class_='announcement-block__title'), attr='href'
+            ),
+            price=extractors.Field(
+                extractors.Selector('meta', attrs=(('itemprop', 'price'), )),
+                attr='content',
+                convert=datatypes.Price,
+            ),
+            created_at=extractors.Field(
+                extractors.Selector('div', class_='announcement-block__date'),
+                convert=strip_location,
+            ),
+        ),
+        fingerprint=r'href="/adv/[^"]+"|announcement-block__date">[^,<]+',
+        page_param='page',
+    )
@@ -0,0 +1,77 @@
+import asyncio
+import collections
+import dataclasses
+import logging
+from typing import Any, Awaitable, Callable, Counter, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class PipelineSettings:
+    # providers fetched and parsed at once
+    poll_workers: int = 8
+    match_workers: int = 2
+    # every broadcast is paced on its own, so more workers send messages faster
+    deliver_workers: int = 1
+    # items waiting for each stage, producers wait while the queue is full
+    queue_size: int = 100
+
+
+class Stage:
+    # workers handling items from a bounded queue, every item of the handler result
+    # is passed to the `output` stage; the stage is named after its handler
+
+    def __init__(
+            self,
+            handle: Callable[[Any], Awaitable[Any]],
+            workers: int,
+            queue_size: int,
+            output: Optional['Stage'] = None,
+    ):
+        self.name: str = handle.__name__
+        self.handle = handle
+        self.workers = workers
+        self.queue: 'asyncio.Queue[Any]' = asyncio.Queue(queue_size)
+        self.output = output
+        self.stats: Counter[str] = collections.Counter()
+
+    async def put(self, item: Any) -> None:
+        if self.queue.full():
+            # the stage does not keep up and holds back the previous one
+            self.stats['blocked'] += 1
+            logger.debug('Stage %s is full, waiting', self.name)
+        await self.queue.put(item)
+
+    async def run(self) -> None:
+        await asyncio.gather(*(self.work() for _ in range(self.workers)))
+
+    async def work(self) -> None:
+        while True:
+            item = await self.queue.get()
+            results = await self.process(item)
+            if self.output is not None:
+                for result in results or ():
+                    await self.output.put(result)
+            self.queue.task_done()
+
+    async def join(self) -> None:
+        # waits until every queued item is handled
+        await self.queue.join()
+
+    async def process(self, item: Any) -> Any:
+        try:
+            result = await self.handle(item)
+        except asyncio.CancelledError:
+            # a subclass of `Exception` before Python 3.8
+            raise
+        except Exception:  # pylint: disable=broad-except
+            # one broken item must not stop the pipeline
+            self.stats['failed'] += 1
+            logger.exception('Stage %s failed to handle %r', self.name, item)
+            return None
+        self.stats['handled'] += 1
+        return result
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'queued': self.queue.qsize(), **self.stats}
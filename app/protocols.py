@@ -1,6 +1,6 @@
 # pylint: skip-file
 
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 
 from typing_extensions import Protocol
 
@@ -15,12 +15,22 @@ class DBAdapter(Protocol):
 
     async def select_chats(self, interested_in_price: datatypes.Price) -> List[entities.Chat]: ...
 
+    async def select_all_chats(self) -> List[entities.Chat]: ...
+
+    async def select_chats_by_price(
+            self, prices: Iterable[datatypes.Price]
+    ) -> Dict[datatypes.Price, List[entities.Chat]]: ...
+
     async def create_chat(self, chat_id: int) -> entities.Chat: ...
 
     async def get_chat(self, chat_id: int) -> Optional[entities.Chat]: ...
 
     async def update_chat(self, chat: entities.Chat) -> None: ...
 
+    async def select_cursor_states(self) -> List[entities.CursorState]: ...
+
+    async def save_cursor_states(self, states: List[entities.CursorState]) -> None: ...
+
 
 class BotAdapter(Protocol):
 
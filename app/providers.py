@@ -1,25 +1,284 @@
+import asyncio
 import calendar
+import collections
+import dataclasses
 import datetime
-from typing import List
+import functools
+import random
+import re
+import time
+import urllib.parse
+from concurrent import futures
+from typing import AsyncGenerator, Counter, List, Optional, Tuple
 
 from . import client, entities, parsers
 
+# items are listed newest first, so after that many stale items in a row
+# the rest of the page is not worth parsing
+STALE_LIMIT = 3
+# how many pages are fetched at most and how many of them at once,
+# when there are more new listings than fit on the first page
+MAX_PAGES = 10
+PAGE_FAN_OUT = 3
+# weight of the last poll in the arrival rate estimate
+# and how much intervals are randomized, so providers do not poll in lockstep
+POLL_SMOOTHING = 0.3
+POLL_JITTER = 0.1
+
+
+def utcnow_timestamp() -> float:
+    return calendar.timegm(datetime.datetime.utcnow().utctimetuple())
+
+
+LISTING_ID_RE = re.compile(r'/(\d+)')
+
+# how long and how many listings are remembered to filter out reposts and bumps
+SEEN_WINDOW = 24 * 60 * 60
+SEEN_CAPACITY = 10_000
+
+
+def get_listing_id(url: str) -> str:
+    # numeric id from the path, e.g. `2206100` for `/adv/2206100_house/`, or url itself
+    match = LISTING_ID_RE.search(urllib.parse.urlsplit(url).path)
+    return url if match is None else match.group(1)
+
+
+class SeenSet:
+    # listing ids seen within the last `window` seconds, at most `capacity` of them
+
+    def __init__(self, window: float = SEEN_WINDOW, capacity: int = SEEN_CAPACITY):
+        self.window = window
+        self.capacity = capacity
+        # seen time by id, the oldest first
+        self.seen_at: 'collections.OrderedDict[str, float]' = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.seen_at)
+
+    def __contains__(self, listing_id: str) -> bool:
+        seen_at = self.seen_at.get(listing_id)
+        return seen_at is not None and seen_at > time.time() - self.window
+
+    def add(self, listing_id: str) -> None:
+        now = time.time()
+        self.seen_at[listing_id] = now
+        self.seen_at.move_to_end(listing_id)
+        self.evict(now)
+
+    def items(self) -> List[Tuple[str, float]]:
+        return list(self.seen_at.items())
+
+    def restore(self, items: List[Tuple[str, float]]) -> None:
+        self.seen_at.update(items)
+        self.evict(time.time())
+
+    def evict(self, now: float) -> None:
+        expired_at = now - self.window
+        while self.seen_at:
+            seen_at = next(iter(self.seen_at.values()))
+            if len(self.seen_at) <= self.capacity and seen_at > expired_at:
+                return
+            self.seen_at.popitem(last=False)
+
+
+@dataclasses.dataclass
+class Cursor:
+    latest_created_at: float = dataclasses.field(default_factory=utcnow_timestamp)
+    seen: SeenSet = dataclasses.field(default_factory=SeenSet)
+    fingerprint: Optional[str] = None
+    # whether the cursor has advanced since it was saved
+    changed: bool = False
+
+    def is_new(self, real_property: entities.Property) -> bool:
+        return (
+            real_property.created_at > self.latest_created_at
+            and get_listing_id(real_property.url) not in self.seen
+        )
+
+    def advance(self, properties: List[entities.Property]) -> None:
+        self.latest_created_at = max(p.created_at for p in properties)
+        for real_property in reversed(properties):
+            self.seen.add(get_listing_id(real_property.url))
+        self.changed = True
+
+
+class PollSchedule:
+    # polls as often as one new listing is expected, within the given bounds
+
+    def __init__(self, min_interval: float, max_interval: float):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        # new listings per second, a busy feed is assumed until polls show otherwise
+        self.rate = 1 / min_interval
+
+    def start_delay(self) -> float:
+        return random.uniform(0, self.min_interval)
+
+    def next_delay(self, found: int) -> float:
+        self.rate = POLL_SMOOTHING * found / self.interval + (1 - POLL_SMOOTHING) * self.rate
+        interval = 1 / self.rate if self.rate else self.max_interval
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        return self.interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+
+@dataclasses.dataclass
+class Updates:
+    properties: List[entities.Property]
+    # whether the page has listings, that are not new
+    reached_cursor: bool
+
+    @property
+    def all_new(self) -> bool:
+        return bool(self.properties) and not self.reached_cursor
+
+
+class UpdateCollector:
+
+    def __init__(self, cursor: Cursor):
+        self.cursor = cursor
+        self.updates: List[entities.Property] = []
+        self.stale = 0
+        self.reached_cursor = False
+
+    def add(self, real_property: entities.Property) -> bool:
+        # returns False when the rest of the page is not worth parsing
+        if self.cursor.is_new(real_property):
+            self.updates.append(real_property)
+            self.stale = 0
+            return True
+        self.stale += 1
+        self.reached_cursor = True
+        return self.stale < STALE_LIMIT
+
+
+def collect_updates(parser: parsers.Parser, content: str, cursor: Cursor) -> Updates:
+    collector = UpdateCollector(cursor)
+    for real_property in parser.iter_properties(content):
+        if not collector.add(real_property):
+            break
+    return Updates(collector.updates, reached_cursor=collector.reached_cursor)
+
+
+def merge_updates(properties: List[entities.Property]) -> List[entities.Property]:
+    # listings move to next pages while they are fetched, so the same listing can be met twice
+    unique = {get_listing_id(p.url): p for p in reversed(properties)}
+    return sorted(unique.values(), key=lambda p: p.created_at, reverse=True)
+
 
 class Provider:
 
-    def __init__(self, url: str, parser: parsers.Parser, webclient: client.Client):
+    def __init__(
+            self,
+            url: str,
+            parser: parsers.Parser,
+            webclient: client.Client,
+            executor: Optional[futures.Executor] = None,
+    ):
         self.client = webclient
         self.url = url
         self.parser = parser
-        self.latest_created_at: float = calendar.timegm(datetime.datetime.utcnow().utctimetuple())
-        self.recently_seen: List[str] = []
+        self.executor = executor
+        self.cursor = Cursor()
+        self.schedule = PollSchedule(parser.MIN_POLL_INTERVAL, parser.MAX_POLL_INTERVAL)
+        self.stats: Counter[str] = collections.Counter()
+
+    def get_state(self) -> entities.CursorState:
+        return entities.CursorState(
+            url=self.url,
+            latest_created_at=self.cursor.latest_created_at,
+            seen=self.cursor.seen.items(),
+        )
+
+    def restore(self, state: entities.CursorState, not_before: float) -> None:
+        # listings older than `not_before` are skipped even if they were never sent,
+        # so a long downtime does not end with a flood of outdated listings
+        self.cursor.latest_created_at = max(state.latest_created_at, not_before)
+        self.cursor.seen.restore(state.seen)
 
     async def get_updates(self) -> List[entities.Property]:
-        content = await self.client.get(self.url)
-        properties = self.parser.parse(content)
-        properties = [p for p in properties if p.created_at > self.latest_created_at]
-        properties = [p for p in properties if p.url not in self.recently_seen]
+        content = await self.fetch(self.url)
+        if content is None:
+            return []
+        fingerprint = self.parser.get_fingerprint(content)
+        if fingerprint == self.cursor.fingerprint:
+            self.stats['skipped'] += 1
+            return []
+        self.stats['parsed'] += 1
+        updates = await self.parse(content)
+        self.cursor.fingerprint = fingerprint
+        properties = updates.properties
+        if updates.all_new:
+            properties = merge_updates(properties + await self.catch_up())
         if properties:
-            self.latest_created_at = max(p.created_at for p in properties)
-            self.recently_seen = ([p.url for p in properties] + self.recently_seen)[:10]
+            self.cursor.advance(properties)
+        return properties
+
+    async def fetch(self, url: str) -> Optional[str]:
+        result = await self.client.get(url)
+        if result.status is client.FetchStatus.NOT_MODIFIED:
+            self.stats['not_modified'] += 1
+            return None
+        if result.status is client.FetchStatus.FAILED:
+            # the page is unknown, so neither fingerprint nor cursor should change
+            self.stats['failed'] += 1
+            return None
+        return result.text
+
+    async def catch_up(self) -> List[entities.Property]:
+        # the whole first page is new, so following pages are fetched a few at once,
+        # until a page with already seen listings is reached
+        properties: List[entities.Property] = []
+        for first_page in range(2, MAX_PAGES + 1, PAGE_FAN_OUT):
+            pages = range(first_page, min(first_page + PAGE_FAN_OUT, MAX_PAGES + 1))
+            urls = [self.parser.get_page_url(self.url, page) for page in pages]
+            results = await asyncio.gather(*(self.get_page_updates(url) for url in urls if url))
+            for updates in results:
+                properties.extend(updates.properties)
+            if not results or not all(updates.all_new for updates in results):
+                break
         return properties
+
+    async def get_page_updates(self, url: str) -> Updates:
+        content = await self.fetch(url)
+        if content is None:
+            return Updates([], reached_cursor=True)
+        self.stats['pages'] += 1
+        return await self.parse(content)
+
+    async def parse(self, content: str) -> Updates:
+        collect = functools.partial(collect_updates, self.parser, content, self.cursor)
+        if self.executor is None:
+            return collect()
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, collect)
+
+
+class StreamingProvider(Provider):
+    # parses items while the page is being downloaded
+    # and drops the connection as soon as stale items are reached
+
+    async def get_updates(self) -> List[entities.Property]:
+        feed = self.parser.make_feed()
+        collector = UpdateCollector(self.cursor)
+        chunks = self.client.stream(self.url)
+        try:
+            await self.collect(feed, chunks, collector)
+        finally:
+            await chunks.aclose()
+        if collector.updates:
+            self.cursor.advance(collector.updates)
+        return collector.updates
+
+    async def collect(
+            self,
+            feed: parsers.PropertyFeed,
+            chunks: AsyncGenerator[str, None],
+            collector: UpdateCollector,
+    ) -> None:
+        async for chunk in chunks:
+            for real_property in feed.feed(chunk):
+                if not collector.add(real_property):
+                    self.stats['stopped_early'] += 1
+                    return
+        self.stats['streamed'] += 1
@@ -1,11 +1,25 @@
+import itertools
+from typing import List, Mapping, Sequence
+
+
+def expand_url(template: str, params: Mapping[str, Sequence[str]]) -> List[str]:
+    # one url for each combination of parameter values, e.g. every district in every category
+    names = list(params)
+    return [
+        template.format(**dict(zip(names, values)))
+        for values in itertools.product(*params.values())
+    ]
+
+
 class ParserRegistry:
 
     def __init__(self):
         self.parser_classes = {}
 
-    def add(self, url):
+    def add(self, url, params=None):
         def wrapper(parser_class):
-            self.parser_classes[url] = parser_class
+            for expanded_url in expand_url(url, params or {}):
+                self.parser_classes[expanded_url] = parser_class
             return parser_class
         return wrapper
 
@@ -13,8 +27,9 @@ class ParserRegistry:
 _parser_registry = ParserRegistry()  # pylint: disable=invalid-name
 
 
-def add_parser(url: str):
-    return _parser_registry.add(url)
+def add_parser(url: str, **params: Sequence[str]):
+    # `url` is a template if `params` are given, e.g. `add_parser('/{district}/', district=[...])`
+    return _parser_registry.add(url, params)
 
 
 def list_parsers():
@@ -1,4 +1,4 @@
-from typing import Awaitable, Callable, Dict, Type
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional, Sequence, Type
 
 from . import parsers
 
@@ -6,19 +6,24 @@ ParserClass = Type[parsers.Parser]
 Task = Callable[..., Awaitable[None]]
 
 
+def expand_url(template: str, params: Mapping[str, Sequence[str]]) -> List[str]: ...
+
+
 class ParserRegistry:
 
     parser_classes: Dict[str, ParserClass]
 
     def __init__(self): ...
 
-    def add(self, url: str) -> Callable[[ParserClass], ParserClass]: ...
+    def add(
+            self, url: str, params: Optional[Mapping[str, Sequence[str]]] = None
+    ) -> Callable[[ParserClass], ParserClass]: ...
 
 
 parser_registry: ParserRegistry
 
 
-def add_parser(url: str) -> Callable[[ParserClass], ParserClass]: ...
+def add_parser(url: str, **params: Sequence[str]) -> Callable[[ParserClass], ParserClass]: ...
 
 
 def list_parsers() -> Dict[str, ParserClass]: ...
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import collections
+import json
+import random
+import sys
+import time
+from typing import Any, Counter, Dict, Iterable, List, Optional, Sequence, Type
+
+from . import adapters, archive, datatypes, entities, parsers, providers, registry, services
+
+MIN_PRICES = [None, 300, 500, 1000]
+MAX_PRICES = [None, 1500, 3000]
+
+
+def make_chats(count: int, seed: int = 0) -> List[entities.Chat]:
+    # chats with different price filters, so updates are matched like in production
+    rng = random.Random(seed)
+    chats = []
+    for chat_id in range(count):
+        min_price, max_price = rng.choice(MIN_PRICES), rng.choice(MAX_PRICES)
+        chats.append(entities.Chat(
+            id=chat_id,
+            min_price=datatypes.Price(min_price) if min_price else None,
+            max_price=datatypes.Price(max_price) if max_price else None,
+        ))
+    return chats
+
+
+class Replay:
+
+    def __init__(self, backend: str = parsers.DEFAULT_BACKEND, chats: int = 100):
+        self.backend = backend
+        self.webclient = archive.ReplayClient()
+        self.providers: Dict[str, providers.Provider] = {}
+        self.parsers: Dict[Type[parsers.Parser], parsers.Parser] = {}
+        self.bot_adapter = adapters.MemoryBotAdapter()
+        self.send_service = services.SendService(
+            bot_adapter=self.bot_adapter,
+            db_adapter=adapters.MemoryDBAdapter(make_chats(chats)),
+            providers=[],
+        )
+        self.stats: Counter[str] = collections.Counter()
+
+    def get_provider(self, url: str) -> Optional[providers.Provider]:
+        parser_class = registry.list_parsers().get(url)
+        if url not in self.providers and parser_class is not None:
+            if parser_class not in self.parsers:
+                self.parsers[parser_class] = parser_class(backend=self.backend)
+            provider = providers.Provider(
+                url, parser=self.parsers[parser_class], webclient=self.webclient
+            )
+            # relative dates are resolved against the current day, not the recording one,
+            # so the cursor is not aligned with the archive and the first page is new entirely
+            provider.cursor.latest_created_at = 0
+            self.providers[url] = provider
+        return self.providers.get(url)
+
+    async def run(self, records: Iterable[archive.Record]) -> None:
+        for record in records:
+            provider = self.get_provider(record.url)
+            if provider is None:
+                self.stats['skipped'] += 1
+                continue
+            self.webclient.push(record)
+            updates = await provider.get_updates()
+            await self.send_service.send(updates)
+            self.stats['updates'] += len(updates)
+            self.stats['pages'] += 1
+
+    def report(self, seconds: float) -> Dict[str, Any]:
+        return {
+            'seconds': seconds,
+            'pages': self.stats['pages'],
+            'skipped': self.stats['skipped'],
+            'updates': self.stats['updates'],
+            'messages': self.bot_adapter.messages,
+            'suppressed': self.send_service.stats['suppressed'],
+            'pages_per_second': self.stats['pages'] / seconds,
+            'updates_per_second': self.stats['updates'] / seconds,
+            'providers': {url: dict(provider.stats) for url, provider in self.providers.items()},
+        }
+
+
+async def replay(path: str, backend: str, chats: int) -> Dict[str, Any]:
+    runner = Replay(backend=backend, chats=chats)
+    start = time.perf_counter()
+    try:
+        await runner.run(archive.read_archive(path))
+    finally:
+        await runner.webclient.close()
+    return runner.report(seconds=time.perf_counter() - start)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    argparser = argparse.ArgumentParser(
+        prog='python -m app replay',
+        description='Push recorded pages through providers, parsers and send service',
+    )
+    argparser.add_argument('archive', help='archive written with `RECORD_ARCHIVE` set')
+    argparser.add_argument('--backend', default=parsers.DEFAULT_BACKEND)
+    argparser.add_argument('--chats', type=int, default=100, help='number of chats to match')
+    args = argparser.parse_args(argv)
+    loop = asyncio.get_event_loop()
+    report = loop.run_until_complete(replay(args.archive, backend=args.backend, chats=args.chats))
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
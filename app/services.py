@@ -1,32 +1,155 @@
 import asyncio
+import collections
 import dataclasses
-import itertools
-from typing import AsyncGenerator, List
+import logging
+import time
+from typing import AsyncGenerator, Counter, Dict, List
 
-from . import datatypes, entities, protocols
+from . import datatypes, dedup, digests, entities, pipeline, protocols
 from . import providers as providers_module
 
+logger = logging.getLogger(__name__)
+
 
 @dataclasses.dataclass
-class SendService:
+class SendService:  # pylint: disable=too-many-instance-attributes
     bot_adapter: protocols.BotAdapter
     db_adapter: protocols.DBAdapter
     providers: List[providers_module.Provider]
+    pipeline_settings: pipeline.PipelineSettings = pipeline.PipelineSettings()
+    # fingerprints of sent listings, the same listing is often posted under several urls
+    fingerprints: dedup.FingerprintIndex = dataclasses.field(
+        default_factory=dedup.FingerprintIndex
+    )
+    # listings waiting to be sent to chats in digest mode
+    digest_buffer: digests.DigestBuffer = dataclasses.field(default_factory=digests.DigestBuffer)
+    stats: Counter[str] = dataclasses.field(default_factory=collections.Counter)
+    stages: List[pipeline.Stage] = dataclasses.field(default_factory=list)
 
     async def start_sending(self) -> None:
-        async for update in self.get_updates(interval=2):
-            chats = await self.db_adapter.select_chats(interested_in_price=update.price)
-            text = f'[{update.title} €{update.price}]({update.telegram_link})'
-            await self.bot_adapter.broadcast(chats=chats, text=text)
+        # fetch and parse -> match -> deliver, stages are connected by bounded queues,
+        # so polling goes on while messages are sent and is held back only by a full queue;
+        # digests are sent by their own stage, once their window is over
+        settings = self.pipeline_settings
+        deliver = pipeline.Stage(self.deliver, settings.deliver_workers, settings.queue_size)
+        match = pipeline.Stage(
+            self.match, settings.match_workers, settings.queue_size, output=deliver
+        )
+        send_digest = pipeline.Stage(
+            self.send_digest, settings.deliver_workers, settings.queue_size
+        )
+        self.stages = [match, deliver, send_digest]
+        workers = [asyncio.ensure_future(stage.run()) for stage in self.stages]
+        workers.append(asyncio.ensure_future(self.flush_digests(send_digest)))
+        try:
+            async for updates in self.get_updates():
+                await match.put(updates)
+            # updates are over, the queued ones are still sent, digests without waiting
+            await match.join()
+            await deliver.join()
+            await self.put_digests(send_digest, self.digest_buffer.pop_all())
+            await send_digest.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def get_pipeline_stats(self) -> Dict[str, Dict[str, int]]:
+        return {stage.name: stage.get_stats() for stage in self.stages}
+
+    async def send(self, updates: List[entities.Property]) -> None:
+        for delivery in await self.match(updates):
+            await self.deliver(delivery)
+
+    async def match(self, updates: List[entities.Property]) -> List[entities.Delivery]:
+        # updates of one poll are matched with chats at once
+        updates = [update for update in updates if not self.is_duplicate(update)]
+        if not updates:
+            return []
+        chats = await self.db_adapter.select_chats_by_price(update.price for update in updates)
+        return [entities.Delivery(update, chats=chats[update.price]) for update in updates]
 
-    async def get_updates(self, interval: float) -> AsyncGenerator[entities.Property, None]:
+    async def deliver(self, delivery: entities.Delivery) -> None:
+        update = delivery.property
+        chats = []
+        for chat in delivery.chats:
+            if chat.digest:
+                self.digest_buffer.add(chat, update)
+            else:
+                chats.append(chat)
+        await self.bot_adapter.broadcast(chats=chats, text=update.markdown_link)
+
+    async def flush_digests(self, stage: pipeline.Stage) -> None:
         while True:
-            futures = [provider.get_updates() for provider in self.providers]
-            result = await asyncio.gather(*futures)
-            properties = itertools.chain.from_iterable(result)
-            for real_property in properties:
-                yield real_property
-            await asyncio.sleep(interval)
+            await asyncio.sleep(self.digest_buffer.get_delay())
+            await self.put_digests(stage, self.digest_buffer.pop_due())
+
+    @staticmethod
+    async def put_digests(stage: pipeline.Stage, due: List[entities.Digest]) -> None:
+        for digest in due:
+            await stage.put(digest)
+
+    async def send_digest(self, digest: entities.Digest) -> None:
+        # one message instead of one per listing, unless the digest is too long for it
+        for text in digests.format_digest(digest):
+            await self.bot_adapter.broadcast(chats=[digest.chat], text=text)
+        self.stats['digested'] += len(digest.properties)
+
+    def is_duplicate(self, update: entities.Property) -> bool:
+        value = dedup.fingerprint(update)
+        if value is None:
+            return False
+        duplicate = self.fingerprints.find(value)
+        # reposts keep being suppressed while they keep coming
+        self.fingerprints.add(value)
+        if duplicate:
+            self.stats['suppressed'] += 1
+        return duplicate
+
+    async def get_updates(self) -> AsyncGenerator[List[entities.Property], None]:
+        # every provider is polled on its own schedule, new listings of a poll are yielded at once
+        settings = self.pipeline_settings
+        queue: 'asyncio.Queue[List[entities.Property]]' = asyncio.Queue(settings.queue_size)
+        semaphore = asyncio.Semaphore(settings.poll_workers)
+        tasks = [
+            asyncio.ensure_future(self.poll(provider, queue, semaphore))
+            for provider in self.providers
+        ]
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def poll(
+            self,
+            provider: providers_module.Provider,
+            queue: 'asyncio.Queue[List[entities.Property]]',
+            semaphore: asyncio.Semaphore,
+    ) -> None:
+        await asyncio.sleep(provider.schedule.start_delay())
+        while True:
+            updates = await self.poll_once(provider, semaphore)
+            if updates:
+                await queue.put(updates)
+            await asyncio.sleep(provider.schedule.next_delay(found=len(updates)))
+
+    @staticmethod
+    async def poll_once(
+            provider: providers_module.Provider, semaphore: asyncio.Semaphore
+    ) -> List[entities.Property]:
+        try:
+            async with semaphore:
+                return await provider.get_updates()
+        except asyncio.CancelledError:
+            # a subclass of `Exception` before Python 3.8
+            raise
+        except Exception:  # pylint: disable=broad-except
+            # one broken provider must not stop the others
+            logger.exception('Failed to get updates from %s', provider.url)
+            return []
 
 
 @dataclasses.dataclass
@@ -52,3 +175,38 @@ class ChatService:
             raise ValueError('Max price must be greater than min price')
         chat.max_price = price
         await self.db_adapter.update_chat(chat)
+
+    async def toggle_digest(self, chat_id: int) -> bool:
+        chat = await self.get_or_create(chat_id)
+        chat.digest = not chat.digest
+        await self.db_adapter.update_chat(chat)
+        return chat.digest
+
+
+@dataclasses.dataclass
+class CursorService:
+    # cursors are saved in batches, so polls do not wait for the database
+    db_adapter: protocols.DBAdapter
+    providers: List[providers_module.Provider]
+
+    async def load(self, catch_up: float) -> None:
+        # `catch_up` is how many seconds back listings missed during downtime are sent
+        not_before = time.time() - catch_up
+        states = {state.url: state for state in await self.db_adapter.select_cursor_states()}
+        for provider in self.providers:
+            if provider.url in states:
+                provider.restore(states[provider.url], not_before=not_before)
+
+    async def save(self) -> None:
+        changed = [provider for provider in self.providers if provider.cursor.changed]
+        if not changed:
+            return
+        states = [provider.get_state() for provider in changed]
+        for provider in changed:
+            provider.cursor.changed = False
+        await self.db_adapter.save_cursor_states(states)
+
+    async def start_saving(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.save()
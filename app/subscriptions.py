@@ -0,0 +1,145 @@
+import bisect
+import decimal
+import itertools
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import datatypes, entities
+
+# price filters of a chat, a missing bound is infinite
+Interval = Tuple[decimal.Decimal, decimal.Decimal]
+Entry = Tuple[decimal.Decimal, int]
+
+NEGATIVE_INFINITY = decimal.Decimal('-Infinity')
+INFINITY = decimal.Decimal('Infinity')
+# intervals used to pick the center of a node, when the tree is built
+CENTER_SAMPLE_SIZE = 101
+
+
+def get_interval(chat: entities.Chat) -> Interval:
+    return (
+        NEGATIVE_INFINITY if chat.min_price is None else chat.min_price,
+        INFINITY if chat.max_price is None else chat.max_price,
+    )
+
+
+def get_center(intervals: Iterable[Interval]) -> decimal.Decimal:
+    # median of finite bounds, so about as many intervals lie on each side
+    bounds = sorted(filter(decimal.Decimal.is_finite, itertools.chain.from_iterable(intervals)))
+    return bounds[len(bounds) // 2] if bounds else decimal.Decimal(0)
+
+
+class Node:
+    # intervals containing the center, intervals below and above it are in the subtrees
+
+    def __init__(self, center: decimal.Decimal):
+        self.center = center
+        self.left: Optional[Node] = None
+        self.right: Optional[Node] = None
+        # (lower bound, chat id) and (upper bound, chat id) in ascending order
+        self.by_min: List[Entry] = []
+        self.by_max: List[Entry] = []
+
+    def add(self, chat_id: int, interval: Interval) -> None:
+        bisect.insort(self.by_min, (interval[0], chat_id))
+        bisect.insort(self.by_max, (interval[1], chat_id))
+
+    def remove(self, chat_id: int, interval: Interval) -> None:
+        del self.by_min[bisect.bisect_left(self.by_min, (interval[0], chat_id))]
+        del self.by_max[bisect.bisect_left(self.by_max, (interval[1], chat_id))]
+
+    def stab(self, price: decimal.Decimal) -> Tuple[List[int], Optional['Node']]:
+        # ids of chats interested in the price and the subtree to continue with;
+        # entries are scanned only while they match, so the cost is the number of matches
+        if price < self.center:
+            matches = itertools.takewhile(lambda entry: entry[0] <= price, self.by_min)
+            return [chat_id for _, chat_id in matches], self.left
+        if price > self.center:
+            matches = itertools.takewhile(lambda entry: entry[0] >= price, reversed(self.by_max))
+            return [chat_id for _, chat_id in matches], self.right
+        return [chat_id for _, chat_id in self.by_min], None
+
+
+def build(intervals: List[Tuple[int, Interval]], rng: random.Random) -> Optional[Node]:
+    # balanced tree, every node keeps at least the sampled interval its center is taken from
+    if not intervals:
+        return None
+    sample = rng.sample(intervals, min(len(intervals), CENTER_SAMPLE_SIZE))
+    node = Node(get_center(interval for _, interval in sample))
+    left, right = [], []
+    for chat_id, interval in intervals:
+        if interval[1] < node.center:
+            left.append((chat_id, interval))
+        elif interval[0] > node.center:
+            right.append((chat_id, interval))
+        else:
+            node.by_min.append((interval[0], chat_id))
+            node.by_max.append((interval[1], chat_id))
+    node.by_min.sort()
+    node.by_max.sort()
+    node.left, node.right = build(left, rng), build(right, rng)
+    return node
+
+
+class SubscriptionIndex:
+    # centered interval tree of chat price filters, a price is matched in O(log n + k),
+    # where k is the number of matching chats
+
+    def __init__(self):
+        self.root: Optional[Node] = None
+        self.chats: Dict[int, entities.Chat] = {}
+        self.intervals: Dict[int, Interval] = {}
+
+    def __len__(self) -> int:
+        return len(self.chats)
+
+    def load(self, chats: Iterable[entities.Chat]) -> None:
+        self.chats = {chat.id: chat for chat in chats}
+        self.intervals = {chat.id: get_interval(chat) for chat in self.chats.values()}
+        self.root = build(list(self.intervals.items()), random.Random(0))
+
+    def update(self, chat: entities.Chat) -> None:
+        if chat.id in self.intervals:
+            self.locate(self.intervals[chat.id]).remove(chat.id, self.intervals[chat.id])
+        self.chats[chat.id] = chat
+        self.intervals[chat.id] = get_interval(chat)
+        self.locate(self.intervals[chat.id]).add(chat.id, self.intervals[chat.id])
+
+    def locate(self, interval: Interval) -> Node:
+        # the first node with the center within the interval, created if there is none;
+        # nodes created after the tree is built are centered on the interval they are made for
+        if self.root is None:
+            self.root = Node(get_center([interval]))
+        node = self.root
+        while not interval[0] <= node.center <= interval[1]:
+            side = 'left' if interval[1] < node.center else 'right'
+            if getattr(node, side) is None:
+                setattr(node, side, Node(get_center([interval])))
+            node = getattr(node, side)
+        return node
+
+    def match(self, price: datatypes.Price) -> List[entities.Chat]:
+        chat_ids: List[int] = []
+        node = self.root
+        while node is not None:
+            matches, node = node.stab(price)
+            chat_ids.extend(matches)
+        return [self.chats[chat_id] for chat_id in sorted(chat_ids)]
+
+    def match_many(
+            self, prices: Iterable[datatypes.Price]
+    ) -> Dict[datatypes.Price, List[entities.Chat]]:
+        return {price: self.match(price) for price in prices}
+
+    def check(self, chats: Iterable[entities.Chat]) -> List[int]:
+        # ids of chats, that are missing, stale or unexpected in the index;
+        # matched chats are delivered according to their mode, so it is compared too
+        expected = {chat.id: (get_interval(chat), chat.digest) for chat in chats}
+        actual = {
+            chat_id: (interval, self.chats[chat_id].digest)
+            for chat_id, interval in self.intervals.items()
+        }
+        return sorted(
+            chat_id for chat_id in expected.keys() | actual.keys()
+            if expected.get(chat_id) != actual.get(chat_id)
+        )
@@ -0,0 +1,65 @@
+"""
+Compares html backends of the `BazarakiParser` on a real listing page.
+
+Usage:
+
+    python -m benchmarks.backends [--repeat N] [backend ...]
+"""
+
+import argparse
+import timeit
+import tracemalloc
+from importlib import resources
+from typing import List, Tuple
+
+from app import parsers
+
+BACKENDS = ['html.parser', 'lxml', 'html5lib']
+
+
+def read_page() -> str:
+    return resources.read_text('tests.data', 'bazaraki_list.html')
+
+
+def measure_time(parser: parsers.Parser, content: str, repeat: int) -> float:
+    timer = timeit.Timer(lambda: parser.parse(content))
+    return min(timer.repeat(repeat=repeat, number=1))
+
+
+def measure_memory(parser: parsers.Parser, content: str) -> Tuple[int, int]:
+    tracemalloc.start()
+    try:
+        soup = parser.make_soup(content)
+        parser.get_items(soup)
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+    return peak, blocks
+
+
+def run(backends: List[str], repeat: int) -> None:
+    content = read_page()
+    print(f'{"backend":<12} {"time, ms":>10} {"peak, KiB":>10} {"blocks":>8}')
+    print('(blocks - memory blocks held by the parsed tree)')
+    for backend in backends:
+        if parsers.get_backend(backend) != backend:
+            print(f'{backend:<12} {"not installed":>30}')
+            continue
+        parser = parsers.BazarakiParser(backend=backend)
+        elapsed = measure_time(parser, content, repeat=repeat)
+        peak, blocks = measure_memory(parser, content)
+        print(f'{backend:<12} {elapsed * 1000:>10.2f} {peak / 1024:>10.1f} {blocks:>8}')
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Compare parser backends')
+    argparser.add_argument('backends', nargs='*', default=BACKENDS)
+    argparser.add_argument('--repeat', type=int, default=10)
+    args = argparser.parse_args()
+    run(args.backends, repeat=args.repeat)
+
+
+if __name__ == '__main__':
+    main()
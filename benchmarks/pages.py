@@ -0,0 +1,50 @@
+"""
+Generates bazaraki-shaped listing pages of an arbitrary size.
+
+Page layout and item markup are taken from `tests/data/bazaraki_list.html`.
+"""
+
+import datetime
+import random
+from importlib import resources
+from typing import Tuple
+
+ITEM_START = '<li class="announcement-container"'
+ITEM_END = '</li>'
+
+SAMPLE_SLUG = '2206100_panthea-near-grammar-school'
+SAMPLE_TITLE = 'Panthea near grammar school'
+SAMPLE_PRICE = 'content="3500.00"'
+SAMPLE_DATE = 'Today 00:00'
+
+
+def read_sample() -> str:
+    return resources.read_text('tests.data', 'bazaraki_list.html')
+
+
+def split_sample(content: str) -> Tuple[str, str, str]:
+    start = content.index(ITEM_START)
+    item_end = content.index(ITEM_END, start) + len(ITEM_END)
+    end = content.rindex(ITEM_END) + len(ITEM_END)
+    return content[:start], content[start:item_end], content[end:]
+
+
+def make_item(template: str, number: int, created_at: datetime.datetime) -> str:
+    return (
+        template
+        .replace(SAMPLE_SLUG, f'{3000000 + number}_listing-{number}')
+        .replace(SAMPLE_TITLE, f'Listing {number}')
+        .replace(SAMPLE_PRICE, f'content="{random.randint(300, 5000)}.00"')
+        .replace(SAMPLE_DATE, created_at.strftime('%d.%m.%Y %H:%M'))
+    )
+
+
+def make_page(size: int, seed: int = 0) -> str:
+    random.seed(seed)
+    head, template, tail = split_sample(read_sample())
+    created_at = datetime.datetime(2019, 1, 29, 23, 59)
+    items = []
+    for number in range(size):
+        items.append(make_item(template, number, created_at=created_at))
+        created_at -= datetime.timedelta(minutes=random.randint(1, 30))
+    return ''.join([head, *items, tail])
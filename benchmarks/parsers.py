@@ -0,0 +1,96 @@
+"""
+Measures `BazarakiParser` throughput on generated pages of a growing size.
+
+Usage:
+
+    python -m benchmarks.parsers [--sizes 10 100 ...] [--backend lxml] [--output results.json]
+
+Results are written as JSON, so runs can be compared with each other.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from app import parsers
+
+from . import pages
+
+SIZES = [10, 100, 1_000, 10_000]
+EXTRACTORS = ['get_item_title', 'get_item_price', 'get_item_url', 'get_item_created_at']
+
+
+def timed(func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def measure_peak_memory(func: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def measure_parse(parser: parsers.Parser, content: str, size: int) -> Dict[str, float]:
+    elapsed = timed(lambda: parser.parse(content))
+    return {
+        'seconds_per_page': elapsed,
+        'items_per_second': size / elapsed,
+        'peak_memory_bytes': measure_peak_memory(lambda: parser.parse(content)),
+    }
+
+
+def measure_extractors(parser: parsers.Parser, content: str) -> Dict[str, float]:
+    items = parser.get_items(parser.make_soup(content))
+    dates = parser.make_date_context()
+    results = {}
+    for name in EXTRACTORS:
+        extractor = getattr(parser, name)
+        kwargs = {'dates': dates} if name == 'get_item_created_at' else {}
+        start = time.perf_counter()
+        for item in items:
+            extractor(item, **kwargs)
+        results[name] = len(items) / (time.perf_counter() - start)
+    return results
+
+
+def run(sizes: List[int], backend: str) -> Dict[str, Any]:
+    parser = parsers.BazarakiParser(backend=backend)
+    results = []
+    for size in sizes:
+        content = pages.make_page(size)
+        results.append({
+            'size': size,
+            'page_bytes': len(content.encode()),
+            'parse': measure_parse(parser, content, size=size),
+            'extractors_items_per_second': measure_extractors(parser, content),
+        })
+        print(f'{size:>6} items: {results[-1]["parse"]["seconds_per_page"]:.3f}s', file=sys.stderr)
+    return {
+        'python': platform.python_version(),
+        'backend': parser.backend,
+        'results': results,
+    }
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Benchmark parsers on generated pages')
+    argparser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    argparser.add_argument('--backend', default=parsers.DEFAULT_BACKEND)
+    argparser.add_argument('--output', type=argparse.FileType('w'), default=sys.stdout)
+    args = argparser.parse_args()
+    json.dump(run(args.sizes, backend=args.backend), args.output, indent=2)
+    args.output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
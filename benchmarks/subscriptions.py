@@ -0,0 +1,112 @@
+"""
+Compares matching chats with listing prices in the in-memory index and in SQLite.
+
+Usage:
+
+    python -m benchmarks.subscriptions [--sizes 10000 100000 ...] [--queries N] \
+        [--output results.json]
+
+Results are written as JSON, so runs can be compared with each other.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from app import adapters, datatypes, entities, subscriptions
+
+SIZES = [10_000, 100_000, 1_000_000]
+QUERIES = 100
+
+
+def make_chats(count: int, rng: random.Random) -> List[entities.Chat]:
+    # a quarter of chats has no filter, the rest is interested in a price range or a bound
+    chats = []
+    for chat_id in range(count):
+        min_price = rng.choice([None, rng.randrange(100, 3000)])
+        max_price = rng.choice([None, (min_price or 100) + rng.randrange(100, 3000)])
+        chats.append(entities.Chat(
+            id=chat_id,
+            min_price=datatypes.Price.from_optional(min_price),
+            max_price=datatypes.Price.from_optional(max_price),
+        ))
+    return chats
+
+
+def measure_index(chats: List[entities.Chat], prices: List[datatypes.Price]) -> Dict[str, float]:
+    index = subscriptions.SubscriptionIndex()
+    start = time.perf_counter()
+    index.load(chats)
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    matches = sum(len(index.match(price)) for price in prices)
+    return {
+        'load_seconds': load_seconds,
+        'seconds_per_query': (time.perf_counter() - start) / len(prices),
+        'matches_per_query': matches / len(prices),
+    }
+
+
+def to_float(price: Optional[datatypes.Price]) -> Optional[float]:
+    return None if price is None else float(price)
+
+
+async def measure_sqlite(
+        chats: List[entities.Chat], prices: List[datatypes.Price]
+) -> Dict[str, float]:
+    db_adapter = adapters.SqliteDBAdapter(':memory:')
+    await db_adapter.create_tables()
+    connect = await db_adapter.get_connection()
+    rows = [
+        (chat.id, to_float(chat.min_price), to_float(chat.max_price))
+        for chat in chats
+    ]
+    await connect.executemany('INSERT INTO chat (id, min_price, max_price) VALUES (?, ?, ?)', rows)
+    await connect.commit()
+    start = time.perf_counter()
+    matches = 0
+    for price in prices:
+        matches += len(await db_adapter.select_chats(interested_in_price=price))
+    elapsed = time.perf_counter() - start
+    await db_adapter.close()
+    return {'seconds_per_query': elapsed / len(prices), 'matches_per_query': matches / len(prices)}
+
+
+def run(sizes: List[int], queries: int) -> Dict[str, Any]:
+    rng = random.Random(0)
+    prices = [datatypes.Price(rng.randrange(100, 6000)) for _ in range(queries)]
+    loop = asyncio.get_event_loop()
+    results = []
+    for size in sizes:
+        chats = make_chats(size, rng)
+        index = measure_index(chats, prices)
+        sqlite = loop.run_until_complete(measure_sqlite(chats, prices))
+        # both must find the same chats
+        assert index['matches_per_query'] == sqlite['matches_per_query']
+        results.append({
+            'chats': size,
+            'index': index,
+            'sqlite': sqlite,
+            'speedup': sqlite['seconds_per_query'] / index['seconds_per_query'],
+        })
+        print(f'{size:>9} chats: {results[-1]["speedup"]:.1f}x', file=sys.stderr)
+    return {'python': platform.python_version(), 'queries': queries, 'results': results}
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Benchmark matching chats with prices')
+    argparser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    argparser.add_argument('--queries', type=int, default=QUERIES)
+    argparser.add_argument('--output', type=argparse.FileType('w'), default=sys.stdout)
+    args = argparser.parse_args()
+    json.dump(run(args.sizes, queries=args.queries), args.output, indent=2)
+    args.output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -16,7 +16,40 @@ def fake_bot_token():
 
 @pytest.fixture
 def conf_mock(amocker, fake_bot_token):
-    return amocker.Mock(bot_token=fake_bot_token, database=':memory:', sentry_dsn=None)
+    return amocker.Mock(
+        bot_token=fake_bot_token,
+        database=':memory:',
+        sentry_dsn=None,
+        parser_backend='html.parser',
+        parser_executor='inline',
+        parser_workers=1,
+        http_limit_per_host=4,
+        http_keepalive_timeout=30,
+        http_dns_cache_ttl=300,
+        http_connect_timeout=5,
+        http_read_timeout=10,
+        http_total_timeout=20,
+        http_rate_limit=1,
+        http_rate_burst=4,
+        http_retries=2,
+        http_retry_backoff=0.5,
+        fetch_mode='full',
+        record_archive=None,
+        seen_window_hours=24,
+        seen_capacity=10000,
+        cursor_catch_up_hours=6,
+        cursor_save_interval=60,
+        poll_concurrency=8,
+        dedup_window_hours=24,
+        match_workers=2,
+        deliver_workers=1,
+        pipeline_queue_size=100,
+        index_check_interval=3600,
+        digest_window_minutes=10,
+        send_rate_limit=25,
+        send_rate_burst=5,
+        send_concurrency=8,
+    )
 
 
 @pytest.fixture
@@ -50,6 +83,8 @@ def chat_factory(faker):
 def parser_mock(amocker):
     from app import parsers
     parser = amocker.Mock(spec=parsers.Parser)
+    parser.get_page_url.return_value = None
+    parser.MIN_POLL_INTERVAL, parser.MAX_POLL_INTERVAL = 2, 300
     return parser
 
 
@@ -57,6 +92,7 @@ def parser_mock(amocker):
 def client_mock(amocker):
     from app import client
     webclient = amocker.Mock(spec=client.Client)
+    webclient.get = amocker.CoroutineMock(return_value=client.FetchResult(client.FetchStatus.OK))
     return webclient
 
 
@@ -97,7 +133,9 @@ def bot_adapter_mock(amocker):
 @pytest.fixture
 def send_service(amocker, bot_adapter_mock, db_adapter_mock):
     from app import services
-    db_adapter_mock.select_chats = amocker.CoroutineMock(return_value=[])
+    db_adapter_mock.select_chats_by_price = amocker.CoroutineMock(
+        side_effect=lambda prices: {price: [] for price in prices}
+    )
     return services.SendService(
         bot_adapter=bot_adapter_mock,
         db_adapter=db_adapter_mock,
@@ -167,11 +205,15 @@ def application_mock(amocker):
 
 
 @pytest.fixture(scope='session')
-def bazaraki_soup():
-    import bs4
+def bazaraki_content():
     from importlib import resources
-    content = resources.read_text('tests.data', 'bazaraki_list.html')
-    return bs4.BeautifulSoup(content, 'html.parser')
+    return resources.read_text('tests.data', 'bazaraki_list.html')
+
+
+@pytest.fixture(scope='session')
+def bazaraki_soup(bazaraki_content):
+    import bs4
+    return bs4.BeautifulSoup(bazaraki_content, 'html.parser')
 
 
 @pytest.fixture
@@ -197,3 +239,79 @@ def bazaraki_end_of_today_date_item(bazaraki_soup):
 @pytest.fixture
 def bazaraki_yesterday_date_item(bazaraki_soup):
     return bazaraki_soup.find_all('li', class_='announcement-container')[-2]
+
+
+@pytest.fixture
+def spec_item():
+    import bs4
+    content = '''
+        <li class="item">
+          <a class="title link" href="/adv/1/">  House  </a>
+          <div class="price"><meta itemprop="price" content="700.00"></div>
+          <div class="date">Today 12:30, Limassol</div>
+        </li>
+    '''
+    return bs4.BeautifulSoup(content, 'html.parser').li
+
+
+@pytest.fixture
+def item_spec():
+    from app import datatypes, extractors
+    return extractors.ItemSpec(
+        selector=extractors.Selector('li', class_='item'),
+        title=extractors.Field(extractors.Selector('a', class_='title')),
+        url=extractors.Field(extractors.Selector('a', class_='title'), attr='href'),
+        price=extractors.Field(
+            extractors.Selector('meta', attrs=(('itemprop', 'price'), )),
+            attr='content',
+            convert=datatypes.Price,
+        ),
+        created_at=extractors.Field(extractors.Selector('div', class_='date')),
+    )
+
+
+@pytest.fixture
+def spec_parser_class():
+    from app import datatypes, extractors, parsers
+
+    class ExampleParser(parsers.SpecParser):
+        SPEC = extractors.ParserSpec(
+            base_url='https://example.com',
+            timezone='Asia/Nicosia',
+            item=extractors.ItemSpec(
+                selector=extractors.Selector('li', class_='item'),
+                title=extractors.Field(extractors.Selector('a')),
+                url=extractors.Field(extractors.Selector('a'), attr='href'),
+                price=extractors.Field(extractors.Selector('b'), convert=datatypes.Price),
+                created_at=extractors.Field(extractors.Selector('i')),
+            ),
+            fingerprint=r'<li[^>]*>',
+        )
+    return ExampleParser
+
+
+@pytest.fixture
+def record_factory():
+    from app import archive, client
+
+    def wrapper(url='https://realestates.com/list', text='<li>Λεμεσός</li>', timestamp=1548675840):
+        result = client.FetchResult(client.FetchStatus.OK, text=text)
+        return archive.Record(timestamp=timestamp, url=url, result=result)
+    return wrapper
+
+
+@pytest.fixture
+def archive_path(tmp_path, record_factory, bazaraki_content):
+    from app import archive, parsers
+    path = str(tmp_path / 'archive.jsonl.gz')
+    writer = archive.ArchiveWriter(path)
+    for url in [parsers.BAZARAKI_URL, parsers.BAZARAKI_URL, 'https://unknown.com']:
+        writer.write(record_factory(url=url, text=bazaraki_content))
+    writer.close()
+    return path
+
+
+@pytest.fixture
+def no_jitter(amocker):
+    with amocker.patch('random.uniform', side_effect=lambda low, high: (low + high) / 2) as mock:
+        yield mock
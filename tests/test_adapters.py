@@ -73,13 +73,54 @@ async def test_sqlite_db_adapter_select_chats(sqlite_db_adapter: adapters.Sqlite
     assert chat_id_list == [1, 2, 5, 6, 7]
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize('max_variables', [adapters.MAX_VARIABLES, 1])
+async def test_sqlite_db_adapter_select_chats_by_price(
+        amocker, max_variables, sqlite_db_adapter: adapters.SqliteDBAdapter
+):
+    await sqlite_db_adapter.connect.execute('''
+        INSERT INTO
+            chat (id, min_price, max_price)
+        VALUES
+            (1, 550.0, 700.0),
+            (2, 700.0, 1000.0),
+            (3, 400.0, 600.0),
+            (4, null, null)
+    ''')
+    prices = [datatypes.Price(700), datatypes.Price('450.50'), datatypes.Price(2000)]
+
+    with amocker.patch('app.adapters.MAX_VARIABLES', max_variables):
+        chats = await sqlite_db_adapter.select_chats_by_price(prices)
+
+    assert {price: [chat.id for chat in chats[price]] for price in chats} == {
+        datatypes.Price(700): [1, 2, 4],
+        datatypes.Price('450.50'): [3, 4],
+        datatypes.Price(2000): [4],
+    }
+
+
+@pytest.mark.asyncio
+async def test_sqlite_db_adapter_select_chats_by_price_in_one_query(
+        amocker, sqlite_db_adapter: adapters.SqliteDBAdapter
+):
+    prices = [datatypes.Price(price) for price in range(1, 21)]
+    with amocker.patch.object(
+            sqlite_db_adapter, 'execute', wraps=sqlite_db_adapter.execute
+    ) as execute_mock:
+        chats = await sqlite_db_adapter.select_chats_by_price(prices)
+        assert await sqlite_db_adapter.select_chats_by_price([]) == {}
+
+    assert chats == {price: [] for price in prices}
+    assert execute_mock.call_count == 1
+
+
 @pytest.mark.asyncio
 async def test_sqlite_db_adapter_create_tables(sqlite_db_adapter: adapters.SqliteDBAdapter):
     assert await sqlite_db_adapter.create_tables() is None
 
-    statement = 'SELECT * FROM chat'
-    async with sqlite_db_adapter.connect.execute(statement) as cursor:
-        assert await cursor.fetchall() == []
+    for statement in ['SELECT * FROM chat', 'SELECT * FROM cursor']:
+        async with sqlite_db_adapter.connect.execute(statement) as cursor:
+            assert await cursor.fetchall() == []
 
 
 @pytest.mark.asyncio
@@ -123,6 +164,26 @@ async def test_sqlite_db_adapter_update_chat(
     updated_chat = await sqlite_db_adapter.get_chat(chat_id=chat.id)
     assert updated_chat.min_price == min_price
     assert updated_chat.max_price is None
+    assert not updated_chat.digest
+
+    chat.digest = True
+    await sqlite_db_adapter.update_chat(chat)
+
+    assert (await sqlite_db_adapter.get_chat(chat_id=chat.id)).digest
+
+
+@pytest.mark.asyncio
+async def test_sqlite_db_adapter_create_tables_adds_missing_columns():
+    db_adapter = adapters.SqliteDBAdapter(':memory:')
+    connect = await db_adapter.get_connection()
+    await connect.execute('CREATE TABLE chat (id INTEGER PRIMARY KEY, min_price, max_price)')
+    await connect.execute('INSERT INTO chat (id) VALUES (1)')
+
+    await db_adapter.create_tables()
+    await db_adapter.create_tables()
+
+    assert await db_adapter.select_all_chats() == [entities.Chat(id=1)]
+    await db_adapter.close()
 
 
 @pytest.mark.asyncio
@@ -130,10 +191,24 @@ async def test_sqlite_db_adapter_row_to_chat(
         chat_factory, sqlite_db_adapter: adapters.SqliteDBAdapter
 ):
     chat = chat_factory(max_price=datatypes.Price(700))
-    row = {'id': chat.id, 'min_price': None, 'max_price': 700}
+    row = {'id': chat.id, 'min_price': None, 'max_price': 700, 'digest': 0}
     assert sqlite_db_adapter.row_to_chat(row) == chat
 
 
+@pytest.mark.asyncio
+async def test_sqlite_db_adapter_save_cursor_states(sqlite_db_adapter: adapters.SqliteDBAdapter):
+    first = entities.CursorState(url='https://ex.com/1', latest_created_at=100, seen=[])
+    second = entities.CursorState(
+        url='https://ex.com/2', latest_created_at=200, seen=[('2', 150.5), ('1', 160.0)]
+    )
+    await sqlite_db_adapter.save_cursor_states([first, second])
+    first.latest_created_at = 300
+    await sqlite_db_adapter.save_cursor_states([first])
+
+    states = await sqlite_db_adapter.select_cursor_states()
+    assert sorted(states, key=lambda state: state.url) == [first, second]
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize('committed', [False, True])
 async def test_sqlite_db_adapter_execute(
@@ -171,6 +246,7 @@ async def test_bot_adapter_broadcast(chat_factory, bot_adapter: adapters.BotAdap
     chat = chat_factory()
     assert await bot_adapter.broadcast(chats=[chat], text='') is None
     assert bot_adapter.bot.send_message.called
+    assert bot_adapter.scheduler.stats == {'sent': 1}
 
 
 @pytest.mark.asyncio
@@ -183,3 +259,123 @@ async def test_bot_adapter_broadcast_exc(amocker, chat_factory, bot_adapter: ada
     bot_adapter.bot.send_message = amocker.CoroutineMock(side_effect=raise_exc)
     assert await bot_adapter.broadcast(chats=[chat], text='') is None
     assert bot_adapter.bot.send_message.called
+    assert bot_adapter.scheduler.stats == {'blocked': 1}
+
+
+@pytest.mark.asyncio
+async def test_memory_db_adapter_select_chats():
+    chats = [
+        entities.Chat(id=1),
+        entities.Chat(id=2, min_price=datatypes.Price(500)),
+        entities.Chat(id=3, max_price=datatypes.Price(600)),
+        entities.Chat(id=4, min_price=datatypes.Price(100), max_price=datatypes.Price(200)),
+    ]
+    db_adapter = adapters.MemoryDBAdapter(chats)
+    await db_adapter.create_tables()
+
+    selected = await db_adapter.select_chats(interested_in_price=datatypes.Price(550))
+    await db_adapter.close()
+
+    assert [chat.id for chat in selected] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_memory_db_adapter_select_chats_by_price():
+    chats = [entities.Chat(id=1), entities.Chat(id=2, min_price=datatypes.Price(500))]
+    db_adapter = adapters.MemoryDBAdapter(chats)
+
+    selected = await db_adapter.select_chats_by_price([datatypes.Price(100), datatypes.Price(600)])
+
+    assert selected == {datatypes.Price(100): chats[:1], datatypes.Price(600): chats}
+
+
+@pytest.mark.asyncio
+async def test_memory_db_adapter_chats():
+    db_adapter = adapters.MemoryDBAdapter()
+    chat = await db_adapter.create_chat(1)
+    chat.min_price = datatypes.Price(100)
+    await db_adapter.update_chat(chat)
+
+    assert await db_adapter.get_chat(1) == entities.Chat(id=1, min_price=datatypes.Price(100))
+    assert await db_adapter.get_chat(2) is None
+
+
+@pytest.mark.asyncio
+async def test_memory_db_adapter_cursor_states():
+    db_adapter = adapters.MemoryDBAdapter()
+    state = entities.CursorState(url='https://ex.com/1', latest_created_at=100, seen=[('1', 50)])
+    await db_adapter.save_cursor_states([state])
+
+    assert await db_adapter.select_cursor_states() == [state]
+
+
+@pytest.mark.asyncio
+async def test_memory_bot_adapter_broadcast(chat_factory):
+    bot_adapter = adapters.MemoryBotAdapter()
+    await bot_adapter.broadcast(chats=[chat_factory(), chat_factory()], text='test')
+    await bot_adapter.close()
+
+    assert bot_adapter.messages == 2
+
+
+@pytest.mark.asyncio
+async def test_sqlite_db_adapter_select_all_chats(sqlite_db_adapter: adapters.SqliteDBAdapter):
+    await sqlite_db_adapter.connect.execute(
+        'INSERT INTO chat (id, min_price, max_price) VALUES (1, 550.0, null), (2, null, null)'
+    )
+    assert await sqlite_db_adapter.select_all_chats() == [
+        entities.Chat(id=1, min_price=datatypes.Price(550)), entities.Chat(id=2)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_indexed_db_adapter_matches_chats_from_index():
+    chats = [entities.Chat(id=1), entities.Chat(id=2, min_price=datatypes.Price(500))]
+    db_adapter = adapters.IndexedDBAdapter(adapters.MemoryDBAdapter(chats))
+    await db_adapter.create_tables()
+    await db_adapter.load_index()
+    db_adapter.db_adapter.chats.clear()  # the database is not queried
+
+    assert await db_adapter.select_chats(interested_in_price=datatypes.Price(600)) == chats
+    assert await db_adapter.select_chats_by_price([datatypes.Price(100)]) == {
+        datatypes.Price(100): chats[:1]
+    }
+    await db_adapter.close()
+
+
+@pytest.mark.asyncio
+async def test_indexed_db_adapter_writes_through():
+    db_adapter = adapters.IndexedDBAdapter(adapters.MemoryDBAdapter())
+    chat = await db_adapter.create_chat(1)
+    chat.max_price = datatypes.Price(300)
+    assert await db_adapter.select_chats(interested_in_price=datatypes.Price(400)) == [
+        entities.Chat(id=1)
+    ]
+
+    await db_adapter.update_chat(chat)
+
+    assert await db_adapter.get_chat(1) == chat
+    assert await db_adapter.select_all_chats() == [chat]
+    assert await db_adapter.select_chats(interested_in_price=datatypes.Price(400)) == []
+    assert await db_adapter.check_index() == []
+
+
+@pytest.mark.asyncio
+async def test_indexed_db_adapter_cursor_states():
+    db_adapter = adapters.IndexedDBAdapter(adapters.MemoryDBAdapter())
+    state = entities.CursorState(url='https://example.com', latest_created_at=1, seen=[])
+    await db_adapter.save_cursor_states([state])
+    assert await db_adapter.select_cursor_states() == [state]
+
+
+@pytest.mark.asyncio
+async def test_indexed_db_adapter_start_checking_reloads_index(amocker):
+    memory_adapter = adapters.MemoryDBAdapter()
+    db_adapter = adapters.IndexedDBAdapter(memory_adapter)
+    await memory_adapter.create_chat(1)  # written past the index
+
+    with amocker.patch('asyncio.sleep', side_effect=[None, None, ValueError()]):
+        with pytest.raises(ValueError):
+            await db_adapter.start_checking(interval=60)
+
+    assert await db_adapter.check_index() == []
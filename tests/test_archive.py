@@ -0,0 +1,50 @@
+import pytest
+
+from app import archive, client
+
+
+def test_record_json(record_factory):
+    record = record_factory(timestamp=1548675840.5)
+    assert archive.Record.from_json(record.to_json()) == record
+
+
+def test_archive_writer_appends_records(tmp_path, record_factory):
+    record = record_factory()
+    path = str(tmp_path / 'archive.jsonl.gz')
+    result = client.FetchResult(client.FetchStatus.NOT_MODIFIED)
+    not_modified = archive.Record(timestamp=1548675842, url=record.url, result=result)
+    for written in [record, not_modified]:
+        writer = archive.ArchiveWriter(path)
+        writer.write(written)
+        writer.close()
+
+    assert list(archive.read_archive(path)) == [record, not_modified]
+
+
+@pytest.mark.asyncio
+async def test_recording_client_get(tmp_path, aresponses):
+    path = str(tmp_path / 'archive.jsonl.gz')
+    host = 'realestates.com'
+    aresponses.add(host, '/list', 'get', response='test')
+
+    webclient = archive.RecordingClient(path)
+    result = await webclient.get(f'https://{host}/list')
+    await webclient.close()
+
+    [recorded] = archive.read_archive(path)
+    assert recorded.url == f'https://{host}/list'
+    assert recorded.result == result == client.FetchResult(client.FetchStatus.OK, text='test')
+
+
+@pytest.mark.asyncio
+async def test_replay_client_get(record_factory):
+    record = record_factory()
+    webclient = archive.ReplayClient()
+    webclient.push(record)
+
+    assert await webclient.get(record.url) == record.result
+    result = await webclient.get(record.url)
+    await webclient.close()
+
+    assert result.status is client.FetchStatus.FAILED
+    assert webclient.stats == {'replayed': 1, 'not_recorded': 1}
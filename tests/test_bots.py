@@ -90,3 +90,18 @@ async def test_telegram_bot_set_max_price_chat_service_raise_value_error(
     await telegram_bot.set_max_price(message, state=state)
     assert message.reply.called
     assert message.reply.call_args == amocker.call('Invalid Price', reply=False)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(['digest', 'expected_message'], [
+    (True, 'Digest mode is on, new advertisements will be sent together'),
+    (False, 'Digest mode is off, every new advertisement will be sent at once'),
+])
+async def test_telegram_bot_toggle_digest(
+        amocker, telegram_bot: bots.TelegramBot, digest, expected_message
+):
+    message = amocker.Mock(chat=amocker.Mock(id=1), reply=amocker.CoroutineMock())
+    telegram_bot.chat_service.toggle_digest.return_value = digest
+    await telegram_bot.toggle_digest(message)
+    assert telegram_bot.chat_service.toggle_digest.call_args == amocker.call(1)
+    assert message.reply.call_args == amocker.call(expected_message, reply=False)
@@ -1,3 +1,6 @@
+import asyncio
+import gzip
+
 import aiohttp
 import pytest
 
@@ -11,6 +14,27 @@ async def test_client_init():
     await webclient.close()
 
 
+@pytest.mark.asyncio
+async def test_client_init_with_settings():
+    settings = client.ClientSettings(
+        limit_per_host=2,
+        keepalive_timeout=60,
+        dns_cache_ttl=10,
+        connect_timeout=1,
+        read_timeout=2,
+        total_timeout=3,
+    )
+    webclient = client.Client(settings=settings)
+    connector = webclient.session.connector
+    timeout = webclient.session._timeout  # pylint: disable=protected-access
+    await webclient.close()
+
+    assert connector.limit_per_host == 2
+    assert connector._keepalive_timeout == 60  # pylint: disable=protected-access
+    assert connector.use_dns_cache
+    assert (timeout.connect, timeout.sock_read, timeout.total) == (1, 2, 3)
+
+
 @pytest.mark.asyncio
 async def test_client_close(amocker):
     webclient = client.Client()
@@ -29,9 +53,11 @@ async def test_client_get(aresponses):
     aresponses.add(host, path, 'get', response='')
 
     webclient = client.Client()
-    assert await webclient.get(f'https://{host}{path}') == ''
+    result = await webclient.get(f'https://{host}{path}')
     await webclient.close()
 
+    assert result == client.FetchResult(client.FetchStatus.OK)
+
 
 @pytest.mark.asyncio
 async def test_client_get_raises_error(aresponses):
@@ -40,5 +66,288 @@ async def test_client_get_raises_error(aresponses):
     aresponses.add(host, path, 'get', response=aiohttp.ClientOSError)
 
     webclient = client.Client()
-    assert await webclient.get(f'https://{host}{path}') == ''
+    result = await webclient.get(f'https://{host}{path}')
+    await webclient.close()
+
+    assert result.status is client.FetchStatus.FAILED
+    assert result.error == 'ServerDisconnectedError()'
+    assert webclient.stats['errors'] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_get_accepts_compressed_response(aresponses):
+    def handler(request):
+        assert 'gzip' in request.headers['Accept-Encoding']
+        body = gzip.compress(b'<div>test</div>' * 100)
+        return aresponses.Response(body=body, headers={'Content-Encoding': 'gzip'})
+
+    host = 'realestates.com'
+    aresponses.add(host, '/list', 'get', response=handler)
+
+    webclient = client.Client()
+    assert (await webclient.get(f'https://{host}/list')).text == '<div>test</div>' * 100
+    await webclient.close()
+
+    compressed_size = len(gzip.compress(b'<div>test</div>' * 100))
+    assert webclient.stats['bytes_received'] == compressed_size
+    assert webclient.stats['bytes_saved'] == 1500 - compressed_size
+
+
+@pytest.mark.asyncio
+async def test_client_get_sends_conditional_request(aresponses):
+    validators = {'ETag': '"v1"', 'Last-Modified': 'Tue, 29 Jan 2019 10:00:00 GMT'}
+
+    def not_modified(request):
+        assert request.headers['If-None-Match'] == '"v1"'
+        assert request.headers['If-Modified-Since'] == 'Tue, 29 Jan 2019 10:00:00 GMT'
+        return aresponses.Response(status=304)
+
+    host = 'realestates.com'
+    aresponses.add(host, '/list', 'get', aresponses.Response(text='test', headers=validators))
+    aresponses.add(host, '/list', 'get', response=not_modified)
+
+    webclient = client.Client()
+    assert (await webclient.get(f'https://{host}/list')).text == 'test'
+    result = await webclient.get(f'https://{host}/list')
+    assert result == client.FetchResult(client.FetchStatus.NOT_MODIFIED)
+    await webclient.close()
+
+    assert webclient.stats['not_modified'] == 1
+    assert webclient.stats['bytes_saved'] == len('test')
+
+
+@pytest.mark.asyncio
+async def test_client_get_does_not_remember_validators_of_error(aresponses):
+    host = 'realestates.com'
+    response = aresponses.Response(status=404, text='error', headers={'ETag': '"v1"'})
+    aresponses.add(host, '/list', 'get', response)
+
+    webclient = client.Client()
+    result = await webclient.get(f'https://{host}/list')
+    await webclient.close()
+
+    assert result.status is client.FetchStatus.FAILED
+    assert webclient.validators == {}
+    assert 'retries' not in webclient.stats
+
+
+@pytest.mark.asyncio
+async def test_client_get_remembers_only_complete_pages(aresponses):
+    host = 'realestates.com'
+    response = aresponses.Response(status=203, text='partial', headers={'ETag': '"v1"'})
+    aresponses.add(host, '/list', 'get', response)
+
+    webclient = client.Client()
+    assert (await webclient.get(f'https://{host}/list')).text == 'partial'
+    await webclient.close()
+
+    assert webclient.validators == {}
+    assert webclient.sizes == {}
+
+
+@pytest.mark.asyncio
+async def test_client_bytes_saved_per_hour(amocker):
+    webclient = client.Client()
+    webclient.stats['bytes_saved'] = 1000
+    webclient.started_at = 0
+    with amocker.patch('time.monotonic', return_value=1800):
+        assert webclient.bytes_saved_per_hour == 2000
+    with amocker.patch('time.monotonic', return_value=0):
+        assert webclient.bytes_saved_per_hour == 0
+    await webclient.close()
+
+
+@pytest.mark.asyncio
+async def test_client_get_reuses_connections(aresponses):
+    host = 'realestates.com'
+    aresponses.add(host, '/list', 'get', response='test', repeat=2)
+
+    webclient = client.Client()
+    assert (await webclient.get(f'https://{host}/list')).text == 'test'
+    assert (await webclient.get(f'https://{host}/list')).text == 'test'
+    await webclient.close()
+
+    assert webclient.stats['connections_created'] == 1
+    assert webclient.stats['connections_reused'] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_get_timeout(aresponses):
+    async def slow_response(request):
+        del request
+        await asyncio.sleep(2)
+        return aresponses.Response(text='test')
+
+    host = 'realestates.com'
+    aresponses.add(host, '/list', 'get', response=slow_response)
+
+    settings = client.ClientSettings(total_timeout=0.1, policy=client.RequestPolicy(retries=0))
+    webclient = client.Client(settings=settings)
+    result = await webclient.get(f'https://{host}/list')
+    await webclient.close()
+
+    assert result.status is client.FetchStatus.FAILED
+    assert webclient.stats['timeouts'] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_get_retries_server_errors(aresponses):
+    host = 'realestates.com'
+    aresponses.add(host, '/list', 'get', aresponses.Response(status=503), repeat=2)
+    aresponses.add(host, '/list', 'get', response='test')
+
+    policy = client.RequestPolicy(retries=2, retry_backoff=0)
+    webclient = client.Client(settings=client.ClientSettings(policy=policy))
+    result = await webclient.get(f'https://{host}/list')
+    await webclient.close()
+
+    assert result == client.FetchResult(client.FetchStatus.OK, text='test')
+    assert webclient.stats['retries'] == 2
+
+
+@pytest.mark.asyncio
+async def test_client_get_gives_up_after_retries(aresponses):
+    host = 'realestates.com'
+    aresponses.add(host, '/list', 'get', aresponses.Response(status=500), repeat=3)
+
+    policy = client.RequestPolicy(retries=2, retry_backoff=0)
+    webclient = client.Client(settings=client.ClientSettings(policy=policy))
+    result = await webclient.get(f'https://{host}/list')
+    await webclient.close()
+
+    assert result.status is client.FetchStatus.FAILED
+    assert 'ServerError' in result.error
+    assert webclient.stats['retries'] == 2
+    assert webclient.stats['errors'] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_backoff_is_exponential_with_jitter(amocker):
+    webclient = client.Client(settings=client.ClientSettings(policy=client.RequestPolicy()))
+    with amocker.patch('asyncio.sleep') as sleep_mock:
+        await webclient.backoff(1)
+        await webclient.backoff(3)
+    await webclient.close()
+
+    first, third = (call[0][0] for call in sleep_mock.call_args_list)
+    assert 0.25 <= first <= 0.5
+    assert 1 <= third <= 2
+
+
+@pytest.mark.asyncio
+async def test_client_throttle_uses_bucket_per_host(amocker):
+    webclient = client.Client()
+    with amocker.patch.object(client.TokenBucket, 'acquire') as acquire_mock:
+        await webclient.throttle('https://realestates.com/list?page=1')
+        await webclient.throttle('https://realestates.com/list?page=2')
+        await webclient.throttle('https://other.com/list')
+    await webclient.close()
+
+    assert set(webclient.buckets) == {'realestates.com', 'other.com'}
+    assert acquire_mock.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst(amocker):
+    bucket = client.TokenBucket(rate=2, capacity=3)
+    with amocker.patch('asyncio.sleep') as sleep_mock:
+        for _ in range(3):
+            await bucket.acquire()
+        assert not sleep_mock.called
+
+        await bucket.acquire()
+        await bucket.acquire()
+
+    delays = [call[0][0] for call in sleep_mock.call_args_list]
+    assert delays == pytest.approx([0.5, 1], abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refills(amocker):
+    with amocker.patch('time.monotonic', return_value=100):
+        bucket = client.TokenBucket(rate=2, capacity=3)
+        bucket.tokens = 0
+    with amocker.patch('time.monotonic', return_value=101), \
+            amocker.patch('asyncio.sleep') as sleep_mock:
+        await bucket.acquire()
+        await bucket.acquire()
+
+    assert not sleep_mock.called
+    assert bucket.tokens == 0
+
+
+@pytest.mark.asyncio
+async def test_client_stream_fails_on_error_status(aresponses):
+    host = 'realestates.com'
+    aresponses.add(host, '/list', 'get', aresponses.Response(status=500, text='error'))
+
+    webclient = client.Client()
+    assert await read_stream(webclient, f'https://{host}/list') == []
     await webclient.close()
+
+    assert webclient.stats['errors'] == 1
+
+
+async def read_stream(webclient, url):
+    return [chunk async for chunk in webclient.stream(url)]
+
+
+@pytest.mark.asyncio
+async def test_client_stream(amocker, aresponses):
+    host = 'realestates.com'
+    text = 'Λεμεσός ' * 1000
+    aresponses.add(host, '/list', 'get', aresponses.Response(text=text, headers={'ETag': '"v1"'}))
+
+    webclient = client.Client()
+    with amocker.patch('app.client.CHUNK_SIZE', 1000):
+        chunks = await read_stream(webclient, f'https://{host}/list')
+    await webclient.close()
+
+    assert len(chunks) > 2
+    assert ''.join(chunks) == text
+    assert webclient.stats['bytes_streamed'] == len(text.encode())
+    assert webclient.validators == {f'https://{host}/list': {'If-None-Match': '"v1"'}}
+
+
+@pytest.mark.asyncio
+async def test_client_stream_not_modified(aresponses):
+    host = 'realestates.com'
+    aresponses.add(host, '/list', 'get', aresponses.Response(status=304))
+
+    webclient = client.Client()
+    webclient.validators[f'https://{host}/list'] = {'If-None-Match': '"v1"'}
+    assert await read_stream(webclient, f'https://{host}/list') == []
+    await webclient.close()
+
+    assert webclient.stats['not_modified'] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_stream_forgets_validators_on_error(aresponses):
+    host = 'realestates.com'
+    aresponses.add(host, '/list', 'get', response=aiohttp.ClientOSError)
+
+    webclient = client.Client()
+    webclient.validators[f'https://{host}/list'] = {'If-None-Match': '"v1"'}
+    assert await read_stream(webclient, f'https://{host}/list') == []
+    await webclient.close()
+
+    assert webclient.validators == {}
+    assert webclient.stats['timeouts'] == 0
+
+
+@pytest.mark.asyncio
+async def test_client_stream_timeout(aresponses):
+    async def slow_response(request):
+        del request
+        await asyncio.sleep(2)
+        return aresponses.Response(text='test')
+
+    host = 'realestates.com'
+    aresponses.add(host, '/list', 'get', response=slow_response)
+
+    webclient = client.Client(settings=client.ClientSettings(total_timeout=0.1))
+    assert await read_stream(webclient, f'https://{host}/list') == []
+    await webclient.close()
+
+    assert webclient.stats['timeouts'] == 1
@@ -60,3 +60,293 @@ def test_database_sentry_release_version(amocker, fake_bot_token):
     with amocker.patch.dict(os.environ, envs):
         conf = config.Config()
         assert conf.sentry_release_version == 'rentbot@2.2.0'
+
+
+def test_parser_backend_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('PARSER_BACKEND', None)  # in case it is set in ENV
+        conf = config.Config()
+        assert conf.parser_backend == 'html.parser'
+
+
+def test_parser_backend_env_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'PARSER_BACKEND': 'lxml'}
+    with amocker.patch.dict(os.environ, envs):
+        conf = config.Config()
+        assert conf.parser_backend == 'lxml'
+
+
+def test_parser_executor_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('PARSER_EXECUTOR', None)  # in case it is set in ENV
+        conf = config.Config()
+        assert conf.parser_executor == 'inline'
+
+
+def test_parser_executor_env_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'PARSER_EXECUTOR': 'process'}
+    with amocker.patch.dict(os.environ, envs):
+        conf = config.Config()
+        assert conf.parser_executor == 'process'
+
+
+def test_parser_executor_raises_improperly_configured(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'PARSER_EXECUTOR': 'gpu'}
+    with amocker.patch.dict(os.environ, envs):
+        conf = config.Config()
+        with pytest.raises(config.ImproperlyConfigured):
+            assert conf.parser_executor
+
+
+def test_parser_workers_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('PARSER_WORKERS', None)  # in case it is set in ENV
+        conf = config.Config()
+        assert conf.parser_workers == 2
+
+
+def test_parser_workers_env_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'PARSER_WORKERS': '4'}
+    with amocker.patch.dict(os.environ, envs):
+        conf = config.Config()
+        assert conf.parser_workers == 4
+
+
+@pytest.mark.parametrize(['name', 'expected'], [
+    ('http_limit_per_host', 4),
+    ('http_keepalive_timeout', 30),
+    ('http_dns_cache_ttl', 300),
+    ('http_connect_timeout', 5),
+    ('http_read_timeout', 10),
+    ('http_total_timeout', 20),
+    ('http_rate_limit', 1),
+    ('http_rate_burst', 4),
+    ('http_retries', 2),
+    ('http_retry_backoff', 0.5),
+])
+def test_http_settings_default_value(amocker, fake_bot_token, name, expected):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop(name.upper(), None)  # in case it is set in ENV
+        conf = config.Config()
+        assert getattr(conf, name) == expected
+
+
+@pytest.mark.parametrize(['name', 'value', 'expected'], [
+    ('http_limit_per_host', '8', 8),
+    ('http_keepalive_timeout', '60', 60.0),
+    ('http_dns_cache_ttl', '10', 10),
+    ('http_connect_timeout', '1.5', 1.5),
+    ('http_read_timeout', '2.5', 2.5),
+    ('http_total_timeout', '3.5', 3.5),
+    ('http_rate_limit', '0.5', 0.5),
+    ('http_rate_burst', '1', 1),
+    ('http_retries', '0', 0),
+    ('http_retry_backoff', '2', 2.0),
+])
+def test_http_settings_env_value(amocker, fake_bot_token, name, value, expected):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, name.upper(): value}
+    with amocker.patch.dict(os.environ, envs):
+        conf = config.Config()
+        assert getattr(conf, name) == expected
+
+
+def test_fetch_mode_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('FETCH_MODE', None)  # in case it is set in ENV
+        conf = config.Config()
+        assert conf.fetch_mode == 'full'
+
+
+def test_fetch_mode_env_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'FETCH_MODE': 'stream'}
+    with amocker.patch.dict(os.environ, envs):
+        conf = config.Config()
+        assert conf.fetch_mode == 'stream'
+
+
+def test_fetch_mode_raises_improperly_configured(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'FETCH_MODE': 'partial'}
+    with amocker.patch.dict(os.environ, envs):
+        conf = config.Config()
+        with pytest.raises(config.ImproperlyConfigured):
+            assert conf.fetch_mode
+
+
+def test_record_archive_is_none(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('RECORD_ARCHIVE', None)  # in case it is set in ENV
+        conf = config.Config()
+        assert conf.record_archive is None
+
+
+def test_record_archive(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'RECORD_ARCHIVE': 'archive.jsonl.gz'}
+    with amocker.patch.dict(os.environ, envs):
+        conf = config.Config()
+        assert conf.record_archive == 'archive.jsonl.gz'
+
+
+def test_seen_settings_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('SEEN_WINDOW_HOURS', None)  # in case it is set in ENV
+        os.environ.pop('SEEN_CAPACITY', None)
+        conf = config.Config()
+        assert conf.seen_window_hours == 24
+        assert conf.seen_capacity == 10000
+
+
+def test_seen_settings_env_value(amocker, fake_bot_token):
+    envs = {
+        'TELEGRAM_BOT_TOKEN': fake_bot_token,
+        'SEEN_WINDOW_HOURS': '0.5',
+        'SEEN_CAPACITY': '100',
+    }
+    with amocker.patch.dict(os.environ, envs):
+        conf = config.Config()
+        assert conf.seen_window_hours == 0.5
+        assert conf.seen_capacity == 100
+
+
+def test_cursor_settings_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('CURSOR_CATCH_UP_HOURS', None)  # in case it is set in ENV
+        os.environ.pop('CURSOR_SAVE_INTERVAL', None)
+        conf = config.Config()
+        assert conf.cursor_catch_up_hours == 6
+        assert conf.cursor_save_interval == 60
+
+
+def test_cursor_settings_env_value(amocker, fake_bot_token):
+    envs = {
+        'TELEGRAM_BOT_TOKEN': fake_bot_token,
+        'CURSOR_CATCH_UP_HOURS': '0.5',
+        'CURSOR_SAVE_INTERVAL': '10',
+    }
+    with amocker.patch.dict(os.environ, envs):
+        conf = config.Config()
+        assert conf.cursor_catch_up_hours == 0.5
+        assert conf.cursor_save_interval == 10
+
+
+def test_poll_concurrency_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('POLL_CONCURRENCY', None)  # in case it is set in ENV
+        assert config.Config().poll_concurrency == 8
+
+
+def test_poll_concurrency_env_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'POLL_CONCURRENCY': '2'}
+    with amocker.patch.dict(os.environ, envs):
+        assert config.Config().poll_concurrency == 2
+
+
+def test_dedup_window_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('DEDUP_WINDOW_HOURS', None)  # in case it is set in ENV
+        assert config.Config().dedup_window_hours == 24
+
+
+def test_dedup_window_env_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'DEDUP_WINDOW_HOURS': '2'}
+    with amocker.patch.dict(os.environ, envs):
+        assert config.Config().dedup_window_hours == 2
+
+
+def test_pipeline_settings_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        for name in ['MATCH_WORKERS', 'DELIVER_WORKERS', 'PIPELINE_QUEUE_SIZE']:
+            os.environ.pop(name, None)  # in case it is set in ENV
+        conf = config.Config()
+        assert conf.match_workers == 2
+        assert conf.deliver_workers == 1
+        assert conf.pipeline_queue_size == 100
+
+
+def test_pipeline_settings_env_value(amocker, fake_bot_token):
+    envs = {
+        'TELEGRAM_BOT_TOKEN': fake_bot_token,
+        'MATCH_WORKERS': '4',
+        'DELIVER_WORKERS': '3',
+        'PIPELINE_QUEUE_SIZE': '10',
+    }
+    with amocker.patch.dict(os.environ, envs):
+        conf = config.Config()
+        assert conf.match_workers == 4
+        assert conf.deliver_workers == 3
+        assert conf.pipeline_queue_size == 10
+
+
+def test_index_check_interval_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('INDEX_CHECK_INTERVAL', None)  # in case it is set in ENV
+        assert config.Config().index_check_interval == 3600
+
+
+def test_index_check_interval_env_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'INDEX_CHECK_INTERVAL': '60'}
+    with amocker.patch.dict(os.environ, envs):
+        assert config.Config().index_check_interval == 60
+
+
+def test_digest_window_minutes_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('DIGEST_WINDOW_MINUTES', None)  # in case it is set in ENV
+        assert config.Config().digest_window_minutes == 10
+
+
+def test_digest_window_minutes_env_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'DIGEST_WINDOW_MINUTES': '1.5'}
+    with amocker.patch.dict(os.environ, envs):
+        assert config.Config().digest_window_minutes == 1.5
+
+
+def test_send_rate_limit_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('SEND_RATE_LIMIT', None)  # in case it is set in ENV
+        assert config.Config().send_rate_limit == 25
+
+
+def test_send_rate_limit_env_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'SEND_RATE_LIMIT': '28.5'}
+    with amocker.patch.dict(os.environ, envs):
+        assert config.Config().send_rate_limit == 28.5
+
+
+def test_send_rate_burst_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('SEND_RATE_BURST', None)  # in case it is set in ENV
+        assert config.Config().send_rate_burst == 5
+
+
+def test_send_rate_burst_env_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'SEND_RATE_BURST': '2'}
+    with amocker.patch.dict(os.environ, envs):
+        assert config.Config().send_rate_burst == 2
+
+
+def test_send_concurrency_default_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token}
+    with amocker.patch.dict(os.environ, envs):
+        os.environ.pop('SEND_CONCURRENCY', None)  # in case it is set in ENV
+        assert config.Config().send_concurrency == 8
+
+
+def test_send_concurrency_env_value(amocker, fake_bot_token):
+    envs = {'TELEGRAM_BOT_TOKEN': fake_bot_token, 'SEND_CONCURRENCY': '16'}
+    with amocker.patch.dict(os.environ, envs):
+        assert config.Config().send_concurrency == 16
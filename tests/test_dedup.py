@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from app import datatypes, dedup
+
+
+def test_get_features(property_factory):
+    real_property = property_factory(
+        title='Renovated House, Limassol', price=datatypes.Price(700), created_at=21600.0
+    )
+    assert dedup.get_features(real_property) == {
+        'title:renovated', 'title:house', 'title:limassol', 'price:700', 'time:1'
+    }
+
+
+def test_fingerprint_ignores_case_and_punctuation(property_factory):
+    first = property_factory(title='Renovated house, Limassol', url='https://example.com/1')
+    second = property_factory(
+        title='renovated HOUSE limassol', price=first.price, created_at=first.created_at,
+        url='https://example.org/2',
+    )
+    assert dedup.fingerprint(first) == dedup.fingerprint(second)
+
+
+def test_fingerprint_of_short_title(property_factory):
+    assert dedup.fingerprint(property_factory(title='Apartment')) is None
+
+
+def test_simhash_of_similar_features_is_close():
+    features = {f'title:word{number}' for number in range(30)}
+    similar = features - {'title:word0'} | {'title:other'}
+
+    assert dedup.distance(dedup.simhash(features), dedup.simhash(similar)) <= dedup.MAX_DISTANCE
+    assert dedup.distance(dedup.simhash(features), dedup.simhash({'title:other'})) > 10
+
+
+def test_distance():
+    assert dedup.distance(0b1011, 0b0001) == 2
+
+
+def test_fingerprint_index_finds_near_duplicates():
+    index = dedup.FingerprintIndex(max_distance=3)
+    value = random.Random(0).getrandbits(dedup.FINGERPRINT_BITS)
+    index.add(value)
+
+    # differing bits spread over all bands
+    assert index.find(value ^ (1 | 1 << 20 | 1 << 40))
+    assert not index.find(value ^ (1 | 1 << 20 | 1 << 40 | 1 << 60))
+    assert not index.find(~value & (1 << dedup.FINGERPRINT_BITS) - 1)
+
+
+def test_fingerprint_index_compares_only_candidates(amocker):
+    index = dedup.FingerprintIndex()
+    rng = random.Random(0)
+    values = [rng.getrandbits(dedup.FINGERPRINT_BITS) for _ in range(1000)]
+    for value in values:
+        index.add(value)
+
+    with amocker.patch('app.dedup.distance', wraps=dedup.distance) as distance_mock:
+        assert index.find(values[0])
+
+    assert distance_mock.call_count < 10
+
+
+def test_fingerprint_index_forgets_after_window(amocker):
+    index = dedup.FingerprintIndex(window=60)
+    ones = (1 << dedup.FINGERPRINT_BITS) - 1
+    with amocker.patch('time.time', return_value=1000):
+        index.add(0)
+        index.add(ones)
+    with amocker.patch('time.time', return_value=1030):
+        index.add(0)
+        assert index.find(ones)
+    with amocker.patch('time.time', return_value=1061):
+        assert index.find(0)
+        assert not index.find(ones)
+
+    assert len(index) == 1
+    assert all(len(band) == 1 for band in index.bands)
+
+
+@pytest.mark.parametrize('max_distance', [0, 3, 7])
+def test_fingerprint_index_bands(max_distance):
+    index = dedup.FingerprintIndex(max_distance=max_distance)
+    assert len(index.split((1 << dedup.FINGERPRINT_BITS) - 1)) == max_distance + 1
+
+
+def test_fingerprint_index_keeps_bands_of_other_fingerprints(amocker):
+    index = dedup.FingerprintIndex(window=60)
+    with amocker.patch('time.time', return_value=1000):
+        index.add(0)
+    with amocker.patch('time.time', return_value=1030):
+        index.add(1)
+    with amocker.patch('time.time', return_value=1061):
+        assert index.find(1)
+
+    assert list(index.added_at) == [1]
+    assert index.bands[1] == {0: {1}}
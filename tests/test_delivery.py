@@ -0,0 +1,126 @@
+import asyncio
+
+import aiogram
+import pytest
+
+from app import delivery
+
+FAST = delivery.DeliverySettings(rate_limit=1000, rate_burst=1000, senders=3)
+
+
+def make_scheduler(amocker, side_effect=None, settings=FAST):
+    send = amocker.CoroutineMock(side_effect=side_effect)
+    return delivery.DeliveryScheduler(send, settings=settings)
+
+
+def test_chat_pacer(amocker):
+    pacer = delivery.ChatPacer(chat_interval=1, group_interval=3)
+    with amocker.patch('time.monotonic', return_value=100):
+        pacer.on_sent(1)
+        pacer.on_sent(-1)
+        assert pacer.get_delay(1) == 1
+        assert pacer.get_delay(-1) == 3
+        assert pacer.get_delay(2) == 0
+
+    with amocker.patch('time.monotonic', return_value=102):
+        assert pacer.get_delay(1) == 0
+        assert pacer.get_delay(-1) == 1
+        assert len(pacer) == 1
+
+
+@pytest.mark.asyncio
+async def test_delivery_scheduler_broadcast_bounds_senders(amocker):
+    running, peak = [0], [0]
+
+    async def send(chat_id, text):
+        del chat_id, text
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+
+    scheduler = make_scheduler(amocker, side_effect=send)
+    await scheduler.broadcast(list(range(10)), text='House')
+
+    assert scheduler.send.call_count == 10
+    assert peak[0] == 3
+    assert scheduler.stats == {'sent': 10}
+
+
+@pytest.mark.asyncio
+async def test_delivery_scheduler_broadcast_nothing(amocker):
+    scheduler = make_scheduler(amocker)
+    await scheduler.broadcast([], text='House')
+    assert not scheduler.send.called
+
+
+@pytest.mark.asyncio
+async def test_delivery_scheduler_takes_token_for_every_message(amocker):
+    scheduler = make_scheduler(amocker)
+    with amocker.patch.object(scheduler.bucket, 'acquire') as acquire_mock:
+        await scheduler.broadcast([1, 2, 3], text='House')
+    assert acquire_mock.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_delivery_scheduler_paces_chats(amocker):
+    scheduler = make_scheduler(amocker)
+    with amocker.patch('time.monotonic', return_value=100):
+        await scheduler.broadcast([1, -1], text='House')
+        with amocker.patch('asyncio.sleep') as sleep_mock:
+            await scheduler.broadcast([1, -1, 2], text='House')
+
+    assert sorted(call[0][0] for call in sleep_mock.call_args_list) == [1, 3]
+
+
+@pytest.mark.asyncio
+async def test_delivery_scheduler_pauses_everything_on_flood_control(amocker):
+    scheduler = make_scheduler(amocker, side_effect=[aiogram.exceptions.RetryAfter(5), None])
+    with amocker.patch('time.monotonic', return_value=100):
+        with amocker.patch('asyncio.sleep') as sleep_mock:
+            await scheduler.broadcast([1], text='House')
+
+    assert scheduler.paused_until == 105
+    assert sleep_mock.call_args == amocker.call(5)
+    assert scheduler.stats == {'retried': 1, 'sent': 1}
+
+
+@pytest.mark.asyncio
+async def test_delivery_scheduler_pauses_group_on_flood_control(amocker):
+    scheduler = make_scheduler(amocker, side_effect=[aiogram.exceptions.RetryAfter(30), None])
+    with amocker.patch('time.monotonic', return_value=100):
+        with amocker.patch('asyncio.sleep') as sleep_mock:
+            await scheduler.broadcast([-1], text='House')
+
+    assert scheduler.paused_until == 0
+    assert sleep_mock.call_args == amocker.call(30)
+    assert scheduler.stats == {'retried': 1, 'sent': 1}
+
+
+@pytest.mark.asyncio
+async def test_delivery_scheduler_drops_message_after_retries(amocker):
+    settings = delivery.DeliverySettings(retries=2)
+    scheduler = make_scheduler(
+        amocker, side_effect=aiogram.exceptions.RetryAfter(1), settings=settings
+    )
+    with amocker.patch('asyncio.sleep'):
+        await scheduler.broadcast([1], text='House')
+
+    assert scheduler.send.call_count == 3
+    assert scheduler.stats == {'retried': 3, 'dropped': 1}
+
+
+@pytest.mark.asyncio
+async def test_delivery_scheduler_skips_broken_chats(amocker):
+    def send(chat_id, text):
+        del text
+        if chat_id == 1:
+            aiogram.exceptions.Unauthorized.detect('bot was blocked by the user')
+        if chat_id == 2:
+            aiogram.exceptions.BadRequest.detect('chat not found')
+
+    scheduler = make_scheduler(amocker, side_effect=send)
+    await scheduler.broadcast([1, 2, 3], text='House')
+
+    assert scheduler.send.call_count == 3
+    assert scheduler.stats == {'blocked': 1, 'failed': 1, 'sent': 1}
@@ -0,0 +1,69 @@
+import pytest
+
+from app import datatypes, digests, entities
+
+
+def test_split_message_packs_lines():
+    assert digests.split_message(['aaa', 'bb', 'c', 'dddd'], limit=7) == ['aaa\nbb', 'c\ndddd']
+
+
+def test_split_message_cuts_long_lines():
+    assert digests.split_message(['a', 'bbbbbbbbbb', 'c'], limit=4) == ['a', 'bbbb', 'c']
+
+
+def test_split_message_nothing():
+    assert digests.split_message([]) == []
+
+
+def test_format_digest(chat_factory, property_factory):
+    updates = [property_factory(title='House', price=datatypes.Price(700)) for _ in range(2)]
+    digest = entities.Digest(chat_factory(), properties=updates)
+
+    assert digests.format_digest(digest) == [
+        '\n'.join(['2 new listings:', updates[0].markdown_link, updates[1].markdown_link])
+    ]
+
+
+def test_format_digest_splits_at_message_limit(chat_factory, property_factory):
+    updates = [property_factory(title='House ' * 20) for _ in range(100)]
+    messages = digests.format_digest(entities.Digest(chat_factory(), properties=updates))
+
+    assert len(messages) > 1
+    assert all(len(message) <= digests.MESSAGE_LIMIT for message in messages)
+    assert '\n'.join(messages).split('\n')[1:] == [update.markdown_link for update in updates]
+
+
+def test_digest_buffer_add(chat_factory, property_factory):
+    chat, other_chat = chat_factory(id=1), chat_factory(id=2)
+    first, second = property_factory(), property_factory()
+    digest_buffer = digests.DigestBuffer()
+
+    digest_buffer.add(chat, first)
+    digest_buffer.add(other_chat, first)
+    digest_buffer.add(chat, second)
+
+    assert len(digest_buffer) == 2
+    assert digest_buffer.pop_all() == [
+        entities.Digest(chat, properties=[first, second]),
+        entities.Digest(other_chat, properties=[first]),
+    ]
+    assert not digest_buffer.pop_all()
+
+
+@pytest.mark.parametrize(['now', 'expected_ids', 'expected_delay'], [
+    (1000, [], 60),
+    (1059, [], 1),
+    (1060, [1], 20),
+    (1200, [1, 2], 60),
+])
+def test_digest_buffer_pop_due(amocker, property_factory, now, expected_ids, expected_delay):
+    digest_buffer = digests.DigestBuffer(window=60)
+    with amocker.patch('time.time', return_value=1000):
+        digest_buffer.add(entities.Chat(id=1), property_factory())
+    with amocker.patch('time.time', return_value=1020):
+        digest_buffer.add(entities.Chat(id=2), property_factory())
+        digest_buffer.add(entities.Chat(id=1), property_factory())
+
+    with amocker.patch('time.time', return_value=now):
+        assert [digest.chat.id for digest in digest_buffer.pop_due()] == expected_ids
+        assert digest_buffer.get_delay() == expected_delay
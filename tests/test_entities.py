@@ -1,4 +1,12 @@
+from app import datatypes
+
+
 def test_property_telegram_link(property_factory):
     expected_url = 'https://t.me/iv?url=https://rent.property.com/&rhash=7849b4bb7a02f2'
     real_property = property_factory(url='https://rent.property.com')
     assert real_property.telegram_link == expected_url
+
+
+def test_property_markdown_link(property_factory):
+    real_property = property_factory(title='House', price=datatypes.Price(700))
+    assert real_property.markdown_link == f'[House €700]({real_property.telegram_link})'
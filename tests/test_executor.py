@@ -1,15 +1,53 @@
+from concurrent import futures
+
 import pytest
 
-from app import executor, parsers
+from app import archive, client, executor, parsers, providers
+
+
+@pytest.mark.parametrize(['mode', 'executor_class'], [
+    ('thread', futures.ThreadPoolExecutor),
+    ('process', futures.ProcessPoolExecutor),
+])
+def test_make_parse_executor(mode, executor_class):
+    parse_executor = executor.make_parse_executor(mode, workers=1)
+    assert isinstance(parse_executor, executor_class)
+    parse_executor.shutdown()
+
+
+def test_make_parse_executor_inline():
+    assert executor.make_parse_executor('inline', workers=1) is None
+
+
+@pytest.mark.asyncio
+async def test_make_client(conf_mock):
+    webclient = executor.make_client(conf_mock)
+    await webclient.close()
+
+    assert type(webclient) is client.Client  # pylint: disable=unidiomatic-typecheck
+    assert webclient.policy.retries == conf_mock.http_retries
+
+
+@pytest.mark.asyncio
+async def test_make_client_records_archive(tmp_path, conf_mock):
+    conf_mock.record_archive = str(tmp_path / 'archive.jsonl.gz')
+    webclient = executor.make_client(conf_mock)
+    await webclient.close()
+
+    assert isinstance(webclient, archive.RecordingClient)
 
 
 @pytest.mark.asyncio
 async def test_application_init(amocker, application: executor.Application):
     application.db_adapter.create_tables = amocker.CoroutineMock()
+    application.db_adapter.load_index = amocker.CoroutineMock()
+    application.cursor_service.load = amocker.CoroutineMock()
     with amocker.patch('sentry_sdk.init') as sentry_init_mock:
         await application.init()
 
     assert application.db_adapter.create_tables.called
+    assert application.db_adapter.load_index.called
+    assert application.cursor_service.load.call_args == amocker.call(catch_up=6 * 60 * 60)
     assert not sentry_init_mock.called
 
 
@@ -29,35 +67,90 @@ async def test_application_shutdown(amocker, application: executor.Application):
     application.db_adapter.close = amocker.CoroutineMock()
     application.bot_adapter.close = amocker.CoroutineMock()
     application.webclient.close = amocker.CoroutineMock()
+    application.cursor_service.save = amocker.CoroutineMock()
 
     await application.shutdown()
 
+    assert application.cursor_service.save.called
     assert application.db_adapter.close.called
     assert application.bot_adapter.close.called
     assert application.webclient.close.called
 
 
+@pytest.mark.asyncio
+async def test_application_shutdown_stops_parse_executor(
+        amocker, application: executor.Application
+):
+    application.parse_executor = amocker.Mock(spec=futures.Executor)
+
+    await application.shutdown()
+
+    assert application.parse_executor.shutdown.called
+
+
 @pytest.mark.asyncio
 async def test_application_run(event_loop, amocker, application: executor.Application):
     application.bot.start_polling = amocker.CoroutineMock()
     application.send_service.start_sending = amocker.CoroutineMock()
+    application.cursor_service.start_saving = amocker.CoroutineMock()
+    application.db_adapter.start_checking = amocker.CoroutineMock()
 
     application.run(event_loop)
 
     assert application.bot.start_polling.called
     assert application.send_service.start_sending.called
+    assert application.cursor_service.start_saving.call_args == amocker.call(60)
+    assert application.db_adapter.start_checking.call_args == amocker.call(3600)
 
 
 @pytest.mark.asyncio
-async def test_application_providers(amocker, application: executor.Application):
+async def test_application_make_providers(amocker, application: executor.Application):
     parser_classes = {'https://real.estates.com': parsers.BazarakiParser}
     with amocker.patch('app.registry.list_parsers', return_value=parser_classes) as registry_mock:
-        provider_list = application.provider_list
+        provider_list = application.make_providers()
 
     assert len(provider_list) == 1
+    assert provider_list[0].parser.backend == application.conf.parser_backend
+    assert provider_list[0].cursor.seen.window == 24 * 60 * 60
+    assert provider_list[0].cursor.seen.capacity == application.conf.seen_capacity
     assert registry_mock.called
 
 
+@pytest.mark.asyncio
+async def test_application_make_providers_shares_parser(
+        amocker, application: executor.Application
+):
+    parser_classes = {
+        'https://real.estates.com/houses/': parsers.BazarakiParser,
+        'https://real.estates.com/flats/': parsers.BazarakiParser,
+    }
+    with amocker.patch('app.registry.list_parsers', return_value=parser_classes):
+        provider_list = application.make_providers()
+
+    assert [provider.url for provider in provider_list] == list(parser_classes)
+    assert provider_list[0].parser is provider_list[1].parser
+    assert provider_list[0].cursor is not provider_list[1].cursor
+
+
+@pytest.mark.asyncio
+async def test_application_make_providers_streaming(amocker, application: executor.Application):
+    application.conf.fetch_mode = 'stream'
+    parser_classes = {'https://real.estates.com': parsers.BazarakiParser}
+    with amocker.patch('app.registry.list_parsers', return_value=parser_classes):
+        provider_list = application.make_providers()
+
+    assert isinstance(provider_list[0], providers.StreamingProvider)
+
+
+@pytest.mark.asyncio
+async def test_application_builds_providers_once(application: executor.Application):
+    assert application.send_service.providers is application.cursor_service.providers
+    assert application.send_service.pipeline_settings.poll_workers == 8
+    assert application.send_service.pipeline_settings.deliver_workers == 1
+    assert application.send_service.fingerprints.window == 24 * 60 * 60
+    assert application.send_service.digest_buffer.window == 10 * 60
+
+
 def test_run(amocker, application_mock: executor.Application):
     with amocker.patch('app.executor.Application', return_value=application_mock):
         executor.run()
@@ -0,0 +1,125 @@
+import pytest
+
+from app import datatypes, extractors
+
+
+@pytest.mark.parametrize(['selector', 'expected'], [
+    (extractors.Selector('li'), {}),
+    (extractors.Selector('li', class_='item'), {'class_': 'item'}),
+    (extractors.Selector('b', attrs=(('itemprop', 'price'), )), {'attrs': {'itemprop': 'price'}}),
+])
+def test_selector_kwargs(selector, expected):
+    assert selector.kwargs == expected
+
+
+def test_selector_strainer(spec_item):
+    strainer = extractors.Selector('li', class_='item').strainer()
+    assert strainer.search(spec_item)
+
+
+@pytest.mark.parametrize(['selector', 'matched'], [
+    (extractors.Selector('a'), True),
+    (extractors.Selector('a', class_='title'), True),
+    (extractors.Selector('a', class_='link'), True),
+    (extractors.Selector('a', class_='price'), False),
+    (extractors.Selector('a', attrs=(('href', '/adv/1/'), )), True),
+    (extractors.Selector('a', attrs=(('href', '/adv/2/'), )), False),
+])
+def test_selector_match(spec_item, selector, matched):
+    assert selector.match(spec_item.a) is matched
+
+
+def test_field_get_text(spec_item):
+    field = extractors.Field(extractors.Selector('a'))
+    assert field.get(spec_item.a) == 'House'
+
+
+def test_field_get_attr(spec_item):
+    field = extractors.Field(extractors.Selector('meta'), attr='content', convert=datatypes.Price)
+    assert field.get(spec_item.meta) == datatypes.Price('700')
+
+
+def test_item_spec_fields(item_spec):
+    assert item_spec.fields == {
+        'title': item_spec.title,
+        'price': item_spec.price,
+        'url': item_spec.url,
+        'created_at': item_spec.created_at,
+    }
+
+
+def test_extraction_plan_groups_fields_by_selector(item_spec):
+    plan = extractors.ExtractionPlan(item_spec.fields)
+    assert plan.selectors[extractors.Selector('a', class_='title')] == [
+        ('title', item_spec.title),
+        ('url', item_spec.url),
+    ]
+    assert len(plan.by_tag_name['a']) == 1
+
+
+def test_extraction_plan_extract(spec_item, item_spec):
+    plan = extractors.ExtractionPlan(item_spec.fields)
+    assert plan.extract(spec_item) == {
+        'title': 'House',
+        'url': '/adv/1/',
+        'price': datatypes.Price('700'),
+        'created_at': 'Today 12:30, Limassol',
+    }
+
+
+def test_extraction_plan_extract_visits_tags_once(amocker, spec_item, item_spec):
+    plan = extractors.ExtractionPlan(item_spec.fields)
+    with amocker.patch.object(extractors.Selector, 'match', return_value=True) as match_mock:
+        plan.extract(spec_item)
+
+    assert match_mock.call_count == 3
+
+
+def test_extraction_plan_extract_raises_when_tag_not_found(spec_item, item_spec):
+    fields = dict(item_spec.fields, title=extractors.Field(extractors.Selector('h1')))
+    plan = extractors.ExtractionPlan(fields)
+    with pytest.raises(ValueError):
+        plan.extract(spec_item)
+
+
+@pytest.mark.parametrize(['text', 'matched'], [
+    ('<li class="item">', True),
+    ("<li class='new item' data-id=\"1\">", True),
+    ('<li class="items">', False),
+    ('<li>', False),
+])
+def test_selector_match_start_tag(text, matched):
+    assert extractors.Selector('li', class_='item').match_start_tag(text) is matched
+
+
+def test_selector_match_start_tag_attrs():
+    selector = extractors.Selector('meta', attrs=(('itemprop', 'price'), ))
+    assert selector.match_start_tag('<meta ITEMPROP="price" content="1">')
+    assert not selector.match_start_tag('<meta itemprop="name">')
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 10_000])
+def test_item_splitter_feed(chunk_size):
+    content = (
+        '<ul><li class="ad">ad</li>'
+        '<li class="item"><ul><li>nested</li></ul>first</li>'
+        '<li class="item">second</li></ul>'
+    )
+    splitter = extractors.ItemSplitter(extractors.Selector('li', class_='item'))
+    items = []
+    for start in range(0, len(content), chunk_size):
+        items.extend(splitter.feed(content[start:start + chunk_size]))
+
+    assert items == [
+        '<li class="item"><ul><li>nested</li></ul>first</li>',
+        '<li class="item">second</li>',
+    ]
+
+
+def test_item_splitter_keeps_only_unfinished_item():
+    splitter = extractors.ItemSplitter(extractors.Selector('li', class_='item'))
+
+    assert splitter.feed('<div>' * 100 + '<li class="item">fir') == []
+    assert splitter.buffer == '<li class="item">fir'
+    assert splitter.feed('st</li><l') == ['<li class="item">first</li>']
+    assert splitter.buffer == '<l'
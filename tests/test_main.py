@@ -12,3 +12,13 @@ def test_imports__main__(amocker):
     with amocker.patch('app.executor.run') as run_mock:
         importlib.import_module('app.__main__')
     assert not run_mock.called
+
+
+def test_executes__main__replay(amocker):
+    with amocker.patch('app.replay.main') as main_mock, \
+            amocker.patch('app.executor.run') as run_mock, \
+            amocker.patch('sys.argv', ['app', 'replay', 'archive.jsonl.gz']):
+        runpy.run_module('app', run_name='__main__')
+
+    assert main_mock.call_args == amocker.call(['archive.jsonl.gz'])
+    assert not run_mock.called
@@ -1,10 +1,150 @@
 import calendar
 import datetime
+import re
 
 import pytest
 import pytz
 
-from app import datatypes, parsers
+from app import datatypes, entities, extractors, parsers
+
+NICOSIA_TZ = pytz.timezone('Asia/Nicosia')
+
+
+def nicosia_timestamp(*args):
+    local_dt = datetime.datetime(*args)
+    dt = NICOSIA_TZ.normalize(NICOSIA_TZ.localize(local_dt, is_dst=True))
+    return calendar.timegm(dt.utctimetuple())
+
+
+def nicosia_date_context(*args):
+    return parsers.DateContext(NICOSIA_TZ, now=NICOSIA_TZ.localize(datetime.datetime(*args)))
+
+
+def test_get_backend():
+    assert parsers.get_backend('html.parser') == 'html.parser'
+
+
+def test_get_backend_falls_back_to_default(amocker):
+    with amocker.patch('bs4.builder.builder_registry.lookup', return_value=None):
+        assert parsers.get_backend('lxml') == parsers.DEFAULT_BACKEND
+
+
+def test_parser_init_default_backend():
+    parser = parsers.Parser()
+    assert parser.backend == parsers.DEFAULT_BACKEND
+
+
+def test_parser_init_unknown_backend():
+    parser = parsers.Parser(backend='selectolax')
+    assert parser.backend == parsers.DEFAULT_BACKEND
+
+
+def test_parser_get_fingerprint():
+    parser = parsers.Parser()
+    assert parser.get_fingerprint('<div>a</div>') == parser.get_fingerprint('<div>a</div>')
+    assert parser.get_fingerprint('<div>a</div>') != parser.get_fingerprint('<div>b</div>')
+
+
+def test_parser_get_fingerprint_uses_only_relevant_content():
+    parser = parsers.Parser()
+    parser.FINGERPRINT_RE = re.compile(r'<li>[^<]*</li>')
+    first = parser.get_fingerprint('<input value="token1"><li>a</li>')
+    second = parser.get_fingerprint('<input value="token2"><li>a</li>')
+    assert first == second
+
+
+def test_parser_get_fingerprint_falls_back_to_whole_content():
+    parser = parsers.Parser()
+    parser.FINGERPRINT_RE = re.compile(r'<li>[^<]*</li>')
+    assert parser.get_fingerprint('<p>a</p>') != parser.get_fingerprint('<p>b</p>')
+
+
+def test_parser_make_soup(amocker):
+    parser = parsers.Parser()
+    with amocker.patch('bs4.BeautifulSoup') as soup_mock:
+        parser.make_soup('<div>test</div>')
+
+    assert soup_mock.called
+    assert soup_mock.call_args == amocker.call(
+        '<div>test</div>', parsers.DEFAULT_BACKEND, parse_only=None
+    )
+
+
+def test_parser_make_soup_restricted_to_item_root(amocker):
+    parser = parsers.Parser()
+    parser.ITEM_ROOT = amocker.Mock()
+    with amocker.patch('bs4.BeautifulSoup') as soup_mock:
+        parser.make_soup('<div>test</div>')
+
+    assert soup_mock.call_args == amocker.call(
+        '<div>test</div>', parsers.DEFAULT_BACKEND, parse_only=parser.ITEM_ROOT
+    )
+
+
+@pytest.mark.parametrize(['text', 'expected'], [
+    ('Today 00:00', nicosia_timestamp(2019, 1, 29, 0, 0)),
+    ('Today 00:05', nicosia_timestamp(2019, 1, 29, 0, 5)),
+    ('Today 23:59', nicosia_timestamp(2019, 1, 28, 23, 59)),
+    ('Yesterday 23:59', nicosia_timestamp(2019, 1, 28, 23, 59)),
+    ('Yesterday 0:01', nicosia_timestamp(2019, 1, 28, 0, 1)),
+    ('28.01.2019 13:44', nicosia_timestamp(2019, 1, 28, 13, 44)),
+    ('1.1.2019 9:05', nicosia_timestamp(2019, 1, 1, 9, 5)),
+])
+def test_date_context_resolve_at_midnight(text, expected):
+    dates = nicosia_date_context(2019, 1, 29, 0, 5)
+    assert dates.resolve(text) == expected
+
+
+@pytest.mark.parametrize(['now', 'text', 'expected'], [
+    # clocks go forward at 03:00 on 31.03.2019
+    ((2019, 3, 31, 12, 0), 'Today 02:30', nicosia_timestamp(2019, 3, 31, 2, 30)),
+    ((2019, 3, 31, 12, 0), 'Today 03:30', nicosia_timestamp(2019, 3, 31, 3, 30)),
+    ((2019, 3, 31, 12, 0), 'Today 04:30', nicosia_timestamp(2019, 3, 31, 4, 30)),
+    ((2019, 4, 1, 12, 0), 'Yesterday 02:30', nicosia_timestamp(2019, 3, 31, 2, 30)),
+    ((2019, 4, 1, 12, 0), 'Today 02:30', nicosia_timestamp(2019, 4, 1, 2, 30)),
+    # clocks go back at 04:00 on 27.10.2019
+    ((2019, 10, 27, 12, 0), 'Today 02:30', nicosia_timestamp(2019, 10, 27, 2, 30)),
+    ((2019, 10, 27, 12, 0), 'Today 03:30', nicosia_timestamp(2019, 10, 27, 3, 30)),
+    ((2019, 10, 27, 12, 0), 'Today 04:30', nicosia_timestamp(2019, 10, 27, 4, 30)),
+    ((2019, 10, 28, 12, 0), '27.10.2019 03:30', nicosia_timestamp(2019, 10, 27, 3, 30)),
+])
+def test_date_context_resolve_around_dst_transition(now, text, expected):
+    dates = nicosia_date_context(*now)
+    assert dates.resolve(text) == expected
+
+
+def test_date_context_resolve_is_cached(amocker):
+    dates = nicosia_date_context(2019, 1, 29, 12, 0)
+    with amocker.patch.object(dates, 'to_timestamp', return_value=1548675840) as to_timestamp:
+        assert dates.resolve('Today 11:00') == 1548675840
+        assert dates.resolve('Today 11:00') == 1548675840
+
+    assert to_timestamp.call_count == 1
+
+
+def test_date_context_caches_day_offset():
+    dates = nicosia_date_context(2019, 1, 29, 12, 0)
+    dates.resolve('Today 11:00')
+    dates.resolve('Today 10:00')
+    assert dates.offsets == {datetime.date(2019, 1, 29): 2 * 60 * 60}
+
+
+def test_date_context_resolve_unknown_format():
+    dates = nicosia_date_context(2019, 1, 29, 12, 0)
+    with pytest.raises(ValueError):
+        dates.resolve('28/01/2019 13:44')
+
+
+def test_parser_make_date_context(amocker):
+    parser = parsers.BazarakiParser()
+    now = NICOSIA_TZ.localize(datetime.datetime(2019, 1, 29, 12, 0))
+    with amocker.patch('datetime.datetime') as datetime_mock:
+        datetime_mock.now.return_value = now
+        dates = parser.make_date_context()
+
+    assert dates.tzinfo == parser.TZ
+    assert dates.now == now.timestamp()
+    assert datetime_mock.now.call_args == amocker.call(tz=parser.TZ)
 
 
 def test_parser_parse(amocker, property_factory):
@@ -20,6 +160,19 @@ def test_parser_parse(amocker, property_factory):
     assert parser.build_property.called
 
 
+def test_parser_iter_properties_is_lazy(amocker, property_factory):
+    parsed_property = property_factory()
+
+    parser = parsers.Parser()
+    parser.make_soup = amocker.Mock()
+    parser.get_items = amocker.Mock(return_value=[amocker.Mock(), amocker.Mock()])
+    parser.build_property = amocker.Mock(return_value=parsed_property)
+
+    properties = parser.iter_properties('')
+    assert next(properties) == parsed_property
+    assert parser.build_property.call_count == 1
+
+
 def test_parser_get_base_url_raises_not_implemented():
     parser = parsers.Parser()
 
@@ -103,11 +256,107 @@ def test_parser_build_absolute_url(amocker):
     assert urljoin_mock.call_args == amocker.call(base_url, path)
 
 
+def test_spec_parser_subclass_compiles_spec(spec_parser_class):
+    assert spec_parser_class.TZ == NICOSIA_TZ
+    assert spec_parser_class.ITEM_ROOT.name == 'li'
+    assert spec_parser_class.FINGERPRINT_RE.pattern == r'<li[^>]*>'
+    assert len(spec_parser_class.PLAN.selectors) == 3
+
+
+def test_spec_parser_without_fingerprint(item_spec):
+    class ExampleParser(parsers.SpecParser):
+        SPEC = extractors.ParserSpec(
+            base_url='https://example.com', timezone='UTC', item=item_spec
+        )
+    assert ExampleParser.FINGERPRINT_RE is None
+    assert (ExampleParser.MIN_POLL_INTERVAL, ExampleParser.MAX_POLL_INTERVAL) == (2, 300)
+
+
+def test_spec_parser_poll_interval(item_spec):
+    class ExampleParser(parsers.SpecParser):
+        SPEC = extractors.ParserSpec(
+            base_url='https://example.com', timezone='UTC', item=item_spec, poll_interval=(10, 60)
+        )
+    assert (ExampleParser.MIN_POLL_INTERVAL, ExampleParser.MAX_POLL_INTERVAL) == (10, 60)
+
+
+def test_spec_parser_parse(amocker, spec_parser_class):
+    content = '<li class="item"><a href="/1">House</a><b>700</b><i>28.01.2019 13:44</i></li>'
+    parser = spec_parser_class()
+
+    with amocker.patch.object(parser.PLAN, 'extract', wraps=parser.PLAN.extract) as extract_mock:
+        properties = parser.parse(content)
+
+    assert extract_mock.call_count == 1
+    assert properties == [
+        entities.Property(
+            title='House',
+            price=datatypes.Price(700),
+            url='https://example.com/1',
+            created_at=nicosia_timestamp(2019, 1, 28, 13, 44),
+        )
+    ]
+
+
+def test_spec_parser_build_property_without_date_context(bazaraki_full_date_item):
+    parser = parsers.BazarakiParser()
+    real_property = parser.build_property(bazaraki_full_date_item)
+    assert real_property.created_at == 1548675840.0
+
+
+def test_parser_make_item_splitter_raises_not_implemented():
+    with pytest.raises(NotImplementedError):
+        parsers.Parser().make_item_splitter()
+
+
+@pytest.mark.parametrize('chunk_size', [100, 4096, 1_000_000])
+def test_property_feed_matches_parse(bazaraki_content, chunk_size):
+    parser = parsers.BazarakiParser()
+    feed = parser.make_feed()
+    properties = []
+    for start in range(0, len(bazaraki_content), chunk_size):
+        properties.extend(feed.feed(bazaraki_content[start:start + chunk_size]))
+
+    assert properties == parser.parse(bazaraki_content)
+
+
+def test_parser_get_page_url_without_pagination():
+    assert parsers.Parser().get_page_url('https://example.com/', page=2) is None
+
+
+@pytest.mark.parametrize(['url', 'expected'], [
+    ('https://example.com/rent/', 'https://example.com/rent/?page=2'),
+    ('https://example.com/rent/?price=100&page=1', 'https://example.com/rent/?price=100&page=2'),
+])
+def test_bazaraki_parser_get_page_url(url, expected):
+    assert parsers.BazarakiParser().get_page_url(url, page=2) == expected
+
+
 def test_bazaraki_parser_get_base_url():
     parser = parsers.BazarakiParser()
     assert parser.get_base_url() == parsers.BAZARAKI_BASE_URL
 
 
+@pytest.mark.parametrize('backend', ['html.parser', 'lxml'])
+def test_bazaraki_parser_make_soup_builds_only_items(bazaraki_content, backend):
+    parser = parsers.BazarakiParser(backend=backend)
+    soup = parser.make_soup(bazaraki_content)
+    assert [tag.name for tag in soup.find_all(recursive=False)] == ['li'] * 60
+    assert soup.find('script') is None
+
+
+def test_bazaraki_parser_get_fingerprint_ignores_noise(bazaraki_content):
+    parser = parsers.BazarakiParser()
+    noisy_content = bazaraki_content.replace('</head>', '<meta name="csrf" content="1"></head>')
+    assert parser.get_fingerprint(bazaraki_content) == parser.get_fingerprint(noisy_content)
+
+
+def test_bazaraki_parser_get_fingerprint_detects_new_item(bazaraki_content):
+    parser = parsers.BazarakiParser()
+    new_content = bazaraki_content.replace('/adv/2206100_', '/adv/2206101_')
+    assert parser.get_fingerprint(bazaraki_content) != parser.get_fingerprint(new_content)
+
+
 def test_bazaraki_parser_get_items_calls_find_all(amocker):
     parser = parsers.BazarakiParser()
     soup = amocker.Mock()
@@ -123,6 +372,14 @@ def test_bazaraki_parser_get_items(bazaraki_soup):
     assert len(items) == 60
 
 
+@pytest.mark.parametrize('backend', ['html.parser', 'lxml'])
+def test_bazaraki_parser_parse_with_backend(bazaraki_content, backend):
+    parser = parsers.BazarakiParser(backend=backend)
+    properties = parser.parse(bazaraki_content)
+    assert len(properties) == 60
+    assert properties[0].title == 'Panthea near grammar school'
+
+
 def test_bazaraki_parser_get_item_title(bazaraki_item):
     parser = parsers.BazarakiParser()
     assert parser.get_item_title(bazaraki_item) == 'Panthea near grammar school'
@@ -143,6 +400,13 @@ def test_bazaraki_parser_get_item_created_at(bazaraki_full_date_item):
     assert parser.get_item_created_at(bazaraki_full_date_item) == 1548675840.0
 
 
+def test_bazaraki_parser_get_item_created_at_with_date_context(bazaraki_end_of_today_date_item):
+    parser = parsers.BazarakiParser()
+    dates = nicosia_date_context(2019, 1, 29, 0, 5)
+    created_at = parser.get_item_created_at(bazaraki_end_of_today_date_item, dates=dates)
+    assert created_at == nicosia_timestamp(2019, 1, 28, 23, 59)
+
+
 def test_bazaraki_parser_get_item_created_at_today_date(bazaraki_today_date_item):
     tz_info = pytz.timezone('Asia/Nicosia')
     parser = parsers.BazarakiParser()
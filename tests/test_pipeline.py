@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app import pipeline
+
+
+async def double(item):
+    return [item * 2]
+
+
+async def stop(*workers):
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_stage_passes_results_to_output(amocker):
+    collect = amocker.CoroutineMock(return_value=None)
+    collect.__name__ = 'collect'
+    output = pipeline.Stage(collect, workers=1, queue_size=10)
+    stage = pipeline.Stage(double, workers=2, queue_size=10, output=output)
+    workers = [asyncio.ensure_future(stage.run()), asyncio.ensure_future(output.run())]
+
+    for item in [1, 2, 3]:
+        await stage.put(item)
+    await stage.join()
+    await output.join()
+    await stop(*workers)
+
+    assert sorted(call[0][0] for call in collect.call_args_list) == [2, 4, 6]
+    assert stage.name == 'double'
+    assert stage.get_stats() == {'queued': 0, 'handled': 3}
+
+
+@pytest.mark.asyncio
+async def test_stage_without_output():
+    stage = pipeline.Stage(double, workers=1, queue_size=10)
+    assert await stage.process(1) == [2]
+
+
+@pytest.mark.asyncio
+async def test_stage_survives_failed_item():
+    async def divide(item):
+        return 1 / item
+
+    stage = pipeline.Stage(divide, workers=1, queue_size=10)
+    worker = asyncio.ensure_future(stage.run())
+    for item in [0, 1]:
+        await stage.put(item)
+    await stage.join()
+    await stop(worker)
+
+    assert stage.get_stats() == {'queued': 0, 'handled': 1, 'failed': 1}
+
+
+@pytest.mark.asyncio
+async def test_stage_counts_blocked_puts():
+    stage = pipeline.Stage(double, workers=1, queue_size=1)
+    await stage.put(1)
+    put = asyncio.ensure_future(stage.put(2))
+    await asyncio.sleep(0)
+
+    assert not put.done()
+    assert stage.get_stats() == {'queued': 1, 'blocked': 1}
+
+    worker = asyncio.ensure_future(stage.run())
+    await put
+    await stage.join()
+    await stop(worker)
+
+
+@pytest.mark.asyncio
+async def test_stage_is_cancelled():
+    async def wait(item):
+        await asyncio.sleep(item)
+
+    stage = pipeline.Stage(wait, workers=1, queue_size=1)
+    worker = asyncio.ensure_future(stage.run())
+    await stage.put(10)
+    await asyncio.sleep(0)
+    worker.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await worker
+
+    assert not stage.stats['failed']
@@ -1,8 +1,9 @@
 import time
+from concurrent import futures
 
 import pytest
 
-from app import providers
+from app import client, entities, parsers, providers
 
 
 def test_provider_init(parser_mock, client_mock):
@@ -10,11 +11,13 @@ def test_provider_init(parser_mock, client_mock):
     provider = providers.Provider(url, parser=parser_mock, webclient=client_mock)
     assert provider.url == url
     assert provider.parser == parser_mock
+    assert provider.schedule.min_interval == 2
+    assert provider.schedule.max_interval == 300
 
 
 @pytest.mark.asyncio
 async def test_provider_get_updates(amocker, parser_mock, client_mock):
-    parser_mock.parse = amocker.Mock(return_value=[])
+    parser_mock.iter_properties = amocker.Mock(return_value=iter([]))
     provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
 
     properties = await provider.get_updates()
@@ -24,19 +27,20 @@ async def test_provider_get_updates(amocker, parser_mock, client_mock):
 
 @pytest.mark.asyncio
 async def test_provider_get_updates_calls_parse(amocker, parser_mock, client_mock):
-    parser_mock.parse = amocker.Mock(return_value=[])
-    client_mock.get = amocker.CoroutineMock(return_value='<div>test</div>')
+    parser_mock.iter_properties = amocker.Mock(return_value=iter([]))
+    result = client.FetchResult(client.FetchStatus.OK, text='<div>test</div>')
+    client_mock.get = amocker.CoroutineMock(return_value=result)
     provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
 
     await provider.get_updates()
 
-    assert provider.parser.parse.called
-    assert provider.parser.parse.call_args == amocker.call('<div>test</div>')
+    assert provider.parser.iter_properties.called
+    assert provider.parser.iter_properties.call_args == amocker.call('<div>test</div>')
 
 
 @pytest.mark.asyncio
 async def test_provider_get_updates_calls_client_get(amocker, parser_mock, client_mock):
-    parser_mock.parse = amocker.Mock(return_value=[])
+    parser_mock.iter_properties = amocker.Mock(return_value=iter([]))
     provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
 
     await provider.get_updates()
@@ -51,27 +55,27 @@ async def test_provider_get_updates_changes_latest_created_at(
 ):
     created_at = time.time() + 10_000
     property_ = property_factory(created_at=created_at)
-    parser_mock.parse = amocker.Mock(return_value=[property_])
+    parser_mock.iter_properties = amocker.Mock(return_value=iter([property_]))
     provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
-    latest_created_at = provider.latest_created_at
+    latest_created_at = provider.cursor.latest_created_at
 
     await provider.get_updates()
 
-    assert provider.latest_created_at == property_.created_at
-    assert latest_created_at != provider.latest_created_at
+    assert provider.cursor.latest_created_at == property_.created_at
+    assert latest_created_at != provider.cursor.latest_created_at
 
 
 @pytest.mark.asyncio
 async def test_provider_get_updates_does_not_change_latest_created_at(
         amocker, parser_mock, client_mock
 ):
-    parser_mock.parse = amocker.Mock(return_value=[])
+    parser_mock.iter_properties = amocker.Mock(return_value=iter([]))
     provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
-    latest_created_at = provider.latest_created_at
+    latest_created_at = provider.cursor.latest_created_at
 
     await provider.get_updates()
 
-    assert provider.latest_created_at == latest_created_at
+    assert provider.cursor.latest_created_at == latest_created_at
 
 
 @pytest.mark.asyncio
@@ -81,7 +85,7 @@ async def test_provider_get_updates_filters_newest(
     seen_property = property_factory(created_at=time.time() - 10_000)
     new_property = property_factory(created_at=time.time() + 10_000)
 
-    parser_mock.parse = amocker.Mock(return_value=[seen_property, new_property])
+    parser_mock.iter_properties = amocker.Mock(return_value=iter([seen_property, new_property]))
     provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
 
     properties = await provider.get_updates()
@@ -94,14 +98,456 @@ async def test_provider_filter_duplicates(amocker, property_factory, parser_mock
     property1 = property_factory(url='https://ex.com/1', created_at=time.time() + 10_000)
     property2 = property_factory(created_at=time.time() + 10_000)
 
-    parser_mock.parse = amocker.Mock(return_value=[property1, property2])
+    parser_mock.iter_properties = amocker.Mock(return_value=iter([property1, property2]))
+    parser_mock.get_fingerprint = amocker.Mock(side_effect=['first', 'second'])
     provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
 
     await provider.get_updates()
 
     property1 = property_factory(url='https://ex.com/1', created_at=time.time() + 11_000)
     property2 = property_factory(created_at=time.time() + 11_000)
-    parser_mock.parse = amocker.Mock(return_value=[property1, property2])
+    parser_mock.iter_properties = amocker.Mock(return_value=iter([property1, property2]))
     properties = await provider.get_updates()
 
     assert properties == [property2]
+
+
+def test_cursor_advance(property_factory):
+    cursor = providers.Cursor(latest_created_at=50)
+    cursor.seen.add('1')
+    properties = [
+        property_factory(url='https://ex.com/adv/3_house/', created_at=100),
+        property_factory(url='https://ex.com/adv/2_house/', created_at=70),
+    ]
+
+    cursor.advance(properties)
+
+    assert cursor.latest_created_at == 100
+    assert list(cursor.seen.seen_at) == ['1', '2', '3']
+
+
+def test_cursor_is_new_ignores_bumped_listing(property_factory):
+    cursor = providers.Cursor(latest_created_at=50)
+    cursor.advance([property_factory(url='https://ex.com/adv/1_house/', created_at=100)])
+
+    bumped = property_factory(url='https://ex.com/adv/1_house/?bumped', created_at=200)
+    assert not cursor.is_new(bumped)
+    assert cursor.is_new(property_factory(url='https://ex.com/adv/2_house/', created_at=200))
+
+
+@pytest.mark.parametrize(['url', 'expected'], [
+    ('https://www.bazaraki.com/adv/2206100_panthea-near-grammar-school/', '2206100'),
+    ('https://ex.com/rent/12/', '12'),
+    ('https://ex.com/rent/house/', 'https://ex.com/rent/house/'),
+])
+def test_get_listing_id(url, expected):
+    assert providers.get_listing_id(url) == expected
+
+
+def test_seen_set_evicts_oldest_over_capacity():
+    seen = providers.SeenSet(capacity=2)
+    for listing_id in ['1', '2', '1', '3']:
+        seen.add(listing_id)
+
+    assert list(seen.seen_at) == ['1', '3']
+    assert len(seen) == 2
+    assert '2' not in seen
+
+
+def test_seen_set_with_zero_capacity():
+    seen = providers.SeenSet(capacity=0)
+    seen.add('1')
+    assert '1' not in seen
+
+
+def test_seen_set_forgets_after_window(amocker):
+    seen = providers.SeenSet(window=60)
+    with amocker.patch('time.time', return_value=1000):
+        seen.add('1')
+    with amocker.patch('time.time', return_value=1030):
+        seen.add('2')
+        assert '1' in seen
+    with amocker.patch('time.time', return_value=1061):
+        assert '1' not in seen
+        assert '2' in seen
+        seen.add('3')
+
+    assert list(seen.seen_at) == ['2', '3']
+
+
+@pytest.mark.asyncio
+async def test_provider_get_updates_skips_unchanged_page(amocker, parser_mock, client_mock):
+    parser_mock.iter_properties = amocker.Mock(return_value=iter([]))
+    parser_mock.get_fingerprint = amocker.Mock(return_value='fingerprint')
+    provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
+
+    assert await provider.get_updates() == []
+    assert await provider.get_updates() == []
+
+    assert parser_mock.iter_properties.call_count == 1
+    assert provider.cursor.fingerprint == 'fingerprint'
+    assert provider.stats == {'parsed': 1, 'skipped': 1}
+
+
+@pytest.mark.asyncio
+async def test_provider_get_updates_parses_changed_page(amocker, parser_mock, client_mock):
+    parser_mock.iter_properties = amocker.Mock(side_effect=lambda content: iter([]))
+    parser_mock.get_fingerprint = amocker.Mock(side_effect=['first', 'second'])
+    provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
+
+    await provider.get_updates()
+    await provider.get_updates()
+
+    assert parser_mock.iter_properties.call_count == 2
+    assert provider.cursor.fingerprint == 'second'
+    assert provider.stats == {'parsed': 2}
+
+
+def test_collect_updates_stops_at_stale_items(amocker, property_factory, parser_mock):
+    new_property = property_factory(created_at=100)
+    stale_property = property_factory(created_at=50)
+    properties = [new_property] + [stale_property] * providers.STALE_LIMIT + [new_property]
+    parser_mock.iter_properties = amocker.Mock(return_value=iter(properties))
+
+    cursor = providers.Cursor(latest_created_at=50)
+    updates = providers.collect_updates(parser_mock, '', cursor=cursor)
+
+    assert updates == providers.Updates([new_property], reached_cursor=True)
+
+
+def test_collect_updates_skips_single_stale_item(amocker, property_factory, parser_mock):
+    new_property = property_factory(created_at=100)
+    seen_property = property_factory(created_at=100)
+    stale_property = property_factory(created_at=50)
+    properties = [stale_property, new_property, seen_property, new_property]
+    parser_mock.iter_properties = amocker.Mock(return_value=iter(properties))
+
+    cursor = providers.Cursor(latest_created_at=50)
+    cursor.seen.add(providers.get_listing_id(seen_property.url))
+    updates = providers.collect_updates(parser_mock, '', cursor=cursor)
+
+    assert updates.properties == [new_property, new_property]
+
+
+def test_collect_updates_of_new_page(amocker, property_factory, parser_mock):
+    properties = [property_factory(created_at=100), property_factory(created_at=90)]
+    parser_mock.iter_properties = amocker.Mock(return_value=iter(properties))
+
+    updates = providers.collect_updates(parser_mock, '', cursor=providers.Cursor(50))
+
+    assert updates == providers.Updates(properties, reached_cursor=False)
+    assert updates.all_new
+
+
+@pytest.mark.asyncio
+async def test_provider_parse_inline(amocker, property_factory, parser_mock, client_mock):
+    property_ = property_factory(created_at=time.time() + 10_000)
+    parser_mock.iter_properties = amocker.Mock(return_value=iter([property_]))
+    provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
+
+    assert (await provider.parse('<div>test</div>')).properties == [property_]
+    assert parser_mock.iter_properties.call_args == amocker.call('<div>test</div>')
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('executor_class', [
+    futures.ThreadPoolExecutor,
+    futures.ProcessPoolExecutor,
+])
+async def test_provider_parse_in_executor(bazaraki_content, client_mock, executor_class):
+    parser = parsers.BazarakiParser()
+    with executor_class(max_workers=1) as executor:
+        provider = providers.Provider(
+            'https://example.com', parser=parser, webclient=client_mock, executor=executor
+        )
+        provider.cursor.latest_created_at = 0
+        updates = await provider.parse(bazaraki_content)
+
+    assert updates.properties == parser.parse(bazaraki_content)
+
+
+@pytest.mark.asyncio
+async def test_provider_get_updates_when_page_not_modified(amocker, parser_mock, client_mock):
+    result = client.FetchResult(client.FetchStatus.NOT_MODIFIED)
+    client_mock.get = amocker.CoroutineMock(return_value=result)
+    provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
+
+    assert await provider.get_updates() == []
+
+    assert not parser_mock.get_fingerprint.called
+    assert not parser_mock.iter_properties.called
+    assert provider.stats == {'not_modified': 1}
+
+
+def test_update_collector_add(property_factory):
+    collector = providers.UpdateCollector(providers.Cursor(latest_created_at=50))
+    new_property = property_factory(created_at=100)
+    stale_property = property_factory(created_at=50)
+
+    assert collector.add(new_property)
+    assert all(collector.add(stale_property) for _ in range(providers.STALE_LIMIT - 1))
+    assert not collector.add(stale_property)
+    assert collector.updates == [new_property]
+
+
+@pytest.mark.asyncio
+async def test_streaming_provider_get_updates(amocker, bazaraki_content, client_mock):
+    chunks = [bazaraki_content[i:i + 1000] for i in range(0, len(bazaraki_content), 1000)]
+
+    async def stream(url):
+        del url
+        for chunk in chunks:
+            yield chunk
+
+    client_mock.stream = amocker.Mock(side_effect=stream)
+    parser = parsers.BazarakiParser()
+    provider = providers.StreamingProvider(
+        'https://example.com', parser=parser, webclient=client_mock
+    )
+    provider.cursor.latest_created_at = 0
+
+    properties = await provider.get_updates()
+
+    assert properties == parser.parse(bazaraki_content)
+    assert provider.cursor.latest_created_at == max(p.created_at for p in properties)
+    assert provider.stats == {'streamed': 1}
+
+
+@pytest.mark.asyncio
+async def test_streaming_provider_stops_at_stale_items(
+        amocker, property_factory, parser_mock, client_mock
+):
+    new_property = property_factory(created_at=100)
+    stale_property = property_factory(created_at=50)
+    closed = []
+
+    async def stream(url):
+        del url
+        try:
+            yield 'first'
+            yield 'second'
+        finally:
+            closed.append(True)
+
+    client_mock.stream = amocker.Mock(side_effect=stream)
+    feed = parser_mock.make_feed.return_value
+    feed.feed = amocker.Mock(side_effect=[
+        iter([new_property, stale_property]),
+        iter([stale_property] * providers.STALE_LIMIT),
+    ])
+    provider = providers.StreamingProvider(
+        'https://example.com', parser=parser_mock, webclient=client_mock
+    )
+    provider.cursor.latest_created_at = 50
+
+    assert await provider.get_updates() == [new_property]
+
+    assert closed == [True]
+    assert feed.feed.call_count == 2
+    assert provider.cursor.latest_created_at == 100
+    assert provider.stats == {'stopped_early': 1}
+
+
+@pytest.mark.asyncio
+async def test_streaming_provider_get_updates_when_page_not_modified(
+        amocker, parser_mock, client_mock
+):
+    async def stream(url):
+        del url
+        for chunk in []:
+            yield chunk
+
+    client_mock.stream = amocker.Mock(side_effect=stream)
+    provider = providers.StreamingProvider(
+        'https://example.com', parser=parser_mock, webclient=client_mock
+    )
+    latest_created_at = provider.cursor.latest_created_at
+
+    assert await provider.get_updates() == []
+    assert provider.cursor.latest_created_at == latest_created_at
+    assert not parser_mock.make_feed.return_value.feed.called
+
+
+@pytest.mark.asyncio
+async def test_provider_get_updates_when_fetch_failed(amocker, parser_mock, client_mock):
+    result = client.FetchResult(client.FetchStatus.FAILED, error='TimeoutError()')
+    client_mock.get = amocker.CoroutineMock(return_value=result)
+    provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
+    provider.cursor.fingerprint = 'fingerprint'
+
+    assert await provider.get_updates() == []
+
+    assert not parser_mock.get_fingerprint.called
+    assert provider.cursor.fingerprint == 'fingerprint'
+    assert provider.stats == {'failed': 1}
+
+
+def test_seen_set_restore(amocker):
+    seen = providers.SeenSet(window=60, capacity=2)
+    with amocker.patch('time.time', return_value=1000):
+        seen.restore([('1', 900), ('2', 950), ('3', 960), ('4', 970)])
+
+    assert seen.items() == [('3', 960), ('4', 970)]
+
+
+def test_provider_get_state(property_factory, parser_mock, client_mock):
+    provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
+    provider.cursor.advance([property_factory(url='https://ex.com/adv/1/', created_at=100)])
+
+    state = provider.get_state()
+
+    assert (state.url, state.latest_created_at) == ('https://example.com', 100)
+    assert [listing_id for listing_id, _ in state.seen] == ['1']
+    assert provider.cursor.changed
+
+
+@pytest.mark.parametrize(['latest_created_at', 'expected'], [(500, 500), (100, 300)])
+def test_provider_restore(parser_mock, client_mock, latest_created_at, expected):
+    provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
+    state = entities.CursorState(
+        url=provider.url, latest_created_at=latest_created_at, seen=[('1', time.time())]
+    )
+
+    provider.restore(state, not_before=300)
+
+    assert provider.cursor.latest_created_at == expected
+    assert '1' in provider.cursor.seen
+    assert not provider.cursor.changed
+
+
+def make_page(property_factory, ids, created_at):
+    return [
+        property_factory(url=f'https://ex.com/adv/{listing_id}/', created_at=created_at - number)
+        for number, listing_id in enumerate(ids)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_provider_get_updates_catches_up_following_pages(
+        amocker, property_factory, parser_mock, client_mock
+):
+    pages = {
+        'https://example.com': make_page(property_factory, [9, 8, 7], created_at=1000),
+        # listing 7 has moved to the second page while the first one was parsed
+        'https://example.com?page=2': make_page(property_factory, [7, 6, 5], created_at=997),
+        'https://example.com?page=3': make_page(property_factory, [4, 3, 2], created_at=994),
+        'https://example.com?page=4': make_page(property_factory, [1, 0], created_at=10),
+        'https://example.com?page=5': [],
+    }
+    client_mock.get = amocker.CoroutineMock(
+        side_effect=lambda url: client.FetchResult(client.FetchStatus.OK, text=url)
+    )
+    parser_mock.get_page_url.side_effect = lambda url, page: f'{url}?page={page}'
+    parser_mock.iter_properties.side_effect = lambda content: iter(pages[content])
+    provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
+    provider.cursor.latest_created_at = 500
+
+    with amocker.patch.object(providers, 'PAGE_FAN_OUT', 2):
+        properties = await provider.get_updates()
+
+    assert [providers.get_listing_id(p.url) for p in properties] == list('98765432')
+    assert provider.cursor.latest_created_at == 1000
+    # pages 4 and 5 are fetched at once, page 5 is past the end of the listing
+    assert client_mock.get.call_count == 5
+    assert provider.stats == {'parsed': 1, 'pages': 4}
+
+
+@pytest.mark.asyncio
+async def test_provider_catch_up_is_bounded(amocker, property_factory, parser_mock, client_mock):
+    client_mock.get = amocker.CoroutineMock(
+        side_effect=lambda url: client.FetchResult(client.FetchStatus.OK, text=url)
+    )
+    parser_mock.get_page_url.side_effect = lambda url, page: f'{url}?page={page}'
+    parser_mock.iter_properties.side_effect = lambda content: iter(
+        make_page(property_factory, [content], created_at=1000)
+    )
+    provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
+    provider.cursor.latest_created_at = 500
+
+    properties = await provider.get_updates()
+
+    assert len(properties) == providers.MAX_PAGES
+    assert client_mock.get.call_count == providers.MAX_PAGES
+
+
+@pytest.mark.asyncio
+async def test_provider_catch_up_stops_at_failed_page(
+        amocker, property_factory, parser_mock, client_mock
+):
+    client_mock.get = amocker.CoroutineMock(side_effect=[
+        client.FetchResult(client.FetchStatus.OK, text='first'),
+        client.FetchResult(client.FetchStatus.FAILED),
+        client.FetchResult(client.FetchStatus.OK, text='third'),
+    ])
+    parser_mock.get_page_url.side_effect = lambda url, page: f'{url}?page={page}'
+    parser_mock.iter_properties.side_effect = lambda content: iter(
+        make_page(property_factory, [content], created_at=1000)
+    )
+    provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
+    provider.cursor.latest_created_at = 500
+
+    with amocker.patch.object(providers, 'PAGE_FAN_OUT', 2):
+        properties = await provider.get_updates()
+
+    assert len(properties) == 2
+    assert client_mock.get.call_count == 3
+    assert provider.stats == {'parsed': 1, 'pages': 1, 'failed': 1}
+
+
+@pytest.mark.asyncio
+async def test_provider_does_not_catch_up_without_pagination(
+        property_factory, parser_mock, client_mock
+):
+    parser_mock.iter_properties.return_value = iter([property_factory(created_at=1000)])
+    provider = providers.Provider('https://example.com', parser=parser_mock, webclient=client_mock)
+    provider.cursor.latest_created_at = 500
+
+    assert len(await provider.get_updates()) == 1
+    assert client_mock.get.call_count == 1
+
+
+def test_merge_updates(property_factory):
+    first = property_factory(url='https://ex.com/adv/1/', created_at=100)
+    second = property_factory(url='https://ex.com/adv/2/', created_at=200)
+    moved = property_factory(url='https://ex.com/adv/1/', created_at=100)
+
+    assert providers.merge_updates([first, second, moved]) == [second, first]
+
+
+@pytest.mark.usefixtures('no_jitter')
+def test_poll_schedule_backs_off_to_max_interval():
+    schedule = providers.PollSchedule(min_interval=2, max_interval=60)
+    delays = [schedule.next_delay(found=0) for _ in range(20)]
+
+    assert delays == sorted(delays)
+    assert delays[0] > 2
+    assert delays[-1] == 60
+
+
+@pytest.mark.usefixtures('no_jitter')
+def test_poll_schedule_tightens_when_listings_arrive():
+    schedule = providers.PollSchedule(min_interval=2, max_interval=60)
+    for _ in range(20):
+        schedule.next_delay(found=0)
+
+    delays = [schedule.next_delay(found=3) for _ in range(30)]
+
+    assert delays == sorted(delays, reverse=True)
+    assert delays[-1] == 2
+
+
+@pytest.mark.usefixtures('no_jitter')
+def test_poll_schedule_follows_arrival_rate():
+    schedule = providers.PollSchedule(min_interval=1, max_interval=300)
+    schedule.interval, schedule.rate = 10, 0.1
+    # one listing per 10 seconds keeps the interval
+    assert schedule.next_delay(found=1) == pytest.approx(10)
+
+
+def test_poll_schedule_jitter():
+    schedule = providers.PollSchedule(min_interval=10, max_interval=10)
+    delays = {schedule.next_delay(found=0) for _ in range(10)}
+
+    assert len(delays) > 1
+    assert all(9 <= delay <= 11 for delay in delays)
+    assert 0 <= schedule.start_delay() <= 10
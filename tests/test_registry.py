@@ -1,3 +1,5 @@
+import pytest
+
 from app import parsers, registry
 
 
@@ -13,12 +15,43 @@ def test_parser_registry_add():
     assert parser_registry.parser_classes == {url: parsers.BazarakiParser}
 
 
+def test_parser_registry_add_template():
+    parser_registry = registry.ParserRegistry()
+    parser_registry.add('https://real.estates.com/{category}/{district}/', {
+        'category': ['houses', 'flats'],
+        'district': ['limassol', 'paphos'],
+    })(parsers.BazarakiParser)
+    assert parser_registry.parser_classes == {
+        'https://real.estates.com/houses/limassol/': parsers.BazarakiParser,
+        'https://real.estates.com/houses/paphos/': parsers.BazarakiParser,
+        'https://real.estates.com/flats/limassol/': parsers.BazarakiParser,
+        'https://real.estates.com/flats/paphos/': parsers.BazarakiParser,
+    }
+
+
+@pytest.mark.parametrize(['template', 'params', 'expected'], [
+    ('https://real.estates.com/', {}, ['https://real.estates.com/']),
+    ('https://real.estates.com/{page}', {'page': ['1', '2']}, [
+        'https://real.estates.com/1', 'https://real.estates.com/2'
+    ]),
+    ('https://real.estates.com/{page}', {'page': []}, []),
+])
+def test_expand_url(template, params, expected):
+    assert registry.expand_url(template, params) == expected
+
+
 def test_add_parser(amocker):
     url = 'https://real.estates.com'
     with amocker.patch('app.registry._parser_registry.add') as add_mock:
-        registry.add_parser(url)
+        registry.add_parser(url, district=['limassol'])
+
+    assert add_mock.call_args == amocker.call(url, {'district': ['limassol']})
+
 
-    assert add_mock.called
+def test_bazaraki_parser_is_registered_for_every_district_and_category():
+    urls = [url for url, cls in registry.list_parsers().items() if cls is parsers.BazarakiParser]
+    assert len(urls) == len(parsers.BAZARAKI_CATEGORIES) * len(parsers.BAZARAKI_DISTRICTS)
+    assert parsers.BAZARAKI_URL in urls
 
 
 def test_list_parsers(amocker):
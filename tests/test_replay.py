@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from app import parsers, replay
+
+
+def test_make_chats():
+    chats = replay.make_chats(10)
+    assert [chat.id for chat in chats] == list(range(10))
+    assert chats == replay.make_chats(10)
+
+
+@pytest.mark.asyncio
+async def test_replay_run(bazaraki_content, record_factory):
+    runner = replay.Replay(chats=0)
+    records = [
+        record_factory(url=parsers.BAZARAKI_URL, text=bazaraki_content),
+        record_factory(url=parsers.BAZARAKI_URL, text=bazaraki_content),
+        record_factory(url='https://unknown.com', text=bazaraki_content),
+    ]
+    await runner.run(records)
+    await runner.webclient.close()
+
+    updates = len(parsers.BazarakiParser().parse(bazaraki_content))
+    assert runner.stats == {'pages': 2, 'skipped': 1, 'updates': updates}
+    # following pages are not recorded
+    assert runner.providers[parsers.BAZARAKI_URL].stats == {'parsed': 1, 'skipped': 1, 'failed': 3}
+
+
+@pytest.mark.asyncio
+async def test_replay_shares_parser(bazaraki_content, record_factory):
+    other_url = parsers.BAZARAKI_URL_TEMPLATE.format(
+        category=parsers.BAZARAKI_CATEGORIES[1], district=parsers.BAZARAKI_DISTRICTS[1]
+    )
+    runner = replay.Replay(chats=0)
+    await runner.run([
+        record_factory(url=parsers.BAZARAKI_URL, text=bazaraki_content),
+        record_factory(url=other_url, text=bazaraki_content),
+    ])
+    await runner.webclient.close()
+
+    assert runner.providers[parsers.BAZARAKI_URL].parser is runner.providers[other_url].parser
+
+
+@pytest.mark.asyncio
+async def test_replay_sends_updates_to_chats(bazaraki_content, record_factory):
+    runner = replay.Replay(chats=1)
+    await runner.run([record_factory(url=parsers.BAZARAKI_URL, text=bazaraki_content)])
+    await runner.webclient.close()
+
+    assert 0 < runner.bot_adapter.messages <= runner.stats['updates']
+
+
+@pytest.mark.asyncio
+async def test_replay(archive_path):
+    report = await replay.replay(archive_path, backend=parsers.DEFAULT_BACKEND, chats=10)
+
+    assert report['pages'] == 2
+    assert report['skipped'] == 1
+    assert report['suppressed'] == 0
+    assert report['pages_per_second'] > 0
+    assert report['providers'][parsers.BAZARAKI_URL]['parsed'] == 1
+
+
+def test_main(capsys, archive_path):
+    replay.main([archive_path, '--chats', '5'])
+
+    report = json.loads(capsys.readouterr().out)
+    assert report['pages'] == 2
@@ -1,6 +1,10 @@
+import asyncio
+import itertools
+import time
+
 import pytest
 
-from app import datatypes, providers, services
+from app import adapters, datatypes, digests, entities, pipeline, providers, services
 
 
 @pytest.mark.asyncio
@@ -8,27 +12,269 @@ async def test_send_service_start_sending(amocker, async_gen_mock, property_fact
     real_property = property_factory(
         title='Renovated house', price=datatypes.Price('700'), url='https://example.com/1'
     )
-    send_service.get_updates = async_gen_mock(return_value=real_property)
+    send_service.get_updates = async_gen_mock(return_value=[real_property])
 
     await send_service.start_sending()
 
-    assert send_service.db_adapter.select_chats.called
+    assert send_service.db_adapter.select_chats_by_price.called
     assert send_service.bot_adapter.broadcast.called
     assert send_service.bot_adapter.broadcast.call_args == amocker.call(
         chats=[], text=f'[Renovated house €700]({real_property.telegram_link})'
     )
 
 
+@pytest.mark.asyncio
+async def test_send_service_start_sending_does_not_wait_for_delivery(
+        amocker, property_factory, send_service
+):
+    async def broadcast(chats, text):
+        del chats, text
+        await asyncio.sleep(10)
+
+    send_service.bot_adapter.broadcast = broadcast
+    updates = [[property_factory(title=f'House number {number}')] for number in range(5)]
+    provider = make_polled_provider(
+        amocker, updates=itertools.chain(updates, itertools.repeat([]))
+    )
+    send_service.providers = [provider]
+    sending = asyncio.ensure_future(send_service.start_sending())
+    await asyncio.sleep(0.1)
+
+    assert provider.get_updates.call_count > 5
+    assert send_service.get_pipeline_stats() == {
+        'match': {'queued': 0, 'handled': 5},
+        'deliver': {'queued': 4},
+        'send_digest': {'queued': 0},
+    }
+    assert send_service.db_adapter.select_chats_by_price.call_count == 5
+    sending.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await sending
+
+
+@pytest.mark.asyncio
+async def test_send_service_send(chat_factory, property_factory, send_service):
+    cheap_chat = chat_factory(max_price=datatypes.Price(500))
+    any_chat = chat_factory()
+    send_service.db_adapter = adapters.MemoryDBAdapter([cheap_chat, any_chat])
+    cheap = property_factory(price=datatypes.Price(400))
+    expensive = property_factory(price=datatypes.Price(700))
+
+    await send_service.send([cheap, expensive])
+
+    assert [call[1]['chats'] for call in send_service.bot_adapter.broadcast.call_args_list] == [
+        [cheap_chat, any_chat], [any_chat]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_send_service_match_queries_once_per_poll(property_factory, send_service):
+    updates = [property_factory() for _ in range(20)]
+
+    deliveries = await send_service.match(updates)
+
+    assert [delivery.property for delivery in deliveries] == updates
+    assert send_service.db_adapter.select_chats_by_price.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_send_service_match_nothing(send_service):
+    assert await send_service.match([]) == []
+    assert not send_service.db_adapter.select_chats_by_price.called
+
+
+@pytest.mark.asyncio
+async def test_send_service_send_suppresses_duplicates(property_factory, send_service):
+    real_property = property_factory(title='Renovated house, Limassol')
+    repost = property_factory(
+        title='Renovated house Limassol',
+        price=real_property.price,
+        created_at=real_property.created_at,
+        url='https://example.org/2',
+    )
+
+    await send_service.send([real_property])
+    await send_service.send([repost])
+    await send_service.send([property_factory(title='Flat in Paphos')])
+
+    assert send_service.bot_adapter.broadcast.call_count == 2
+    assert send_service.db_adapter.select_chats_by_price.call_count == 2
+    assert send_service.stats['suppressed'] == 1
+
+
+@pytest.mark.asyncio
+async def test_send_service_send_does_not_suppress_short_titles(property_factory, send_service):
+    real_property = property_factory(title='Apartment')
+    await send_service.send([real_property, real_property])
+
+    assert send_service.bot_adapter.broadcast.call_count == 2
+    assert not send_service.stats['suppressed']
+
+
+@pytest.mark.asyncio
+async def test_send_service_deliver_buffers_digests(chat_factory, property_factory, send_service):
+    chat, digest_chat = chat_factory(id=1), chat_factory(id=2, digest=True)
+    first, second = property_factory(), property_factory()
+
+    await send_service.deliver(entities.Delivery(first, chats=[chat, digest_chat]))
+    await send_service.deliver(entities.Delivery(second, chats=[digest_chat]))
+
+    assert [call[1]['chats'] for call in send_service.bot_adapter.broadcast.call_args_list] == [
+        [chat], []
+    ]
+    assert send_service.digest_buffer.pop_all() == [
+        entities.Digest(digest_chat, properties=[first, second])
+    ]
+
+
+@pytest.mark.asyncio
+async def test_send_service_send_digest(amocker, chat_factory, property_factory, send_service):
+    chat = chat_factory()
+    updates = [property_factory(title='House ' * 20) for _ in range(100)]
+
+    await send_service.send_digest(entities.Digest(chat, properties=updates))
+
+    calls = send_service.bot_adapter.broadcast.call_args_list
+    assert 1 < len(calls) < len(updates)
+    assert calls[0] == amocker.call(chats=[chat], text=amocker.ANY)
+    assert send_service.stats['digested'] == 100
+
+
+@pytest.mark.asyncio
+async def test_send_service_flush_digests(amocker, chat_factory, property_factory, send_service):
+    stage = amocker.Mock(spec=pipeline.Stage)
+    send_service.digest_buffer = digests.DigestBuffer(window=60)
+    with amocker.patch('time.time', return_value=1000):
+        send_service.digest_buffer.add(chat_factory(), property_factory())
+    with amocker.patch('asyncio.sleep', side_effect=[None, ValueError()]) as sleep_mock:
+        with amocker.patch('time.time', return_value=1060):
+            with pytest.raises(ValueError):
+                await send_service.flush_digests(stage)
+
+    assert sleep_mock.call_args_list == [amocker.call(0), amocker.call(60)]
+    assert stage.put.call_count == 1
+    assert not send_service.digest_buffer
+
+
+@pytest.mark.asyncio
+async def test_send_service_start_sending_sends_pending_digests(
+        async_gen_mock, chat_factory, property_factory, send_service
+):
+    digest_chat = chat_factory(digest=True)
+    send_service.db_adapter = adapters.MemoryDBAdapter([digest_chat])
+    send_service.get_updates = async_gen_mock(return_value=[property_factory()])
+
+    await send_service.start_sending()
+
+    assert send_service.bot_adapter.broadcast.call_count == 2
+    assert send_service.bot_adapter.broadcast.call_args[1]['chats'] == [digest_chat]
+    assert send_service.stats['digested'] == 1
+
+
+def make_polled_provider(amocker, updates):
+    provider = amocker.Mock(spec=providers.Provider)
+    provider.url = 'https://example.com'
+    provider.get_updates = amocker.CoroutineMock(side_effect=updates)
+    provider.schedule = amocker.Mock(spec=providers.PollSchedule)
+    provider.schedule.start_delay.return_value = 0
+    provider.schedule.next_delay.return_value = 0
+    return provider
+
+
 @pytest.mark.asyncio
 async def test_send_service_get_updates(amocker, property_factory, send_service):
     expected_property = property_factory()
-    provider = amocker.Mock(spec=providers.Provider)
-    provider.get_updates = amocker.CoroutineMock(return_value=[expected_property])
+    provider = make_polled_provider(amocker, updates=itertools.repeat([expected_property]))
+    send_service.providers = [provider]
+
+    get_updates = send_service.get_updates()
+    assert await get_updates.__anext__() == [expected_property]
+    assert await get_updates.__anext__() == [expected_property]  # run second iteration
+    await get_updates.aclose()
+
+    assert provider.schedule.next_delay.call_args == amocker.call(found=1)
+
+
+@pytest.mark.asyncio
+async def test_send_service_get_updates_polls_providers_independently(
+        amocker, property_factory, send_service
+):
+    fast_property, slow_property = property_factory(), property_factory()
+    fast = make_polled_provider(amocker, updates=itertools.repeat([fast_property]))
+    slow = make_polled_provider(amocker, updates=itertools.repeat([slow_property]))
+    slow.schedule.next_delay.return_value = 60
+    send_service.providers = [fast, slow]
+
+    get_updates = send_service.get_updates()
+    received = [await get_updates.__anext__() for _ in range(5)]
+    await get_updates.aclose()
+
+    assert received.count([slow_property]) == 1
+    assert received.count([fast_property]) == 4
+
+
+@pytest.mark.asyncio
+async def test_send_service_get_updates_bounds_concurrency(
+        amocker, property_factory, send_service
+):
+    running = []
+    max_running = 0
+
+    async def get_updates():
+        nonlocal max_running
+        running.append(None)
+        max_running = max(max_running, len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+        return [property_factory()]
+
+    provider_list = [make_polled_provider(amocker, updates=None) for _ in range(5)]
+    for provider in provider_list:
+        provider.get_updates = get_updates
+    send_service.providers = provider_list
+    send_service.pipeline_settings = pipeline.PipelineSettings(poll_workers=2)
+
+    get_updates_gen = send_service.get_updates()
+    for _ in range(5):
+        await get_updates_gen.__anext__()
+    await get_updates_gen.aclose()
+
+    assert max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_send_service_get_updates_survives_provider_error(
+        amocker, property_factory, send_service
+):
+    expected_property = property_factory()
+    provider = make_polled_provider(amocker, updates=[ValueError(), [expected_property]])
+    send_service.providers = [provider]
+
+    get_updates = send_service.get_updates()
+    assert await get_updates.__anext__() == [expected_property]
+    await get_updates.aclose()
+
+    assert provider.schedule.next_delay.call_args_list == [
+        amocker.call(found=0), amocker.call(found=1)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_send_service_get_updates_cancels_polling(amocker, send_service):
+    provider = make_polled_provider(amocker, updates=itertools.repeat([]))
     send_service.providers = [provider]
 
-    get_updates = send_service.get_updates(interval=0.1)
-    assert await get_updates.__anext__() == expected_property
-    assert await get_updates.__anext__() == expected_property  # run second iteration
+    get_updates = send_service.get_updates()
+    next_update = asyncio.ensure_future(get_updates.__anext__())
+    await asyncio.sleep(0.01)
+    next_update.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await next_update
+    await asyncio.sleep(0)
+    calls = provider.get_updates.call_count
+    await asyncio.sleep(0.01)
+
+    assert provider.get_updates.call_count == calls
 
 
 @pytest.mark.asyncio
@@ -116,3 +362,69 @@ async def test_chat_service_set_max_price_lesser_than_min(
 
     assert chat_service.get_or_create.called
     assert not chat_service.db_adapter.update_chat.called
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('digest', [True, False])
+async def test_chat_service_toggle_digest(
+        amocker, chat_factory, chat_service: services.ChatService, digest
+):
+    chat = chat_factory(digest=not digest)
+    chat_service.get_or_create = amocker.CoroutineMock(return_value=chat)
+
+    assert await chat_service.toggle_digest(chat_id=chat.id) is digest
+    assert chat_service.db_adapter.update_chat.call_args == amocker.call(chat)
+    assert chat.digest is digest
+
+
+@pytest.mark.asyncio
+async def test_cursor_service_load(parser_mock, client_mock):
+    provider, new_provider = (
+        providers.Provider(url, parser=parser_mock, webclient=client_mock)
+        for url in ['https://ex.com/1', 'https://ex.com/2']
+    )
+    latest_created_at = new_provider.cursor.latest_created_at
+    state = entities.CursorState(
+        url=provider.url, latest_created_at=time.time() - 60, seen=[('1', time.time())]
+    )
+    db_adapter = adapters.MemoryDBAdapter()
+    db_adapter.cursor_states[provider.url] = state
+    cursor_service = services.CursorService(
+        db_adapter=db_adapter, providers=[provider, new_provider]
+    )
+
+    await cursor_service.load(catch_up=3600)
+
+    assert provider.cursor.latest_created_at == state.latest_created_at
+    assert '1' in provider.cursor.seen
+    assert new_provider.cursor.latest_created_at == latest_created_at
+
+
+@pytest.mark.asyncio
+async def test_cursor_service_save_changed_cursors(
+        amocker, property_factory, parser_mock, client_mock
+):
+    provider = providers.Provider('https://ex.com/1', parser=parser_mock, webclient=client_mock)
+    unchanged = providers.Provider('https://ex.com/2', parser=parser_mock, webclient=client_mock)
+    db_adapter = adapters.MemoryDBAdapter()
+    db_adapter.save_cursor_states = amocker.CoroutineMock(wraps=db_adapter.save_cursor_states)
+    cursor_service = services.CursorService(db_adapter=db_adapter, providers=[provider, unchanged])
+
+    provider.cursor.advance([property_factory(url='https://ex.com/adv/1/', created_at=100)])
+    await cursor_service.save()
+    await cursor_service.save()
+
+    assert db_adapter.save_cursor_states.call_count == 1
+    assert list(db_adapter.cursor_states) == [provider.url]
+    assert not provider.cursor.changed
+
+
+@pytest.mark.asyncio
+async def test_cursor_service_start_saving(amocker, db_adapter_mock):
+    cursor_service = services.CursorService(db_adapter=db_adapter_mock, providers=[])
+    cursor_service.save = amocker.CoroutineMock(side_effect=[None, asyncio.CancelledError])
+
+    with pytest.raises(asyncio.CancelledError):
+        await cursor_service.start_saving(interval=0)
+
+    assert cursor_service.save.call_count == 2
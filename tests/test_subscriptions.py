@@ -0,0 +1,106 @@
+import decimal
+import random
+
+import pytest
+
+from app import datatypes, entities, subscriptions
+
+
+def make_chat(chat_id, min_price=None, max_price=None):
+    return entities.Chat(
+        id=chat_id,
+        min_price=datatypes.Price.from_optional(min_price),
+        max_price=datatypes.Price.from_optional(max_price),
+    )
+
+
+def make_random_chats(count, seed=0):
+    rng = random.Random(seed)
+    chats = []
+    for chat_id in range(count):
+        min_price = rng.choice([None, rng.randrange(1, 2000)])
+        max_price = rng.choice([None, (min_price or 1) + rng.randrange(0, 2000)])
+        chats.append(make_chat(chat_id, min_price, max_price))
+    return chats
+
+
+def scan(chats, price):
+    return [
+        chat for chat in chats
+        if (chat.min_price is None or chat.min_price <= price)
+        and (chat.max_price is None or price <= chat.max_price)
+    ]
+
+
+PRICES = [datatypes.Price(price) for price in [1, 5, 100, 999, 1000, 1001, 2500, 5000]]
+
+
+def test_get_interval():
+    assert subscriptions.get_interval(make_chat(1, 100)) == (100, subscriptions.INFINITY)
+    assert subscriptions.get_interval(make_chat(1, max_price=100)) == (
+        subscriptions.NEGATIVE_INFINITY, 100
+    )
+
+
+@pytest.mark.parametrize(['intervals', 'expected'], [
+    ([(decimal.Decimal(1), decimal.Decimal(3)), (decimal.Decimal(2), subscriptions.INFINITY)], 2),
+    ([(subscriptions.NEGATIVE_INFINITY, subscriptions.INFINITY)], 0),
+])
+def test_get_center(intervals, expected):
+    assert subscriptions.get_center(intervals) == expected
+
+
+def test_subscription_index_match_after_load():
+    chats = make_random_chats(1000)
+    index = subscriptions.SubscriptionIndex()
+    index.load(chats)
+
+    assert len(index) == 1000
+    for price in PRICES + [datatypes.Price(chat.min_price or 1) for chat in chats[:50]]:
+        assert index.match(price) == scan(chats, price)
+
+
+def test_subscription_index_match_after_updates():
+    chats = make_random_chats(300)
+    index = subscriptions.SubscriptionIndex()
+    index.load(chats[:100])
+    for chat in chats[100:]:
+        index.update(chat)
+    updated = make_random_chats(300, seed=1)
+    for chat in updated[:150]:
+        index.update(chat)
+    chats = updated[:150] + chats[150:]
+
+    for price in PRICES:
+        assert index.match(price) == scan(chats, price)
+    assert index.check(chats) == []
+
+
+def test_subscription_index_updates_empty_index():
+    index = subscriptions.SubscriptionIndex()
+    assert index.match(datatypes.Price(100)) == []
+
+    chat = make_chat(1, 50, 150)
+    index.update(chat)
+
+    assert index.match(datatypes.Price(100)) == [chat]
+    assert index.match(datatypes.Price(200)) == []
+    assert index.match_many([datatypes.Price(50)]) == {datatypes.Price(50): [chat]}
+
+
+def test_subscription_index_keeps_nodes_at_center():
+    index = subscriptions.SubscriptionIndex()
+    index.load([make_chat(1, 100, 200), make_chat(2, 300, 400), make_chat(3, 10, 20)])
+
+    for price, expected in [(150, [1]), (300, [2]), (20, [3]), (250, [])]:
+        assert [chat.id for chat in index.match(datatypes.Price(price))] == expected
+
+
+def test_subscription_index_check():
+    chats = [make_chat(1, 100), make_chat(2), make_chat(3)]
+    index = subscriptions.SubscriptionIndex()
+    index.load(chats[:2])
+
+    assert index.check([make_chat(1, 200), make_chat(2), make_chat(3)]) == [1, 3]
+    assert index.check([]) == [1, 2]
+    assert index.check([make_chat(1, 100), entities.Chat(id=2, digest=True)]) == [2]